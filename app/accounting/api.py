@@ -1,57 +1,169 @@
+import csv
+import json
+
+from django.core import signing
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import StreamingHttpResponse
 from django.utils.dateparse import parse_date
 from rest_framework import status
 from rest_framework.response import Response
 from rest_framework.views import APIView
 
-from accounting.services import account_ledger, get_default_cash_account
+from accounting.services import (
+    account_ledger,
+    account_ledger_page,
+    get_default_cash_account,
+    iter_account_ledger,
+)
+
+LEDGER_CURSOR_SALT = "accounting.ledger-cursor"
+LEDGER_PAGE_MAX = 1000
+
+
+def _serialize_row(r) -> dict:
+    return {
+        "entry_id": r.entry_id,
+        "entry_number": r.entry_number,
+        "entry_date": r.entry_date.isoformat(),
+        "description": r.description,
+        "debit": r.debit,
+        "credit": r.credit,
+        "balance": r.balance,
+    }
+
+
+def _parse_range(request):
+    date_from = parse_date(request.query_params.get("date_from", ""))
+    date_to = parse_date(request.query_params.get("date_to", ""))
+    if not date_from or not date_to:
+        return None, None, Response(
+            {"detail": "Parametri date_from i date_to su obavezni (YYYY-MM-DD)."},
+            status=status.HTTP_400_BAD_REQUEST,
+        )
+    if date_from > date_to:
+        return None, None, Response(
+            {"detail": "date_from ne smije biti veći od date_to."},
+            status=status.HTTP_400_BAD_REQUEST,
+        )
+    return date_from, date_to, None
 
 
 class CashLedgerView(APIView):
+    """
+    Kartica blagajne. Uz ?limit (i ?cursor iz next_cursor) vraca jednu
+    stranicu s tekucim saldom; bez njih cijeli period kao i prije.
+    """
+
     def get(self, request):
-        date_from = parse_date(request.query_params.get("date_from", ""))
-        date_to = parse_date(request.query_params.get("date_to", ""))
-        if not date_from or not date_to:
-            return Response(
-                {"detail": "Parametri date_from i date_to su obavezni (YYYY-MM-DD)."},
-                status=status.HTTP_400_BAD_REQUEST,
-            )
-        if date_from > date_to:
-            return Response(
-                {"detail": "date_from ne smije biti veći od date_to."},
-                status=status.HTTP_400_BAD_REQUEST,
-            )
+        date_from, date_to, error = _parse_range(request)
+        if error:
+            return error
 
         try:
             cash_account = get_default_cash_account()
         except RuntimeError as exc:
             return Response({"detail": str(exc)}, status=status.HTTP_400_BAD_REQUEST)
-        result = account_ledger(cash_account, date_from, date_to)
+        account = {
+            "id": cash_account.id,
+            "code": cash_account.code,
+            "name": cash_account.name,
+        }
 
-        rows = [
-            {
-                "entry_id": r.entry_id,
-                "entry_number": r.entry_number,
-                "entry_date": r.entry_date.isoformat(),
-                "description": r.description,
-                "debit": r.debit,
-                "credit": r.credit,
-            }
-            for r in result["rows"]
-        ]
+        if "limit" in request.query_params or "cursor" in request.query_params:
+            return self._page(request, cash_account, account, date_from, date_to)
 
+        result = account_ledger(cash_account, date_from, date_to)
         return Response(
             {
-                "account": {
-                    "id": cash_account.id,
-                    "code": cash_account.code,
-                    "name": cash_account.name,
-                },
+                "account": account,
                 "date_from": date_from.isoformat(),
                 "date_to": date_to.isoformat(),
                 "opening_balance": result["opening_balance"],
                 "period_debit": result["period_debit"],
                 "period_credit": result["period_credit"],
                 "closing_balance": result["closing_balance"],
-                "rows": rows,
+                "rows": [_serialize_row(r) for r in result["rows"]],
+            }
+        )
+
+    def _page(self, request, cash_account, account, date_from, date_to):
+        try:
+            limit = min(int(request.query_params.get("limit") or 200), LEDGER_PAGE_MAX)
+        except ValueError:
+            return Response({"detail": "limit mora biti cijeli broj."}, status=status.HTTP_400_BAD_REQUEST)
+        if limit < 1:
+            return Response({"detail": "limit mora biti veci od 0."}, status=status.HTTP_400_BAD_REQUEST)
+
+        after = None
+        cursor = request.query_params.get("cursor")
+        if cursor:
+            try:
+                after = signing.loads(cursor, salt=LEDGER_CURSOR_SALT)
+            except signing.BadSignature:
+                return Response({"detail": "Neispravan cursor."}, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            rows, next_after = account_ledger_page(cash_account, date_from, date_to, after=after, limit=limit)
+        except ValueError:
+            return Response({"detail": "Neispravan cursor."}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(
+            {
+                "account": account,
+                "date_from": date_from.isoformat(),
+                "date_to": date_to.isoformat(),
+                "rows": [_serialize_row(r) for r in rows],
+                "next_cursor": signing.dumps(next_after, salt=LEDGER_CURSOR_SALT) if next_after else None,
             }
         )
+
+
+class _Echo:
+    def write(self, value):
+        return value
+
+
+class CashLedgerExportView(APIView):
+    """Izvoz kartice blagajne za period kao CSV ili JSON stream (?fmt=csv|json)."""
+
+    def get(self, request):
+        date_from, date_to, error = _parse_range(request)
+        if error:
+            return error
+        fmt = (request.query_params.get("fmt") or "csv").lower()
+        if fmt not in ("csv", "json"):
+            return Response({"detail": f"Nepodrzan format: {fmt}."}, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            cash_account = get_default_cash_account()
+        except RuntimeError as exc:
+            return Response({"detail": str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+
+        rows = iter_account_ledger(cash_account, date_from, date_to)
+        filename = f"blagajna_{date_from.isoformat()}_{date_to.isoformat()}.{fmt}"
+        if fmt == "csv":
+            response = StreamingHttpResponse(self._csv(rows), content_type="text/csv; charset=utf-8")
+        else:
+            header = {
+                "account": {"id": cash_account.id, "code": cash_account.code, "name": cash_account.name},
+                "date_from": date_from.isoformat(),
+                "date_to": date_to.isoformat(),
+            }
+            response = StreamingHttpResponse(self._json(header, rows), content_type="application/json")
+        response["Content-Disposition"] = f'attachment; filename="{filename}"'
+        return response
+
+    @staticmethod
+    def _csv(rows):
+        writer = csv.writer(_Echo())
+        yield writer.writerow(["datum", "temeljnica", "opis", "duguje", "potrazuje", "saldo"])
+        for r in rows:
+            yield writer.writerow(
+                [r.entry_date.isoformat(), r.entry_number, r.description, r.debit, r.credit, r.balance]
+            )
+
+    @staticmethod
+    def _json(header, rows):
+        yield json.dumps(header, cls=DjangoJSONEncoder)[:-1] + ', "rows": ['
+        for index, r in enumerate(rows):
+            yield ("," if index else "") + json.dumps(_serialize_row(r), cls=DjangoJSONEncoder)
+        yield "]}"
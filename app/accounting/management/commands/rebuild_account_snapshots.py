@@ -0,0 +1,41 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from accounting.models import Account
+from accounting.services import rebuild_account_balance_snapshots
+
+
+class Command(BaseCommand):
+    help = "Compare AccountBalanceSnapshot rows with a full recomputation from posted journal items."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--account", help="Sifra konta (default: sva konta).")
+        parser.add_argument(
+            "--check",
+            action="store_true",
+            help="Samo prijavi odstupanja, bez ispravka.",
+        )
+
+    def handle(self, *args, **options):
+        account_ids = None
+        code = options.get("account")
+        if code:
+            account_ids = list(Account.objects.filter(code=code).values_list("id", flat=True))
+            if not account_ids:
+                raise CommandError(f"Konto {code} ne postoji.")
+
+        check_only = options["check"]
+        drift = rebuild_account_balance_snapshots(account_ids=account_ids, fix=not check_only)
+        for row in drift:
+            self.stdout.write(
+                f"{row['account_id']} {row['month']:%Y-%m}: "
+                f"D {row['debit_actual']} -> {row['debit_expected']}, "
+                f"P {row['credit_actual']} -> {row['credit_expected']}"
+            )
+
+        self.stdout.write(
+            "Rebuild complete. drift={drift} fixed={fixed}".format(
+                drift=len(drift), fixed=0 if check_only else len(drift)
+            )
+        )
+        if check_only and drift:
+            raise CommandError("AccountBalanceSnapshot nije uskladen s knjizenjima.")
@@ -0,0 +1,35 @@
+# Generated by Django 5.2.18 on 2026-10-17 13:14
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Max
+
+
+def init_sequences(apps, schema_editor):
+    Ledger = apps.get_model("accounting", "Ledger")
+    LedgerSequence = apps.get_model("accounting", "LedgerSequence")
+    for ledger in Ledger.objects.annotate(last=Max("entries__number")):
+        LedgerSequence.objects.create(ledger=ledger, last_number=ledger.last or 0)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounting', '0004_ledger_external_org_id'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LedgerSequence',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('last_number', models.PositiveIntegerField(default=0, verbose_name='Zadnji broj')),
+                ('ledger', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='sequence', to='accounting.ledger')),
+            ],
+            options={
+                'verbose_name': 'Brojac temeljnica',
+                'verbose_name_plural': 'Brojaci temeljnica',
+            },
+        ),
+        migrations.RunPython(init_sequences, migrations.RunPython.noop),
+    ]
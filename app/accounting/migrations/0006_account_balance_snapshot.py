@@ -0,0 +1,53 @@
+# Generated by Django 5.2.18 on 2026-10-17 13:18
+
+import django.db.models.deletion
+from decimal import Decimal
+from django.db import migrations, models
+from django.db.models import Sum
+from django.db.models.functions import TruncMonth
+
+
+def populate_snapshots(apps, schema_editor):
+    JournalItem = apps.get_model("accounting", "JournalItem")
+    AccountBalanceSnapshot = apps.get_model("accounting", "AccountBalanceSnapshot")
+    totals = (
+        JournalItem.objects.filter(entry__status="POSTED")
+        .annotate(month=TruncMonth("entry__date"))
+        .values("account_id", "month")
+        .annotate(d=Sum("debit"), c=Sum("credit"))
+        .order_by()
+    )
+    AccountBalanceSnapshot.objects.bulk_create(
+        [
+            AccountBalanceSnapshot(account_id=row["account_id"], month=row["month"], debit=row["d"], credit=row["c"])
+            for row in totals
+        ],
+        batch_size=500,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounting', '0005_ledger_sequence'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AccountBalanceSnapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('month', models.DateField(verbose_name='Mjesec')),
+                ('debit', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=18)),
+                ('credit', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=18)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('account', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='balance_snapshots', to='accounting.account')),
+            ],
+            options={
+                'verbose_name': 'Mjesecni promet konta',
+                'verbose_name_plural': 'Mjesecni prometi konta',
+                'constraints': [models.UniqueConstraint(fields=('account', 'month'), name='uq_account_snapshot_month')],
+            },
+        ),
+        migrations.RunPython(populate_snapshots, migrations.RunPython.noop),
+    ]
@@ -3,11 +3,14 @@ from decimal import Decimal
 
 from django.conf import settings
 from django.core.exceptions import ValidationError
-from django.db import models
+from django.db import IntegrityError, models, transaction
 from django.db.models.base import DEFERRED
-from django.db.models import Q, Sum
+from django.db.models import F, Max, Q, Sum
+from django.db.models.functions import TruncMonth
 from django.utils import timezone
 
+from accounting.periods import is_in_closed_period
+
 
 class Ledger(models.Model):
     """
@@ -47,6 +50,40 @@ class Ledger(models.Model):
         return f"{self.name}"
 
 
+class LedgerSequence(models.Model):
+    """
+    Brojac temeljnica po ledgeru. Red se zakljucava (select_for_update) do
+    kraja transakcije knjizenja, pa paralelna knjizenja dobivaju uzastopne
+    brojeve bez skeniranja MAX(number).
+    """
+    ledger = models.OneToOneField(Ledger, on_delete=models.CASCADE, related_name="sequence")
+    last_number = models.PositiveIntegerField(default=0, verbose_name="Zadnji broj")
+
+    class Meta:
+        verbose_name = "Brojac temeljnica"
+        verbose_name_plural = "Brojaci temeljnica"
+
+    def __str__(self) -> str:
+        return f"{self.ledger}: {self.last_number}"
+
+    @classmethod
+    def allocate(cls, ledger: Ledger, count: int = 1) -> range:
+        """Rezervira count uzastopnih brojeva temeljnica za ledger."""
+        if count < 1:
+            raise ValueError("Broj temeljnica mora biti barem 1.")
+        with transaction.atomic():
+            sequence = cls.objects.select_for_update().filter(ledger=ledger).first()
+            if sequence is None:
+                # Prvo koristenje: brojac krece od postojecih temeljnica.
+                last = JournalEntry.objects.filter(ledger=ledger).aggregate(last=Max("number"))["last"]
+                cls.objects.get_or_create(ledger=ledger, defaults={"last_number": last or 0})
+                sequence = cls.objects.select_for_update().get(ledger=ledger)
+            start = sequence.last_number + 1
+            sequence.last_number += count
+            sequence.save(update_fields=["last_number"])
+        return range(start, start + count)
+
+
 class Account(models.Model):
     class AccountType(models.TextChoices):
         ASSET = "ASSET", "Imovina"
@@ -211,22 +248,11 @@ class JournalEntry(models.Model):
         ]
 
     def clean(self):
-        period = Period.objects.filter(
-            ledger=self.ledger,
-            start_date__lte=self.date,
-            end_date__gte=self.date,
-            is_closed=True,
-        ).exists()
-        if period and self.status != self.Status.DRAFT:
+        if self.status != self.Status.DRAFT and self._is_in_closed_period():
             raise ValidationError("Ne mozes knjiziti u zakljucani period.")
 
     def _is_in_closed_period(self) -> bool:
-        return Period.objects.filter(
-            ledger=self.ledger,
-            start_date__lte=self.date,
-            end_date__gte=self.date,
-            is_closed=True,
-        ).exists()
+        return is_in_closed_period(self.ledger_id, self.date)
 
     def save(self, *args, **kwargs):
         is_update = self.pk is not None
@@ -253,7 +279,20 @@ class JournalEntry(models.Model):
             if self.status == self.Status.POSTED and self._is_in_closed_period():
                 raise ValidationError("Ne mozes spremiti proknjizenu temeljnicu u zakljucani period.")
 
-        super().save(*args, **kwargs)
+        # Svaki prijelaz u POSTED (post() ili status iz admin forme) ide u mjesecne promete.
+        becomes_posted = is_update and self._orig_status != self.Status.POSTED and self.status == self.Status.POSTED
+        if becomes_posted:
+            with transaction.atomic():
+                super().save(*args, **kwargs)
+                AccountBalanceSnapshot.apply_entries([self.pk])
+        else:
+            super().save(*args, **kwargs)
+
+        if not is_update and self.ledger_id and self.number:
+            # Rucno uneseni broj (admin, import) ne smije kasnije doci iz brojaca.
+            LedgerSequence.objects.filter(ledger_id=self.ledger_id, last_number__lt=self.number).update(
+                last_number=self.number
+            )
 
         self._orig_status = self.status
         self._orig_date = self.date
@@ -284,13 +323,7 @@ class JournalEntry(models.Model):
         if not self.is_balanced():
             raise ValidationError("Temeljnica nije uravnotezena (D != P).")
 
-        closed = Period.objects.filter(
-            ledger=self.ledger,
-            start_date__lte=self.date,
-            end_date__gte=self.date,
-            is_closed=True,
-        ).exists()
-        if closed:
+        if self._is_in_closed_period():
             raise ValidationError("Datum temeljnice je u zakljucanom periodu.")
 
         self.status = self.Status.POSTED
@@ -342,10 +375,7 @@ class JournalEntry(models.Model):
         return reversal
 
     def _next_reversal_number(self) -> int:
-        last = JournalEntry.objects.filter(ledger=self.ledger).aggregate(
-            max_number=models.Max("number")
-        )["max_number"]
-        return (last or 0) + 1
+        return LedgerSequence.allocate(self.ledger)[0]
 
 
 class JournalItem(models.Model):
@@ -424,4 +454,55 @@ class JournalItem(models.Model):
         amt = self.debit if self.debit > 0 else self.credit
         return f"{self.entry} {self.account.code} {side} {amt}"
 
-# Create your models here.
+
+class AccountBalanceSnapshot(models.Model):
+    """
+    Promet konta po mjesecu (samo proknjizene stavke). Azurira se pri
+    knjizenju, pa je stanje na dan = zbroj ranijih mjeseci + stavke
+    tekuceg mjeseca. rebuild_account_snapshots provjerava i ispravlja odstupanja.
+    """
+    account = models.ForeignKey(Account, on_delete=models.CASCADE, related_name="balance_snapshots")
+    month = models.DateField(verbose_name="Mjesec")  # prvi dan mjeseca
+    debit = models.DecimalField(max_digits=18, decimal_places=2, default=Decimal("0.00"))
+    credit = models.DecimalField(max_digits=18, decimal_places=2, default=Decimal("0.00"))
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = "Mjesecni promet konta"
+        verbose_name_plural = "Mjesecni prometi konta"
+        constraints = [
+            models.UniqueConstraint(
+                fields=["account", "month"],
+                name="uq_account_snapshot_month",
+            ),
+        ]
+
+    def __str__(self) -> str:
+        return f"{self.account} {self.month:%Y-%m}: D {self.debit} P {self.credit}"
+
+    @classmethod
+    def apply_entries(cls, entry_ids) -> None:
+        """Dodaje stavke upravo proknjizenih temeljnica u mjesecne promete."""
+        totals = (
+            JournalItem.objects.filter(entry_id__in=list(entry_ids))
+            .annotate(month=TruncMonth("entry__date"))
+            .values_list("account_id", "month")
+            .annotate(d=Sum("debit"), c=Sum("credit"))
+            .order_by("account_id", "month")
+        )
+        cls.apply_totals({(account_id, month): (debit, credit) for account_id, month, debit, credit in totals})
+
+    @classmethod
+    def apply_totals(cls, totals: dict) -> None:
+        """totals: (account_id, prvi dan mjeseca) -> (duguje, potrazuje)."""
+        now = timezone.now()
+        for (account_id, month), (debit, credit) in sorted(totals.items()):
+            key = {"account_id": account_id, "month": month}
+            changes = {"debit": F("debit") + debit, "credit": F("credit") + credit, "updated_at": now}
+            if cls.objects.filter(**key).update(**changes):
+                continue
+            try:
+                with transaction.atomic():
+                    cls.objects.create(**key, debit=debit, credit=credit)
+            except IntegrityError:
+                cls.objects.filter(**key).update(**changes)
@@ -0,0 +1,98 @@
+import logging
+import threading
+import uuid
+from bisect import bisect_right
+from datetime import date
+
+from django.core.cache import cache
+from django.db import connection, transaction
+
+logger = logging.getLogger(__name__)
+
+CLOSED_PERIODS_VERSION_KEY = "accounting:closed-periods-version"
+
+_lock = threading.Lock()
+_state = {"index": None, "version": None}
+# Dretva koja je spremila period u transakciji koja jos nije commitana
+# pita bazu dok transakcija ne zavrsi (indeks ne smije vidjeti necommitano).
+_pending = threading.local()
+
+
+def _load_index() -> dict[int, tuple[list[date], list[date]]]:
+    """Zakljucani periodi po ledgeru kao sortirani (pocetci, krajevi) za bisect."""
+    from accounting.models import Period
+
+    index: dict[int, tuple[list[date], list[date]]] = {}
+    rows = Period.objects.filter(is_closed=True).order_by("ledger_id", "start_date").values_list(
+        "ledger_id", "start_date", "end_date"
+    )
+    for ledger_id, start_date, end_date in rows:
+        starts, ends = index.setdefault(ledger_id, ([], []))
+        if ends and start_date <= ends[-1]:
+            ends[-1] = max(ends[-1], end_date)
+            continue
+        starts.append(start_date)
+        ends.append(end_date)
+    return index
+
+
+def _closed_in_db(ledger_id: int, day: date) -> bool:
+    from accounting.models import Period
+
+    return Period.objects.filter(
+        ledger_id=ledger_id,
+        start_date__lte=day,
+        end_date__gte=day,
+        is_closed=True,
+    ).exists()
+
+
+def is_in_closed_period(ledger_id: int, day: date) -> bool:
+    """
+    Je li datum u zakljucanom periodu ledgera. Indeks se ucitava jednom po
+    procesu i ponovno kad se promijeni verzija u dijeljenom cacheu; ako cache
+    nije dostupan, pita se baza (zakljucani period se ne smije propustiti).
+    """
+    if getattr(_pending, "value", False):
+        if connection.in_atomic_block:
+            return _closed_in_db(ledger_id, day)
+        # Transakcija je zavrsila bez commita (rollback).
+        _pending.value = False
+
+    try:
+        version = cache.get(CLOSED_PERIODS_VERSION_KEY)
+    except Exception:
+        logger.warning("Closed period cache version unavailable", exc_info=True)
+        return _closed_in_db(ledger_id, day)
+
+    with _lock:
+        index = _state["index"]
+        if index is None or version != _state["version"]:
+            index = _load_index()
+            _state.update(index=index, version=version)
+    starts, ends = index.get(ledger_id, ((), ()))
+    position = bisect_right(starts, day) - 1
+    return position >= 0 and day <= ends[position]
+
+
+def reset_closed_period_index() -> None:
+    """Brise lokalni indeks (i oznaku necommitane promjene u ovoj dretvi)."""
+    _pending.value = False
+    with _lock:
+        _state["index"] = None
+
+
+def _bump_version() -> None:
+    reset_closed_period_index()
+    try:
+        cache.set(CLOSED_PERIODS_VERSION_KEY, uuid.uuid4().hex, None)
+    except Exception:
+        logger.warning("Closed period cache version not bumped", exc_info=True)
+
+
+def invalidate_closed_periods() -> None:
+    """Poziva se nakon spremanja/brisanja perioda (accounting.signals); ostali procesi vide promjenu nakon commita."""
+    _pending.value = True
+    with _lock:
+        _state["index"] = None
+    transaction.on_commit(_bump_version)
@@ -1,12 +1,16 @@
 from dataclasses import dataclass
-from datetime import date
+from datetime import date, timedelta
 from decimal import Decimal, ROUND_HALF_UP
 from typing import Iterable
 
 from django.core.exceptions import ValidationError
-from django.db.models import Sum, Max
+from django.db import transaction
+from django.db.models import DecimalField, F, Q, RowRange, Subquery, Sum, Window
+from django.db.models.functions import TruncMonth
+from django.utils import timezone
 
-from accounting.models import Ledger, JournalItem, JournalEntry, Account
+from accounting.models import Account, AccountBalanceSnapshot, JournalEntry, JournalItem, Ledger, LedgerSequence
+from accounting.periods import is_in_closed_period
 from stock.models import StockAccountingConfig
 from configuration.models import DocumentType
 from orders.models import WarehouseInput, WarehouseInputItem
@@ -35,11 +39,18 @@ def get_default_cash_account() -> Account:
 
 
 def account_balance_as_of(account: Account, as_of_date: date) -> Decimal:
+    """Mjesecni prometi do pocetka mjeseca + proknjizene stavke tekuceg mjeseca."""
+    month_start = as_of_date.replace(day=1)
+    before = AccountBalanceSnapshot.objects.filter(account=account, month__lt=month_start).aggregate(
+        d=Sum("debit", default=Decimal("0.00")),
+        c=Sum("credit", default=Decimal("0.00")),
+    )
     totals = (
         JournalItem.objects
         .filter(
             account=account,
             entry__status=JournalEntry.Status.POSTED,
+            entry__date__gte=month_start,
             entry__date__lte=as_of_date,
         )
         .aggregate(
@@ -47,11 +58,60 @@ def account_balance_as_of(account: Account, as_of_date: date) -> Decimal:
             c=Sum("credit", default=Decimal("0.00")),
         )
     )
-    debit = totals["d"] or Decimal("0.00")
-    credit = totals["c"] or Decimal("0.00")
+    debit = (before["d"] or Decimal("0.00")) + (totals["d"] or Decimal("0.00"))
+    credit = (before["c"] or Decimal("0.00")) + (totals["c"] or Decimal("0.00"))
     return debit - credit
 
 
+def rebuild_account_balance_snapshots(*, account_ids=None, fix: bool = True) -> list[dict]:
+    """
+    Usporeduje AccountBalanceSnapshot s punim preracunom iz proknjizenih
+    stavki i (uz fix=True) ispravlja odstupanja. Vraca popis odstupanja.
+    """
+    items = JournalItem.objects.filter(entry__status=JournalEntry.Status.POSTED)
+    snapshots = AccountBalanceSnapshot.objects.all()
+    if account_ids is not None:
+        items = items.filter(account_id__in=account_ids)
+        snapshots = snapshots.filter(account_id__in=account_ids)
+
+    expected = {
+        (row["account_id"], row["month"]): (row["d"], row["c"])
+        for row in items.annotate(month=TruncMonth("entry__date"))
+        .values("account_id", "month")
+        .annotate(d=Sum("debit"), c=Sum("credit"))
+        .order_by()
+    }
+    actual = {(s.account_id, s.month): s for s in snapshots}
+
+    zero = (Decimal("0.00"), Decimal("0.00"))
+    drift = []
+    for key in sorted(set(expected) | set(actual)):
+        debit, credit = expected.get(key, zero)
+        snapshot = actual.get(key)
+        current = (snapshot.debit, snapshot.credit) if snapshot else zero
+        if current != (debit, credit):
+            drift.append(
+                {
+                    "account_id": key[0],
+                    "month": key[1],
+                    "debit_actual": current[0],
+                    "debit_expected": debit,
+                    "credit_actual": current[1],
+                    "credit_expected": credit,
+                }
+            )
+
+    if fix and drift:
+        with transaction.atomic():
+            for row in drift:
+                AccountBalanceSnapshot.objects.update_or_create(
+                    account_id=row["account_id"],
+                    month=row["month"],
+                    defaults={"debit": row["debit_expected"], "credit": row["credit_expected"]},
+                )
+    return drift
+
+
 @dataclass
 class LedgerRow:
     entry_id: int
@@ -60,48 +120,112 @@ class LedgerRow:
     description: str
     debit: Decimal
     credit: Decimal
+    item_id: int | None = None
+    balance: Decimal | None = None
 
 
-def account_ledger(account: Account, date_from: date, date_to: date):
-    qs = (
-        JournalItem.objects
-        .filter(
-            account=account,
-            entry__status=JournalEntry.Status.POSTED,
-            entry__date__gte=date_from,
-            entry__date__lte=date_to,
-        )
-        .select_related("entry")
-        .order_by("entry__date", "entry__number", "id")
+def _ledger_items(account: Account, date_from: date, date_to: date):
+    return JournalItem.objects.filter(
+        account=account,
+        entry__status=JournalEntry.Status.POSTED,
+        entry__date__gte=date_from,
+        entry__date__lte=date_to,
     )
 
-    opening = (
-        JournalItem.objects
-        .filter(
-            account=account,
-            entry__status=JournalEntry.Status.POSTED,
-            entry__date__lt=date_from,
+
+def account_ledger_page(
+    account: Account,
+    date_from: date,
+    date_to: date,
+    *,
+    after: dict | None = None,
+    limit: int = 500,
+) -> tuple[list[LedgerRow], dict | None]:
+    """
+    Jedna stranica kartice konta (keyset po datumu, broju temeljnice i
+    stavci). Keyset i LIMIT primjenjuju se u podupitu, a saldo nakon svake
+    stavke baza racuna (window SUM) samo nad tom stranicom; after je kursor
+    prethodne stranice i nosi saldo do tog mjesta, vezan uz konto i period.
+    Vraca retke i kursor sljedece stranice (None na kraju).
+    """
+    scope = {"account": account.id, "date_from": date_from.isoformat(), "date_to": date_to.isoformat()}
+    if after:
+        if any(after.get(key) != value for key, value in scope.items()):
+            raise ValueError("Cursor ne pripada ovoj kartici konta.")
+        balance = Decimal(after["balance"])
+        last_date = date.fromisoformat(after["date"])
+        qs = _ledger_items(account, date_from, date_to).filter(
+            Q(entry__date__gt=last_date)
+            | Q(entry__date=last_date, entry__number__gt=after["number"])
+            | Q(entry__date=last_date, entry__number=after["number"], id__gt=after["id"])
         )
-        .aggregate(
-            d=Sum("debit", default=Decimal("0.00")),
-            c=Sum("credit", default=Decimal("0.00")),
+    else:
+        balance = account_balance_as_of(account, date_from - timedelta(days=1))
+        qs = _ledger_items(account, date_from, date_to)
+
+    order_by = [F("entry__date").asc(), F("entry__number").asc(), F("id").asc()]
+    page_ids = qs.order_by(*order_by).values("id")[:limit]
+    running = Window(
+        Sum(F("debit") - F("credit"), output_field=DecimalField(max_digits=18, decimal_places=2)),
+        order_by=order_by,
+        frame=RowRange(start=None, end=0),
+    )
+    values = (
+        JournalItem.objects.filter(id__in=Subquery(page_ids))
+        .annotate(running=running)
+        .order_by(*order_by)
+        .values_list(
+            "id",
+            "entry_id",
+            "entry__number",
+            "entry__date",
+            "description",
+            "entry__description",
+            "debit",
+            "credit",
+            "running",
         )
     )
-    opening_balance = (opening["d"] or Decimal("0.00")) - (opening["c"] or Decimal("0.00"))
-
     rows = [
         LedgerRow(
-            entry_id=i.entry_id,
-            entry_number=i.entry.number,
-            entry_date=i.entry.date,
-            description=i.description or i.entry.description or "",
-            debit=i.debit,
-            credit=i.credit,
+            entry_id=entry_id,
+            entry_number=number,
+            entry_date=entry_date,
+            description=description or entry_description or "",
+            debit=debit,
+            credit=credit,
+            item_id=item_id,
+            balance=balance + running,
         )
-        for i in qs
+        for item_id, entry_id, number, entry_date, description, entry_description, debit, credit, running in values
     ]
+    if len(rows) < limit:
+        return rows, None
+    last = rows[-1]
+    return rows, {
+        **scope,
+        "date": last.entry_date.isoformat(),
+        "number": last.entry_number,
+        "id": last.item_id,
+        "balance": str(last.balance),
+    }
+
+
+def iter_account_ledger(account: Account, date_from: date, date_to: date, *, chunk_size: int = 1000):
+    """Svi retci kartice za period, stranicu po stranicu (za streaming izvoz)."""
+    after = None
+    while True:
+        rows, after = account_ledger_page(account, date_from, date_to, after=after, limit=chunk_size)
+        yield from rows
+        if after is None:
+            return
+
+
+def account_ledger(account: Account, date_from: date, date_to: date):
+    opening_balance = account_balance_as_of(account, date_from - timedelta(days=1))
+    rows = list(iter_account_ledger(account, date_from, date_to))
 
-    totals = qs.aggregate(
+    totals = _ledger_items(account, date_from, date_to).aggregate(
         d=Sum("debit", default=Decimal("0.00")),
         c=Sum("credit", default=Decimal("0.00")),
     )
@@ -248,12 +372,119 @@ def flatten_input_items(inputs: Iterable[WarehouseInput]) -> list[WarehouseInput
 
 
 def _next_entry_number(ledger: Ledger) -> int:
-    last = JournalEntry.objects.filter(ledger=ledger).aggregate(
-        max_number=Max("number")
-    )["max_number"]
-    if last is None:
-        last = JournalEntry.objects.filter(ledger=ledger).order_by("-number").values_list("number", flat=True).first()
-    return (last or 0) + 1
+    return LedgerSequence.allocate(ledger)[0]
+
+
+def allocate_entry_numbers(ledger: Ledger, count: int) -> range:
+    """Rezervira count brojeva temeljnica odjednom (skupno knjizenje)."""
+    return LedgerSequence.allocate(ledger, count)
+
+
+@dataclass
+class JournalLineSpec:
+    account: Account
+    debit: Decimal = Decimal("0.00")
+    credit: Decimal = Decimal("0.00")
+    description: str = ""
+
+
+@dataclass
+class JournalEntrySpec:
+    ledger: Ledger
+    date: date
+    lines: list[JournalLineSpec]
+    description: str = ""
+
+
+def _validate_entry_spec(spec: JournalEntrySpec) -> None:
+    if not spec.lines:
+        raise ValidationError("Temeljnica mora imati barem jednu stavku (realno: barem 2).")
+    debit = credit = Decimal("0.00")
+    for line in spec.lines:
+        if line.account.ledger_id != spec.ledger.id:
+            raise ValidationError("Konto i temeljnica moraju biti u istom ledgeru.")
+        if not line.account.is_postable:
+            raise ValidationError({"account": "Ne mozes knjiziti na konto koji nije postable (grupni konto)."})
+        if line.debit < 0 or line.credit < 0 or (line.debit > 0) == (line.credit > 0):
+            raise ValidationError("Stavka mora imati pozitivan iznos samo na jednoj strani (D ili P).")
+        debit += line.debit
+        credit += line.credit
+    if debit != credit:
+        raise ValidationError("Temeljnica nije uravnotezena (D != P).")
+    if is_in_closed_period(spec.ledger.id, spec.date):
+        raise ValidationError("Datum temeljnice je u zakljucanom periodu.")
+
+
+@transaction.atomic
+def post_entries_bulk(specs: Iterable[JournalEntrySpec], *, posted_by=None) -> list[JournalEntry]:
+    """
+    Knjizi vise temeljnica odjednom: balans, konta i zakljucani periodi
+    provjeravaju se u memoriji (indeks zakljucanih perioda), brojevi se
+    rezerviraju u bloku po ledgeru, a temeljnice i stavke spremaju preko
+    bulk_create. Ako ijedna temeljnica nije ispravna, ne knjizi se nista.
+    """
+    specs = list(specs)
+    if not specs:
+        return []
+    ledger_ids = {spec.ledger.id for spec in specs}
+    for spec in specs:
+        _validate_entry_spec(spec)
+
+    numbers = {}
+    for ledger_id in ledger_ids:
+        ledger = next(spec.ledger for spec in specs if spec.ledger.id == ledger_id)
+        count = sum(1 for spec in specs if spec.ledger.id == ledger_id)
+        numbers[ledger_id] = iter(allocate_entry_numbers(ledger, count))
+
+    posted_at = timezone.now()
+    entries = JournalEntry.objects.bulk_create(
+        [
+            JournalEntry(
+                ledger=spec.ledger,
+                number=next(numbers[spec.ledger.id]),
+                date=spec.date,
+                description=spec.description,
+                status=JournalEntry.Status.POSTED,
+                posted_at=posted_at,
+                posted_by=posted_by,
+            )
+            for spec in specs
+        ]
+    )
+    JournalItem.objects.bulk_create(
+        [
+            JournalItem(
+                entry=entry,
+                account=line.account,
+                debit=line.debit,
+                credit=line.credit,
+                description=line.description,
+            )
+            for entry, spec in zip(entries, specs)
+            for line in spec.lines
+        ],
+        batch_size=1000,
+    )
+    totals: dict = {}
+    for spec in specs:
+        month = spec.date.replace(day=1)
+        for line in spec.lines:
+            debit, credit = totals.get((line.account.id, month), (Decimal("0.00"), Decimal("0.00")))
+            totals[(line.account.id, month)] = (debit + line.debit, credit + line.credit)
+    AccountBalanceSnapshot.apply_totals(totals)
+    return entries
+
+
+def _post_entry(
+    *,
+    ledger: Ledger,
+    date: date,
+    description: str,
+    lines: list[JournalLineSpec],
+    posted_by=None,
+) -> JournalEntry:
+    spec = JournalEntrySpec(ledger=ledger, date=date, description=description, lines=lines)
+    return post_entries_bulk([spec], posted_by=posted_by)[0]
 
 
 def post_sales_invoice(
@@ -275,36 +506,33 @@ def post_sales_invoice(
     ledger = document_type.ledger or get_single_ledger()
     gross = net + vat
 
-    entry = JournalEntry.objects.create(
-        ledger=ledger,
-        number=_next_entry_number(ledger),
-        date=date,
-        description=description or "Izlazni racun",
-        status=JournalEntry.Status.DRAFT,
-    )
-
-    JournalItem.objects.create(
-        entry=entry,
-        account=document_type.ar_account,
-        debit=gross,
-        credit=Decimal("0.00"),
-    )
-    JournalItem.objects.create(
-        entry=entry,
-        account=document_type.revenue_account,
-        debit=Decimal("0.00"),
-        credit=net,
-    )
+    lines = [
+        JournalLineSpec(
+            account=document_type.ar_account,
+            debit=gross,
+            credit=Decimal("0.00"),
+        ),
+        JournalLineSpec(
+            account=document_type.revenue_account,
+            debit=Decimal("0.00"),
+            credit=net,
+        ),
+    ]
 
     if vat != Decimal("0.00"):
-        JournalItem.objects.create(
-            entry=entry,
+        lines.append(JournalLineSpec(
             account=document_type.vat_output_account,
             debit=Decimal("0.00"),
             credit=vat,
-        )
+        ))
 
-    entry.post(user=posted_by)
+    entry = _post_entry(
+        ledger=ledger,
+        date=date,
+        description=description or "Izlazni racun",
+        lines=lines,
+        posted_by=posted_by,
+    )
     return entry
 
 
@@ -328,36 +556,33 @@ def post_sales_cash(
     ledger = document_type.ledger or get_single_ledger()
     gross = net + vat
 
-    entry = JournalEntry.objects.create(
-        ledger=ledger,
-        number=_next_entry_number(ledger),
-        date=date,
-        description=description or "Gotovinska prodaja",
-        status=JournalEntry.Status.DRAFT,
-    )
-
-    JournalItem.objects.create(
-        entry=entry,
-        account=cash_account,
-        debit=gross,
-        credit=Decimal("0.00"),
-    )
-    JournalItem.objects.create(
-        entry=entry,
-        account=document_type.revenue_account,
-        debit=Decimal("0.00"),
-        credit=net,
-    )
+    lines = [
+        JournalLineSpec(
+            account=cash_account,
+            debit=gross,
+            credit=Decimal("0.00"),
+        ),
+        JournalLineSpec(
+            account=document_type.revenue_account,
+            debit=Decimal("0.00"),
+            credit=net,
+        ),
+    ]
 
     if vat != Decimal("0.00"):
-        JournalItem.objects.create(
-            entry=entry,
+        lines.append(JournalLineSpec(
             account=document_type.vat_output_account,
             debit=Decimal("0.00"),
             credit=vat,
-        )
+        ))
 
-    entry.post(user=posted_by)
+    entry = _post_entry(
+        ledger=ledger,
+        date=date,
+        description=description or "Gotovinska prodaja",
+        lines=lines,
+        posted_by=posted_by,
+    )
     return entry
 
 
@@ -396,46 +621,42 @@ def post_sales_cash_accounts(
     revenue_credit = net - (pnp_amount or Decimal("0.00"))
     if revenue_credit < Decimal("0.00"):
         raise ValidationError("Prihod ne može biti negativan nakon PnP.")
-    entry = JournalEntry.objects.create(
-        ledger=ledger,
-        number=_next_entry_number(ledger),
-        date=date,
-        description=description or "Z dnevno (gotovinska prodaja)",
-        status=JournalEntry.Status.DRAFT,
-    )
-
-    JournalItem.objects.create(
-        entry=entry,
-        account=cash_account,
-        debit=gross,
-        credit=Decimal("0.00"),
-        description="Gotovinska prodaja (blagajna)",
-    )
-    JournalItem.objects.create(
-        entry=entry,
-        account=revenue_account,
-        debit=Decimal("0.00"),
-        credit=revenue_credit,
-        description="Prihod od prodaje (osnovica)",
-    )
+    lines = [
+        JournalLineSpec(
+            account=cash_account,
+            debit=gross,
+            credit=Decimal("0.00"),
+            description="Gotovinska prodaja (blagajna)",
+        ),
+        JournalLineSpec(
+            account=revenue_account,
+            debit=Decimal("0.00"),
+            credit=revenue_credit,
+            description="Prihod od prodaje (osnovica)",
+        ),
+    ]
     if pnp_amount and pnp_amount > Decimal("0.00"):
-        JournalItem.objects.create(
-            entry=entry,
+        lines.append(JournalLineSpec(
             account=pnp_account,
             debit=Decimal("0.00"),
             credit=pnp_amount,
             description="PnP obveza",
-        )
+        ))
     if vat != Decimal("0.00"):
-        JournalItem.objects.create(
-            entry=entry,
+        lines.append(JournalLineSpec(
             account=vat_output_account,
             debit=Decimal("0.00"),
             credit=vat,
             description="PDV obveza (25%)",
-        )
+        ))
 
-    entry.post(user=posted_by)
+    entry = _post_entry(
+        ledger=ledger,
+        date=date,
+        description=description or "Z dnevno (gotovinska prodaja)",
+        lines=lines,
+        posted_by=posted_by,
+    )
     return entry
 
 
@@ -471,49 +692,45 @@ def post_purchase_invoice_cash_from_items(
 
     ledger = document_type.ledger or get_single_ledger()
 
-    entry = JournalEntry.objects.create(
-        ledger=ledger,
-        number=_next_entry_number(ledger),
-        date=doc_date,
-        description=description or "Ulazni račun (gotovina)",
-        status=JournalEntry.Status.DRAFT,
-    )
-
-    JournalItem.objects.create(
-        entry=entry,
-        account=document_type.expense_account,
-        debit=totals.net_total,
-        credit=Decimal("0.00"),
-        description="Nabava/trošak (osnovica)",
-    )
+    lines = [
+        JournalLineSpec(
+            account=document_type.expense_account,
+            debit=totals.net_total,
+            credit=Decimal("0.00"),
+            description="Nabava/trošak (osnovica)",
+        ),
+    ]
 
     if totals.vat_total != Decimal("0.00"):
-        JournalItem.objects.create(
-            entry=entry,
+        lines.append(JournalLineSpec(
             account=document_type.vat_input_account,
             debit=totals.vat_total,
             credit=Decimal("0.00"),
             description="Pretporez (PDV ulaz)",
-        )
+        ))
 
     if totals.deposit_total != Decimal("0.00"):
-        JournalItem.objects.create(
-            entry=entry,
+        lines.append(JournalLineSpec(
             account=deposit_account,
             debit=totals.deposit_total,
             credit=Decimal("0.00"),
             description="Povratna naknada (ambalaža/depozit)",
-        )
+        ))
 
-    JournalItem.objects.create(
-        entry=entry,
+    lines.append(JournalLineSpec(
         account=cash_account,
         debit=Decimal("0.00"),
         credit=totals.payable_total,
         description="Plaćeno gotovinom",
-    )
+    ))
 
-    entry.post(user=posted_by)
+    entry = _post_entry(
+        ledger=ledger,
+        date=doc_date,
+        description=description or "Ulazni račun (gotovina)",
+        lines=lines,
+        posted_by=posted_by,
+    )
     return entry
 
 
@@ -548,49 +765,45 @@ def post_purchase_invoice_deferred_from_items(
 
     ledger = document_type.ledger or get_single_ledger()
 
-    entry = JournalEntry.objects.create(
-        ledger=ledger,
-        number=_next_entry_number(ledger),
-        date=doc_date,
-        description=description or "Ulazni racun (odgoda)",
-        status=JournalEntry.Status.DRAFT,
-    )
-
-    JournalItem.objects.create(
-        entry=entry,
-        account=document_type.expense_account,
-        debit=totals.net_total,
-        credit=Decimal("0.00"),
-        description="Nabava/trošak (osnovica)",
-    )
+    lines = [
+        JournalLineSpec(
+            account=document_type.expense_account,
+            debit=totals.net_total,
+            credit=Decimal("0.00"),
+            description="Nabava/trošak (osnovica)",
+        ),
+    ]
 
     if totals.vat_total != Decimal("0.00"):
-        JournalItem.objects.create(
-            entry=entry,
+        lines.append(JournalLineSpec(
             account=document_type.vat_input_account,
             debit=totals.vat_total,
             credit=Decimal("0.00"),
             description="Pretporez (PDV ulaz)",
-        )
+        ))
 
     if totals.deposit_total != Decimal("0.00"):
-        JournalItem.objects.create(
-            entry=entry,
+        lines.append(JournalLineSpec(
             account=deposit_account,
             debit=totals.deposit_total,
             credit=Decimal("0.00"),
             description="Povratna naknada (ambalaža/depozit)",
-        )
+        ))
 
-    JournalItem.objects.create(
-        entry=entry,
+    lines.append(JournalLineSpec(
         account=ap_account,
         debit=Decimal("0.00"),
         credit=totals.payable_total,
         description="Dobavljac (odgoda)",
-    )
+    ))
 
-    entry.post(user=posted_by)
+    entry = _post_entry(
+        ledger=ledger,
+        date=doc_date,
+        description=description or "Ulazni racun (odgoda)",
+        lines=lines,
+        posted_by=posted_by,
+    )
     return entry
 
 
@@ -614,30 +827,28 @@ def post_supplier_invoice_payment(
         raise ValidationError("Payment konto mora biti postable.")
 
     ledger = invoice.document_type.ledger if invoice.document_type_id else get_single_ledger()
-    entry = JournalEntry.objects.create(
+    lines = [
+        JournalLineSpec(
+            account=invoice.ap_account,
+            debit=amount,
+            credit=Decimal("0.00"),
+            description="Dobavljac (placanje)",
+        ),
+        JournalLineSpec(
+            account=payment_account,
+            debit=Decimal("0.00"),
+            credit=amount,
+            description="Placanje",
+        ),
+    ]
+
+    entry = _post_entry(
         ledger=ledger,
-        number=_next_entry_number(ledger),
         date=paid_date,
         description=f"Placanje racuna {invoice.invoice_number}",
-        status=JournalEntry.Status.DRAFT,
-    )
-
-    JournalItem.objects.create(
-        entry=entry,
-        account=invoice.ap_account,
-        debit=amount,
-        credit=Decimal("0.00"),
-        description="Dobavljac (placanje)",
-    )
-    JournalItem.objects.create(
-        entry=entry,
-        account=payment_account,
-        debit=Decimal("0.00"),
-        credit=amount,
-        description="Placanje",
+        lines=lines,
+        posted_by=posted_by,
     )
-
-    entry.post(user=posted_by)
     return entry
 
 
@@ -711,58 +922,53 @@ def post_purchase_invoice_close_receipt(
         label="counterpart_account",
     )
 
-    entry = JournalEntry.objects.create(
-        ledger=ledger,
-        number=_next_entry_number(ledger),
-        date=doc_date,
-        description=description or "Ulazni racun (zatvaranje primke)",
-        status=JournalEntry.Status.DRAFT,
-    )
-
-    JournalItem.objects.create(
-        entry=entry,
-        account=counterpart_account,
-        debit=totals.net_total,
-        credit=Decimal("0.00"),
-        description="Zatvaranje primke (osnovica)",
-    )
+    lines = [
+        JournalLineSpec(
+            account=counterpart_account,
+            debit=totals.net_total,
+            credit=Decimal("0.00"),
+            description="Zatvaranje primke (osnovica)",
+        ),
+    ]
 
     if totals.vat_total != Decimal("0.00"):
-        JournalItem.objects.create(
-            entry=entry,
+        lines.append(JournalLineSpec(
             account=document_type.vat_input_account,
             debit=totals.vat_total,
             credit=Decimal("0.00"),
             description="Pretporez (PDV ulaz)",
-        )
+        ))
 
     if totals.deposit_total != Decimal("0.00"):
-        JournalItem.objects.create(
-            entry=entry,
+        lines.append(JournalLineSpec(
             account=deposit_account,
             debit=totals.deposit_total,
             credit=Decimal("0.00"),
             description="Povratna naknada (ambalaža/depozit)",
-        )
+        ))
 
     if include_cash_payment:
-        JournalItem.objects.create(
-            entry=entry,
+        lines.append(JournalLineSpec(
             account=cash_account,
             debit=Decimal("0.00"),
             credit=totals.payable_total,
             description="Placanje gotovinom",
-        )
+        ))
     else:
-        JournalItem.objects.create(
-            entry=entry,
+        lines.append(JournalLineSpec(
             account=ap_account,
             debit=Decimal("0.00"),
             credit=totals.payable_total,
             description="Dobavljac",
-        )
+        ))
 
-    entry.post(user=posted_by)
+    entry = _post_entry(
+        ledger=ledger,
+        date=doc_date,
+        description=description or "Ulazni racun (zatvaranje primke)",
+        lines=lines,
+        posted_by=posted_by,
+    )
     return entry
 
 
@@ -847,30 +1053,28 @@ def post_warehouse_input_to_journal(*, warehouse_input: WarehouseInput, user=Non
     if total <= 0:
         raise ValidationError("Ukupan iznos primke mora biti > 0.")
 
-    entry = JournalEntry.objects.create(
+    lines = [
+        JournalLineSpec(
+            account=stock_account,
+            debit=total,
+            credit=Decimal("0.00"),
+            description="Zaliha (primka)",
+        ),
+        JournalLineSpec(
+            account=counterpart_account,
+            debit=Decimal("0.00"),
+            credit=total,
+            description="Protustavka (primka)",
+        ),
+    ]
+
+    entry = _post_entry(
         ledger=ledger,
-        number=_next_entry_number(ledger),
         date=warehouse_input.date,
         description=f"Primka #{warehouse_input.id}",
-        status=JournalEntry.Status.DRAFT,
+        lines=lines,
+        posted_by=user,
     )
-
-    JournalItem.objects.create(
-        entry=entry,
-        account=stock_account,
-        debit=total,
-        credit=Decimal("0.00"),
-        description="Zaliha (primka)",
-    )
-    JournalItem.objects.create(
-        entry=entry,
-        account=counterpart_account,
-        debit=Decimal("0.00"),
-        credit=total,
-        description="Protustavka (primka)",
-    )
-
-    entry.post(user=user)
     warehouse_input.journal_entry = entry
     warehouse_input.save(update_fields=["journal_entry"])
     return entry
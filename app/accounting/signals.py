@@ -0,0 +1,12 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from accounting.models import Period
+from accounting.periods import invalidate_closed_periods
+
+
+@receiver(post_save, sender=Period)
+@receiver(post_delete, sender=Period)
+def invalidate_closed_periods_on_change(sender, instance, **kwargs):
+    # post_delete stize i iz QuerySet.delete() (admin "delete selected").
+    invalidate_closed_periods()
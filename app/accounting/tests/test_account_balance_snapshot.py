@@ -0,0 +1,144 @@
+from datetime import date
+from decimal import Decimal
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import CommandError, call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from accounting.models import Account, AccountBalanceSnapshot, JournalEntry, JournalItem, Ledger
+from accounting.periods import reset_closed_period_index
+from accounting.services import (
+    JournalEntrySpec,
+    JournalLineSpec,
+    account_balance_as_of,
+    post_entries_bulk,
+    rebuild_account_balance_snapshots,
+)
+
+
+@override_settings(CACHES={"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}})
+class AccountBalanceSnapshotTests(TestCase):
+    def setUp(self):
+        reset_closed_period_index()
+        self.ledger = Ledger.objects.create(name="Mozart")
+        self.cash = Account.objects.create(
+            ledger=self.ledger,
+            code="10220",
+            name="Blagajna",
+            type=Account.AccountType.ASSET,
+            normal_side=Account.NormalSide.DEBIT,
+        )
+        self.revenue = Account.objects.create(
+            ledger=self.ledger,
+            code="7603",
+            name="Prihod",
+            type=Account.AccountType.INCOME,
+            normal_side=Account.NormalSide.CREDIT,
+        )
+
+    def _spec(self, day, amount):
+        amount = Decimal(amount)
+        return JournalEntrySpec(
+            ledger=self.ledger,
+            date=day,
+            lines=[
+                JournalLineSpec(account=self.cash, debit=amount),
+                JournalLineSpec(account=self.revenue, credit=amount),
+            ],
+        )
+
+    def test_balance_from_snapshots_and_current_month(self):
+        post_entries_bulk([
+            self._spec(date(2026, 1, 10), "100.00"),
+            self._spec(date(2026, 1, 20), "50.00"),
+            self._spec(date(2026, 2, 3), "20.00"),
+            self._spec(date(2026, 2, 25), "7.00"),
+        ])
+        snapshot = AccountBalanceSnapshot.objects.get(account=self.cash, month=date(2026, 1, 1))
+        self.assertEqual((snapshot.debit, snapshot.credit), (Decimal("150.00"), Decimal("0.00")))
+
+        with self.assertNumQueries(2):
+            self.assertEqual(account_balance_as_of(self.cash, date(2026, 2, 10)), Decimal("170.00"))
+        self.assertEqual(account_balance_as_of(self.cash, date(2026, 1, 15)), Decimal("100.00"))
+        self.assertEqual(account_balance_as_of(self.revenue, date(2026, 3, 1)), Decimal("-177.00"))
+
+    def test_post_and_reverse_update_snapshots(self):
+        entry = JournalEntry.objects.create(ledger=self.ledger, number=1, date=date(2026, 3, 5))
+        JournalItem.objects.create(entry=entry, account=self.cash, debit=Decimal("30.00"))
+        JournalItem.objects.create(entry=entry, account=self.revenue, credit=Decimal("30.00"))
+        entry.post()
+        self.assertEqual(account_balance_as_of(self.cash, date(2026, 4, 1)), Decimal("30.00"))
+
+        entry.reverse(reverse_date=date(2026, 4, 2))
+        self.assertEqual(account_balance_as_of(self.cash, date(2026, 4, 30)), Decimal("0.00"))
+        self.assertEqual(account_balance_as_of(self.cash, date(2026, 4, 1)), Decimal("30.00"))
+
+    def test_rebuild_command_reports_and_fixes_drift(self):
+        post_entries_bulk([self._spec(date(2026, 1, 10), "100.00")])
+        AccountBalanceSnapshot.objects.filter(account=self.cash).update(debit=Decimal("90.00"))
+
+        with self.assertRaises(CommandError):
+            call_command("rebuild_account_snapshots", "--check", stdout=StringIO())
+
+        out = StringIO()
+        call_command("rebuild_account_snapshots", stdout=out)
+        self.assertIn("drift=1 fixed=1", out.getvalue())
+        self.assertEqual(account_balance_as_of(self.cash, date(2026, 2, 1)), Decimal("100.00"))
+
+
+@override_settings(CACHES={"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}})
+class AdminPostedEntrySnapshotTests(TestCase):
+    def setUp(self):
+        reset_closed_period_index()
+        self.ledger = Ledger.objects.create(name="Mozart")
+        self.cash = Account.objects.create(
+            ledger=self.ledger,
+            code="10220",
+            name="Blagajna",
+            type=Account.AccountType.ASSET,
+            normal_side=Account.NormalSide.DEBIT,
+        )
+        self.revenue = Account.objects.create(
+            ledger=self.ledger,
+            code="7603",
+            name="Prihod",
+            type=Account.AccountType.INCOME,
+            normal_side=Account.NormalSide.CREDIT,
+        )
+        self.entry = JournalEntry.objects.create(ledger=self.ledger, number=1, date=date(2026, 1, 10))
+        JournalItem.objects.create(entry=self.entry, account=self.cash, debit=Decimal("40.00"))
+        JournalItem.objects.create(entry=self.entry, account=self.revenue, credit=Decimal("40.00"))
+        self.client.force_login(
+            get_user_model().objects.create_superuser(username="admin", password="x", email="a@example.com")
+        )
+
+    def test_status_saved_as_posted_updates_snapshots(self):
+        # ModelAdmin.save_model samo postavi status i pozove save(), bez post().
+        self.entry.status = JournalEntry.Status.POSTED
+        self.entry.save()
+
+        self.assertEqual(account_balance_as_of(self.cash, date(2026, 3, 1)), Decimal("40.00"))
+        self.assertEqual(rebuild_account_balance_snapshots(fix=False), [])
+
+    def test_admin_change_form_keeps_snapshots_consistent(self):
+        # Stavke se ne salju: JournalItem.clean odbija stavke proknjizene
+        # temeljnice, pa se u adminu knjizi samo zaglavlje.
+        data = {
+            "number": "1",
+            "date": "2026-01-10",
+            "description": "",
+            "status": JournalEntry.Status.POSTED,
+            "items-TOTAL_FORMS": "0",
+            "items-INITIAL_FORMS": "0",
+            "items-MIN_NUM_FORMS": "0",
+            "items-MAX_NUM_FORMS": "1000",
+        }
+        response = self.client.post(reverse("admin:accounting_journalentry_change", args=[self.entry.id]), data)
+
+        self.assertEqual(response.status_code, 302)
+        self.entry.refresh_from_db()
+        self.assertEqual(self.entry.status, JournalEntry.Status.POSTED)
+        self.assertEqual(account_balance_as_of(self.cash, date(2026, 3, 1)), Decimal("40.00"))
+        self.assertEqual(rebuild_account_balance_snapshots(fix=False), [])
@@ -0,0 +1,127 @@
+import json
+from datetime import date
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from accounting.models import Account, JournalEntry, JournalItem, Ledger
+from accounting.services import account_ledger, account_ledger_page, iter_account_ledger
+from stock.models import StockAccountingConfig, WarehouseId
+
+
+class AccountLedgerPageTests(TestCase):
+    def setUp(self):
+        self.ledger = Ledger.objects.create(name="Mozart")
+        self.cash = Account.objects.create(
+            ledger=self.ledger,
+            code="1020",
+            name="Blagajna",
+            type=Account.AccountType.ASSET,
+            normal_side=Account.NormalSide.DEBIT,
+            is_postable=True,
+            is_active=True,
+        )
+        self.other = Account.objects.create(
+            ledger=self.ledger,
+            code="7500",
+            name="Prihod",
+            type=Account.AccountType.INCOME,
+            normal_side=Account.NormalSide.CREDIT,
+            is_postable=True,
+            is_active=True,
+        )
+        warehouse = WarehouseId.objects.create(rm_id=4, name="Sank")
+        StockAccountingConfig.objects.create(
+            inventory_account=self.other,
+            cogs_account=self.other,
+            default_sale_warehouse=warehouse,
+            default_purchase_warehouse=warehouse,
+            default_cash_account=self.cash,
+        )
+        self._post(1, date(2026, 5, 31), Decimal("100.00"), Decimal("0.00"))
+        amounts = [("10.00", "0.00"), ("0.00", "4.00"), ("7.50", "0.00"), ("0.00", "1.50"), ("3.00", "0.00")]
+        for number, (debit, credit) in enumerate(amounts, start=2):
+            self._post(number, date(2026, 6, number), Decimal(debit), Decimal(credit))
+        self.date_from = date(2026, 6, 1)
+        self.date_to = date(2026, 6, 30)
+
+    def _post(self, number, day, debit, credit):
+        entry = JournalEntry.objects.create(
+            ledger=self.ledger,
+            number=number,
+            date=day,
+            status=JournalEntry.Status.DRAFT,
+            description=f"Temeljnica {number}",
+        )
+        JournalItem.objects.create(entry=entry, account=self.cash, debit=debit, credit=credit)
+        JournalItem.objects.create(entry=entry, account=self.other, debit=credit, credit=debit)
+        entry.post()
+
+    def test_pages_carry_running_balance(self):
+        rows, after = account_ledger_page(self.cash, self.date_from, self.date_to, limit=2)
+        self.assertEqual([r.balance for r in rows], [Decimal("110.00"), Decimal("106.00")])
+        self.assertIsNotNone(after)
+
+        rows, after = account_ledger_page(self.cash, self.date_from, self.date_to, after=after, limit=2)
+        self.assertEqual([r.balance for r in rows], [Decimal("113.50"), Decimal("112.00")])
+
+        rows, after = account_ledger_page(self.cash, self.date_from, self.date_to, after=after, limit=2)
+        self.assertEqual([r.balance for r in rows], [Decimal("115.00")])
+        self.assertIsNone(after)
+
+    def test_streamed_rows_match_full_ledger(self):
+        report = account_ledger(self.cash, self.date_from, self.date_to)
+        streamed = list(iter_account_ledger(self.cash, self.date_from, self.date_to, chunk_size=2))
+        self.assertEqual(
+            [(r.entry_number, r.balance) for r in streamed],
+            [(r.entry_number, r.balance) for r in report["rows"]],
+        )
+        self.assertEqual(streamed[-1].balance, report["closing_balance"])
+
+    def test_api_cursor_pagination(self):
+        client = APIClient()
+        client.force_authenticate(get_user_model().objects.create_user(username="sef", password="x"))
+        url = reverse("api-cash-ledger")
+        params = {"date_from": "2026-06-01", "date_to": "2026-06-30", "limit": 3}
+
+        first = client.get(url, params).json()
+        self.assertEqual([r["entry_number"] for r in first["rows"]], [2, 3, 4])
+        second = client.get(url, {**params, "cursor": first["next_cursor"]}).json()
+        self.assertEqual([r["entry_number"] for r in second["rows"]], [5, 6])
+        self.assertEqual(Decimal(second["rows"][-1]["balance"]), Decimal("115.00"))
+        self.assertIsNone(second["next_cursor"])
+
+        response = client.get(url, {**params, "cursor": "krivo"})
+        self.assertEqual(response.status_code, 400)
+
+        # Kursor nosi saldo za svoj period; s drugim periodom se odbija.
+        response = client.get(url, {**params, "date_from": "2026-06-03", "cursor": first["next_cursor"]})
+        self.assertEqual(response.status_code, 400)
+
+    def test_cursor_is_bound_to_account_and_range(self):
+        _, after = account_ledger_page(self.cash, self.date_from, self.date_to, limit=2)
+        with self.assertRaises(ValueError):
+            account_ledger_page(self.other, self.date_from, self.date_to, after=after, limit=2)
+        with self.assertRaises(ValueError):
+            account_ledger_page(self.cash, self.date_from, date(2026, 7, 31), after=after, limit=2)
+
+    def test_api_streaming_export(self):
+        client = APIClient()
+        client.force_authenticate(get_user_model().objects.create_user(username="sef", password="x"))
+        url = reverse("api-cash-ledger-export")
+        params = {"date_from": "2026-06-01", "date_to": "2026-06-30"}
+
+        response = client.get(url, params)
+        self.assertTrue(response.streaming)
+        lines = b"".join(response.streaming_content).decode().splitlines()
+        self.assertEqual(lines[0], "datum,temeljnica,opis,duguje,potrazuje,saldo")
+        self.assertEqual(len(lines), 6)
+        self.assertTrue(lines[-1].endswith(",115.00"))
+
+        response = client.get(url, {**params, "fmt": "json"})
+        payload = json.loads(b"".join(response.streaming_content))
+        self.assertEqual(payload["account"]["code"], "1020")
+        self.assertEqual([r["balance"] for r in payload["rows"]][-1], "115.00")
@@ -0,0 +1,108 @@
+from datetime import date
+from decimal import Decimal
+
+from django.core.exceptions import ValidationError
+from django.test import TestCase, override_settings
+
+from accounting.models import Account, JournalEntry, JournalItem, Ledger, Period
+from accounting.periods import is_in_closed_period, reset_closed_period_index
+from accounting.services import post_sales_cash_accounts
+
+
+@override_settings(CACHES={"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}})
+class ClosedPeriodIndexTests(TestCase):
+    def setUp(self):
+        reset_closed_period_index()
+        self.ledger = Ledger.objects.create(name="Mozart")
+        self.cash = Account.objects.create(
+            ledger=self.ledger,
+            code="10220",
+            name="Blagajna",
+            type=Account.AccountType.ASSET,
+            normal_side=Account.NormalSide.DEBIT,
+        )
+        self.revenue = Account.objects.create(
+            ledger=self.ledger,
+            code="7603",
+            name="Prihod",
+            type=Account.AccountType.INCOME,
+            normal_side=Account.NormalSide.CREDIT,
+        )
+        with self.captureOnCommitCallbacks(execute=True):
+            self.january = Period.objects.create(
+                ledger=self.ledger,
+                name="2026-01",
+                start_date=date(2026, 1, 1),
+                end_date=date(2026, 1, 31),
+            )
+            self.january.close()
+
+    def _post(self, day):
+        return post_sales_cash_accounts(
+            date=day,
+            net=Decimal("8.00"),
+            vat=Decimal("0.00"),
+            cash_account=self.cash,
+            revenue_account=self.revenue,
+            vat_output_account=None,
+        )
+
+    def test_lookup_uses_index(self):
+        is_in_closed_period(self.ledger.id, date(2026, 2, 1))
+        with self.assertNumQueries(0):
+            self.assertTrue(is_in_closed_period(self.ledger.id, date(2026, 1, 1)))
+            self.assertTrue(is_in_closed_period(self.ledger.id, date(2026, 1, 31)))
+            self.assertFalse(is_in_closed_period(self.ledger.id, date(2025, 12, 31)))
+            self.assertFalse(is_in_closed_period(self.ledger.id, date(2026, 2, 1)))
+            self.assertFalse(is_in_closed_period(self.ledger.id + 1, date(2026, 1, 15)))
+
+    def test_posting_runs_fixed_number_of_queries(self):
+        self._post(date(2026, 2, 1))
+        # sekvenca (lock + update), temeljnica, stavke, mjesecni promet
+        # za dva konta, uz dva savepointa
+        with self.assertNumQueries(10):
+            self._post(date(2026, 2, 2))
+
+        with self.assertRaisesMessage(ValidationError, "zakljucanom periodu"):
+            self._post(date(2026, 1, 15))
+
+    def test_entry_post_checks_index(self):
+        entry = JournalEntry.objects.create(ledger=self.ledger, number=1, date=date(2026, 1, 20))
+        JournalItem.objects.create(entry=entry, account=self.cash, debit=Decimal("1.00"))
+        JournalItem.objects.create(entry=entry, account=self.revenue, credit=Decimal("1.00"))
+        with self.assertRaisesMessage(ValidationError, "zakljucanom periodu"):
+            entry.post()
+
+    def test_saving_period_invalidates_index(self):
+        self.assertTrue(is_in_closed_period(self.ledger.id, date(2026, 1, 15)))
+        with self.captureOnCommitCallbacks(execute=True):
+            self.january.is_closed = False
+            self.january.save()
+        self.assertFalse(is_in_closed_period(self.ledger.id, date(2026, 1, 15)))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Period.objects.create(
+                ledger=self.ledger,
+                name="2026-03",
+                start_date=date(2026, 3, 1),
+                end_date=date(2026, 3, 31),
+            ).close()
+        self.assertTrue(is_in_closed_period(self.ledger.id, date(2026, 3, 10)))
+
+    def test_queryset_delete_invalidates_index(self):
+        self.assertTrue(is_in_closed_period(self.ledger.id, date(2026, 1, 15)))
+        # Admin "delete selected" brise preko QuerySet.delete(), bez Period.delete().
+        with self.captureOnCommitCallbacks(execute=True):
+            Period.objects.filter(pk=self.january.pk).delete()
+        self.assertFalse(is_in_closed_period(self.ledger.id, date(2026, 1, 15)))
+
+    def test_uncommitted_period_is_checked_in_database(self):
+        Period.objects.create(
+            ledger=self.ledger,
+            name="2026-04",
+            start_date=date(2026, 4, 1),
+            end_date=date(2026, 4, 30),
+            is_closed=True,
+        )
+        with self.assertNumQueries(1):
+            self.assertTrue(is_in_closed_period(self.ledger.id, date(2026, 4, 2)))
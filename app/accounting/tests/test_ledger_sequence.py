@@ -0,0 +1,73 @@
+import threading
+import unittest
+from datetime import date
+
+from django.db import connection, connections, transaction
+from django.test import TestCase, TransactionTestCase
+
+from accounting.models import JournalEntry, Ledger, LedgerSequence
+from accounting.services import _next_entry_number, allocate_entry_numbers
+
+
+class LedgerSequenceTests(TestCase):
+    def setUp(self):
+        self.ledger = Ledger.objects.create(name="Mozart")
+
+    def test_starts_after_existing_entries(self):
+        JournalEntry.objects.create(ledger=self.ledger, number=7, date=date(2026, 1, 5))
+
+        self.assertEqual(_next_entry_number(self.ledger), 8)
+        self.assertEqual(_next_entry_number(self.ledger), 9)
+        self.assertEqual(LedgerSequence.objects.get(ledger=self.ledger).last_number, 9)
+
+    def test_reserves_block_of_numbers(self):
+        self.assertEqual(list(allocate_entry_numbers(self.ledger, 3)), [1, 2, 3])
+        self.assertEqual(_next_entry_number(self.ledger), 4)
+
+        with self.assertRaises(ValueError):
+            allocate_entry_numbers(self.ledger, 0)
+
+    def test_manual_number_moves_sequence_forward(self):
+        _next_entry_number(self.ledger)
+        JournalEntry.objects.create(ledger=self.ledger, number=50, date=date(2026, 1, 5))
+
+        self.assertEqual(_next_entry_number(self.ledger), 51)
+
+
+@unittest.skipUnless(connection.vendor == "postgresql", "Test paralelnog knjizenja zahtijeva PostgreSQL.")
+class LedgerSequenceConcurrencyTests(TransactionTestCase):
+    workers = 8
+    entries_per_worker = 10
+
+    def test_parallel_postings_get_unique_numbers(self):
+        ledger = Ledger.objects.create(name="Mozart")
+        JournalEntry.objects.create(ledger=ledger, number=1, date=date(2026, 1, 5))
+        barrier = threading.Barrier(self.workers)
+        errors = []
+
+        def worker():
+            try:
+                barrier.wait()
+                for _ in range(self.entries_per_worker):
+                    with transaction.atomic():
+                        JournalEntry.objects.create(
+                            ledger=ledger,
+                            number=_next_entry_number(ledger),
+                            date=date(2026, 1, 5),
+                        )
+            except Exception as exc:
+                errors.append(exc)
+            finally:
+                connections.close_all()
+
+        threads = [threading.Thread(target=worker) for _ in range(self.workers)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(errors, [])
+        total = 1 + self.workers * self.entries_per_worker
+        numbers = sorted(JournalEntry.objects.filter(ledger=ledger).values_list("number", flat=True))
+        self.assertEqual(numbers, list(range(1, total + 1)))
+        self.assertEqual(LedgerSequence.objects.get(ledger=ledger).last_number, total)
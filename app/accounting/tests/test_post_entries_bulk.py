@@ -0,0 +1,101 @@
+from datetime import date
+from decimal import Decimal
+
+from django.core.exceptions import ValidationError
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+
+from accounting.models import Account, JournalEntry, JournalItem, Ledger, Period
+from accounting.periods import reset_closed_period_index
+from accounting.services import JournalEntrySpec, JournalLineSpec, post_entries_bulk
+
+
+@override_settings(CACHES={"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}})
+class PostEntriesBulkTests(TestCase):
+    def setUp(self):
+        reset_closed_period_index()
+        self.ledger = Ledger.objects.create(name="Mozart")
+        self.cogs = Account.objects.create(
+            ledger=self.ledger,
+            code="7100",
+            name="COGS",
+            type=Account.AccountType.EXPENSE,
+            normal_side=Account.NormalSide.DEBIT,
+        )
+        self.inventory = Account.objects.create(
+            ledger=self.ledger,
+            code="6600",
+            name="Zaliha",
+            type=Account.AccountType.ASSET,
+            normal_side=Account.NormalSide.DEBIT,
+        )
+
+    def _spec(self, amount="10.00", day=5, debit_account=None):
+        amount = Decimal(amount)
+        return JournalEntrySpec(
+            ledger=self.ledger,
+            date=date(2026, 2, day),
+            description="COGS",
+            lines=[
+                JournalLineSpec(account=debit_account or self.cogs, debit=amount),
+                JournalLineSpec(account=self.inventory, credit=amount),
+            ],
+        )
+
+    def test_posts_entries_with_consecutive_numbers(self):
+        JournalEntry.objects.create(ledger=self.ledger, number=3, date=date(2026, 1, 2))
+
+        entries = post_entries_bulk([self._spec(), self._spec("5.50")])
+
+        self.assertEqual([entry.number for entry in entries], [4, 5])
+        self.assertTrue(all(entry.status == JournalEntry.Status.POSTED and entry.posted_at for entry in entries))
+        self.assertEqual(JournalItem.objects.filter(entry__in=entries).count(), 4)
+        self.assertTrue(all(entry.is_balanced() for entry in entries))
+
+    def test_query_count_does_not_grow_with_entries(self):
+        post_entries_bulk([self._spec()])
+        with CaptureQueriesContext(connection) as few:
+            post_entries_bulk([self._spec() for _ in range(5)])
+        with CaptureQueriesContext(connection) as many:
+            post_entries_bulk([self._spec() for _ in range(50)])
+
+        self.assertEqual(len(few), len(many))
+        self.assertEqual(JournalEntry.objects.count(), 56)
+
+    def test_unbalanced_entry_rejects_whole_batch(self):
+        spec = self._spec()
+        spec.lines[1].credit = Decimal("9.00")
+
+        with self.assertRaisesMessage(ValidationError, "nije uravnotezena"):
+            post_entries_bulk([self._spec(), spec])
+        self.assertFalse(JournalEntry.objects.exists())
+
+    def test_rejects_closed_period_and_group_account(self):
+        Period.objects.create(
+            ledger=self.ledger,
+            name="2026-02",
+            start_date=date(2026, 2, 1),
+            end_date=date(2026, 2, 28),
+            is_closed=True,
+        )
+        with self.assertRaisesMessage(ValidationError, "zakljucanom periodu"):
+            post_entries_bulk([self._spec()])
+
+        group = Account.objects.create(
+            ledger=self.ledger,
+            code="71",
+            name="Rashodi",
+            type=Account.AccountType.EXPENSE,
+            normal_side=Account.NormalSide.DEBIT,
+            is_postable=False,
+        )
+        with self.assertRaisesMessage(ValidationError, "nije postable"):
+            post_entries_bulk([JournalEntrySpec(
+                ledger=self.ledger,
+                date=date(2026, 3, 1),
+                lines=[
+                    JournalLineSpec(account=group, debit=Decimal("1.00")),
+                    JournalLineSpec(account=self.inventory, credit=Decimal("1.00")),
+                ],
+            )])
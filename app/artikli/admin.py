@@ -1,13 +1,14 @@
 import time
-from decimal import Decimal
 
 from django.contrib import admin, messages
+from django.contrib.admin.views.main import ChangeList
 from django.http import HttpResponseRedirect
 from django.urls import path, reverse
 from django.db import models, transaction
 from django.utils.html import format_html
 from mptt.admin import DraggableMPTTAdmin, TreeRelatedFieldListFilter
 
+from .costing import get_normativ_costs
 from .models import (
     Artikl,
     ArtiklDetail,
@@ -20,8 +21,7 @@ from .models import (
     SalesGroupData,
     UnitOfMeasureData,
 )
-from sales.models import SalesInvoiceItem
-from stock.models import StockCostSnapshot, StockLot, WarehouseId
+from stock.models import StockCostSnapshot, WarehouseId
 from .remaris_parser import parse_bool, parse_decimal, parse_hidden_inputs, parse_int
 from .remaris_connector import RemarisConnector
 
@@ -140,6 +140,12 @@ def import_artikl_details_from_remaris(modeladmin, request, queryset):
     )
 
 
+class ArtiklChangeList(ChangeList):
+    def get_results(self, request):
+        super().get_results(request)
+        self.model_admin._attach_normativ_costs(self.result_list)
+
+
 @admin.register(Artikl)
 class ArtiklAdmin(admin.ModelAdmin):
     autocomplete_fields = ("drink_category",)
@@ -201,59 +207,62 @@ class ArtiklAdmin(admin.ModelAdmin):
 
     normativ_link.short_description = "Normativ"
 
-    def _normativ_cost_fifo_for_warehouse(self, obj, warehouse):
-        total = Decimal("0.0000")
-        for item in obj.normativ.items.select_related("ingredient"):
-            if not item.ingredient_id or item.qty <= 0:
-                continue
-            remaining = item.qty
-            lots = (
-                StockLot.objects.filter(warehouse=warehouse, artikl=item.ingredient, qty_remaining__gt=0)
-                .order_by("received_at", "id")
-                .only("qty_remaining", "unit_cost")
-            )
-            for lot in lots:
-                if remaining <= 0:
-                    break
-                take = remaining if remaining <= lot.qty_remaining else lot.qty_remaining
-                total += take * lot.unit_cost
-                remaining -= take
-        return total
+    def _attach_normativ_costs(self, objs, *, with_names=False):
+        # Cijene normativa ucitavaju se jednom po zahtjevu (lista i detalj)
+        # i vezu na objekte tog zahtjeva, a ne za svaki redak.
+        by_artikl = {}
+        for (artikl_id, warehouse_id), cost in get_normativ_costs("fifo").items():
+            by_artikl.setdefault(artikl_id, []).append((warehouse_id, cost["cost"]))
+        names = dict(WarehouseId.objects.values_list("rm_id", "name")) if with_names else None
+        for obj in objs:
+            obj._normativ_costs = (sorted(by_artikl.get(obj.pk, [])), names)
+
+    def get_changelist(self, request, **kwargs):
+        return ArtiklChangeList
+
+    def get_object(self, request, object_id, from_field=None):
+        obj = super().get_object(request, object_id, from_field)
+        if obj is not None and not obj.is_stock_item:
+            self._attach_normativ_costs([obj], with_names=True)
+        return obj
 
     def _normativ_costs_by_warehouse(self, obj):
-        if not obj or not getattr(obj, "normativ", None):
-            return None
-        warehouse_ids = (
-            SalesInvoiceItem.objects.filter(artikl=obj, invoice__warehouse__isnull=False)
-            .values_list("invoice__warehouse__rm_id", flat=True)
-            .distinct()
-        )
-        warehouses = list(WarehouseId.objects.filter(rm_id__in=warehouse_ids).order_by("rm_id"))
-        if not warehouses:
-            return None
-        results = []
-        for warehouse in warehouses:
-            total = self._normativ_cost_fifo_for_warehouse(obj, warehouse)
-            results.append((warehouse, total))
-        return results
+        if not obj or not obj.pk or obj.is_stock_item:
+            return None, {}
+        loaded = getattr(obj, "_normativ_costs", None)
+        if loaded is None:
+            costs = get_normativ_costs("fifo")
+            results = sorted(
+                (warehouse_id, cost["cost"])
+                for (artikl_id, warehouse_id), cost in costs.items()
+                if artikl_id == obj.pk
+            )
+            return results, None
+        return loaded
 
     @admin.display(description="Normativ FIFO")
     def normativ_cost_fifo(self, obj):
-        results = self._normativ_costs_by_warehouse(obj)
+        results, _ = self._normativ_costs_by_warehouse(obj)
         if not results:
             return "—"
         return "; ".join(
-            f"WH {warehouse.rm_id}: {total:.4f}" for warehouse, total in results
+            f"WH {warehouse_id}: {total:.4f}" for warehouse_id, total in results
         )
 
     @admin.display(description="Normativ FIFO")
     def normativ_cost_fifo_readonly(self, obj):
-        results = self._normativ_costs_by_warehouse(obj)
+        results, names = self._normativ_costs_by_warehouse(obj)
         if not results:
             return "—"
+        if names is None:
+            names = dict(
+                WarehouseId.objects.filter(rm_id__in=[warehouse_id for warehouse_id, _ in results]).values_list(
+                    "rm_id", "name"
+                )
+            )
         return "\n".join(
-            f"WH {warehouse.rm_id} ({warehouse.name}): {total:.4f}"
-            for warehouse, total in results
+            f"WH {warehouse_id} ({names.get(warehouse_id, '?')}): {total:.4f}"
+            for warehouse_id, total in results
         )
 
 
@@ -1,16 +1,24 @@
-import io
 import logging
+from datetime import timedelta
 
+from django.core.files.storage import default_storage
 from django.http import Http404, HttpResponse
 from django.shortcuts import get_object_or_404
-from rest_framework import generics, serializers
+from django.utils import timezone
+from django.utils.cache import get_conditional_response
+from django.utils.dateparse import parse_date
+from django.utils.http import http_date
+from rest_framework import generics, serializers, status
+from rest_framework.exceptions import ValidationError
 from rest_framework.parsers import FormParser, JSONParser, MultiPartParser
+from rest_framework.response import Response
 from rest_framework.views import APIView
-from PIL import Image, ImageOps
 
+from .costing import normativ_margins
 from .models import Artikl, DrinkCategory
+from .thumbnails import FORMATS, default_format, get_thumbnail, image_token, parse_size
 from stock.models import WarehouseStock
-from stock.services import refresh_warehouse_stock_for_product_code
+from stock.services import request_product_stock_refresh
 
 logger = logging.getLogger(__name__)
 
@@ -48,14 +56,14 @@ class ArtiklSerializer(serializers.ModelSerializer):
         if not obj.image:
             return None
         request = self.context.get("request")
-        url = f"/api/artikli/{obj.rm_id}/image-46x75/"
+        url = f"/api/artikli/{obj.rm_id}/image-46x75/?v={image_token(obj)}"
         return request.build_absolute_uri(url) if request else url
 
     def get_image_125x200(self, obj):
         if not obj.image:
             return None
         request = self.context.get("request")
-        url = f"/api/artikli/{obj.rm_id}/image-125x200/"
+        url = f"/api/artikli/{obj.rm_id}/image-125x200/?v={image_token(obj)}"
         return request.build_absolute_uri(url) if request else url
 
 
@@ -94,14 +102,14 @@ class ArtiklDetailSerializer(serializers.ModelSerializer):
         if not obj.image:
             return None
         request = self.context.get("request")
-        url = f"/api/artikli/{obj.rm_id}/image-46x75/"
+        url = f"/api/artikli/{obj.rm_id}/image-46x75/?v={image_token(obj)}"
         return request.build_absolute_uri(url) if request else url
 
     def get_image_125x200(self, obj):
         if not obj.image:
             return None
         request = self.context.get("request")
-        url = f"/api/artikli/{obj.rm_id}/image-125x200/"
+        url = f"/api/artikli/{obj.rm_id}/image-125x200/?v={image_token(obj)}"
         return request.build_absolute_uri(url) if request else url
 
     def get_warehouse_stock(self, obj):
@@ -136,9 +144,9 @@ class ArtiklDetailView(generics.RetrieveUpdateDestroyAPIView):
     def get(self, request, *args, **kwargs):
         obj = self.get_object()
         try:
-            refresh_warehouse_stock_for_product_code(obj.code)
+            request_product_stock_refresh(obj.code)
         except Exception:
-            logger.exception("Failed to refresh warehouse stock for %s", obj.code)
+            logger.exception("Failed to schedule warehouse stock refresh for %s", obj.code)
         return super().get(request, *args, **kwargs)
 
 
@@ -187,43 +195,88 @@ class DrinkCategoryDetailView(generics.RetrieveUpdateDestroyAPIView):
     serializer_class = DrinkCategorySerializer
 
 
-class ArtiklImage46x75View(APIView):
-    def get(self, request, rm_id):
-        artikl = get_object_or_404(Artikl, rm_id=rm_id)
-        if not artikl.image:
-            raise Http404("Image not found")
-        with artikl.image.open("rb") as image_file:
-            img = Image.open(image_file)
-            img = ImageOps.exif_transpose(img)
-            img = ImageOps.fit(img, (46, 75), Image.LANCZOS)
-            img_format = (img.format or "PNG").upper()
-            if img_format == "JPG":
-                img_format = "JPEG"
-            if img_format == "JPEG" and img.mode in ("RGBA", "P"):
-                img = img.convert("RGB")
-            buffer = io.BytesIO()
-            img.save(buffer, format=img_format)
-            buffer.seek(0)
-            content_type = Image.MIME.get(img_format, "application/octet-stream")
-            return HttpResponse(buffer.getvalue(), content_type=content_type)
-
-
-class ArtiklImage125x200View(APIView):
+class ArtiklImageView(APIView):
+    """
+    Thumbnail artikla iz spremljenih varijanti (artikli.thumbnails).
+    Parametri: size=WxH (ARTIKL_THUMBNAIL_SIZES), fmt=jpeg|png|webp (zadano
+    format originala), v=token slike.
+    Uz ispravan v odgovor je immutable; inace se revalidira preko ETag/Last-Modified.
+    """
+
+    size = None
+
     def get(self, request, rm_id):
         artikl = get_object_or_404(Artikl, rm_id=rm_id)
         if not artikl.image:
             raise Http404("Image not found")
-        with artikl.image.open("rb") as image_file:
-            img = Image.open(image_file)
-            img = ImageOps.exif_transpose(img)
-            img = ImageOps.fit(img, (125, 200), Image.LANCZOS)
-            img_format = (img.format or "PNG").upper()
-            if img_format == "JPG":
-                img_format = "JPEG"
-            if img_format == "JPEG" and img.mode in ("RGBA", "P"):
-                img = img.convert("RGB")
-            buffer = io.BytesIO()
-            img.save(buffer, format=img_format)
-            buffer.seek(0)
-            content_type = Image.MIME.get(img_format, "application/octet-stream")
-            return HttpResponse(buffer.getvalue(), content_type=content_type)
+
+        fmt = (request.query_params.get("fmt") or default_format(artikl)).lower()
+        if fmt not in FORMATS:
+            raise ValidationError({"fmt": f"Nepodrzan format slike: {fmt}."})
+        size = self.size
+        if size is None:
+            try:
+                size = parse_size(request.query_params.get("size"))
+            except ValueError as exc:
+                raise ValidationError({"size": str(exc)})
+
+        name = get_thumbnail(artikl, size, fmt)
+        token = image_token(artikl)
+        etag = f'"{token}-{size[0]}x{size[1]}-{fmt}"'
+        last_modified = int(default_storage.get_modified_time(name).timestamp())
+
+        response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+        if response is None:
+            with default_storage.open(name, "rb") as thumb:
+                response = HttpResponse(thumb.read(), content_type=FORMATS[fmt][1])
+        response["ETag"] = etag
+        response["Last-Modified"] = http_date(last_modified)
+        if request.query_params.get("v") == token:
+            response["Cache-Control"] = "public, max-age=31536000, immutable"
+        else:
+            response["Cache-Control"] = "public, max-age=3600"
+        return response
+
+
+class ArtiklImage46x75View(ArtiklImageView):
+    size = (46, 75)
+
+
+class ArtiklImage125x200View(ArtiklImageView):
+    size = (125, 200)
+
+
+class NormativMarginView(APIView):
+    """
+    Nabavna cijena normativa naspram prosjecne prodajne cijene po artiklu i
+    skladistu (?method=fifo|weighted&date_from&date_to&warehouse).
+    Bez datuma uzima zadnjih 30 dana.
+    """
+
+    def get(self, request):
+        today = timezone.localdate()
+        date_to = parse_date(request.query_params.get("date_to", "")) or today
+        date_from = parse_date(request.query_params.get("date_from", "")) or date_to - timedelta(days=29)
+        if date_from > date_to:
+            return Response(
+                {"detail": "date_from ne smije biti veći od date_to."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        try:
+            warehouse_id = int(request.query_params["warehouse"]) if request.query_params.get("warehouse") else None
+            rows = normativ_margins(
+                date_from=date_from,
+                date_to=date_to,
+                method=request.query_params.get("method") or "fifo",
+                warehouse_id=warehouse_id,
+            )
+        except ValueError as exc:
+            return Response({"detail": str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+
+        return Response(
+            {
+                "date_from": date_from.isoformat(),
+                "date_to": date_to.isoformat(),
+                "rows": rows,
+            }
+        )
@@ -10,3 +10,5 @@ class ArtikliConfig(AppConfig):
         admin.site.site_header = "Mozart"
         admin.site.site_title = "Mozart"
         admin.site.index_title = "Mozart"
+
+        from artikli import signals  # noqa: F401
@@ -0,0 +1,120 @@
+import logging
+import threading
+import time
+import uuid
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection, transaction
+
+logger = logging.getLogger(__name__)
+
+BOM_VERSION_KEY = "artikli:bom-version"
+
+_lock = threading.Lock()
+_state = {"boms": None, "version": None, "loaded_at": 0.0}
+# Dretva koja je promijenila normativ u transakciji koja jos nije commitana
+# razvija normative iz baze bez spremanja (cache ne smije vidjeti necommitano).
+_pending = threading.local()
+
+
+def compile_boms() -> dict[int, tuple[tuple[int, Decimal], ...]]:
+    """
+    Jednim upitom ucitava sve aktivne normative i razvija ih do skladisnih
+    artikala: Artikl.id -> ((ingredient_id, kolicina po 1 prodaji), ...).
+    Sastojak koji nije skladisni, a ima aktivni normativ, razvija se dalje
+    (ugnijezdeni normativ). Normativi u ciklusu se izostavljaju.
+    """
+    from artikli.models import NormativItem
+
+    raw: dict[int, list[tuple[int, Decimal, bool]]] = {}
+    rows = NormativItem.objects.filter(normativ__is_active=True).values_list(
+        "normativ__product_id", "ingredient_id", "qty", "ingredient__is_stock_item"
+    )
+    for product_id, ingredient_id, qty, is_stock_item in rows:
+        raw.setdefault(product_id, []).append((ingredient_id, Decimal(str(qty)), is_stock_item))
+
+    compiled: dict[int, tuple[tuple[int, Decimal], ...]] = {}
+    cyclic: set[int] = set()
+
+    def expand(product_id: int, path: tuple[int, ...]) -> dict[int, Decimal] | None:
+        if product_id in compiled:
+            return dict(compiled[product_id])
+        if product_id in path:
+            return None
+        components: dict[int, Decimal] = {}
+        for ingredient_id, qty, is_stock_item in raw[product_id]:
+            if not is_stock_item and ingredient_id in raw:
+                nested = expand(ingredient_id, path + (product_id,))
+                if nested is None:
+                    return None
+                for nested_id, nested_qty in nested.items():
+                    components[nested_id] = components.get(nested_id, Decimal("0")) + nested_qty * qty
+            else:
+                components[ingredient_id] = components.get(ingredient_id, Decimal("0")) + qty
+        compiled[product_id] = tuple(components.items())
+        return components
+
+    for product_id in raw:
+        if expand(product_id, ()) is None:
+            cyclic.add(product_id)
+    if cyclic:
+        logger.error("Normativi u ciklusu se ne razvijaju: %s", sorted(cyclic))
+        for product_id in cyclic:
+            compiled.pop(product_id, None)
+    return compiled
+
+
+def _shared_version():
+    try:
+        return cache.get(BOM_VERSION_KEY)
+    except Exception:
+        logger.warning("BOM cache version unavailable", exc_info=True)
+        return None
+
+
+def get_compiled_boms() -> dict[int, tuple[tuple[int, Decimal], ...]]:
+    """
+    Procesni cache razvijenih normativa. Promjene u ovom procesu ga brisu
+    signalima; ostali procesi ga ponovno ucitaju kad se promijeni verzija u
+    dijeljenom cacheu (ako cache nije dostupan, nakon NORMATIV_BOM_CACHE_TTL).
+    """
+    if boms_pending():
+        return compile_boms()
+    version = _shared_version()
+    with _lock:
+        boms = _state["boms"]
+        expired = version is None and time.monotonic() - _state["loaded_at"] > settings.NORMATIV_BOM_CACHE_TTL
+        if boms is None or version != _state["version"] or expired:
+            boms = compile_boms()
+            _state.update(boms=boms, version=version, loaded_at=time.monotonic())
+        return boms
+
+
+def boms_pending() -> bool:
+    """Ima li ova dretva necommitanu promjenu normativa."""
+    if getattr(_pending, "value", False):
+        if connection.in_atomic_block:
+            return True
+        # Transakcija je zavrsila bez commita (rollback).
+        _pending.value = False
+    return False
+
+
+def _bump_version() -> None:
+    _pending.value = False
+    with _lock:
+        _state["boms"] = None
+    try:
+        cache.set(BOM_VERSION_KEY, uuid.uuid4().hex, None)
+    except Exception:
+        logger.warning("BOM cache version not bumped", exc_info=True)
+
+
+def invalidate_boms() -> None:
+    """Poziva se nakon promjene normativa; ostali procesi vide promjenu nakon commita."""
+    _pending.value = True
+    with _lock:
+        _state["boms"] = None
+    transaction.on_commit(_bump_version)
@@ -0,0 +1,202 @@
+import logging
+from bisect import bisect_left
+from decimal import Decimal, ROUND_HALF_UP
+from itertools import accumulate
+
+from django.core.cache import cache
+from django.db.models import Count, Max, Sum
+
+from artikli.bom import BOM_VERSION_KEY, boms_pending, get_compiled_boms
+from artikli.models import Artikl
+from stock.models import StockBalance, StockLot
+
+logger = logging.getLogger(__name__)
+
+FOURPLACES = Decimal("0.0001")
+NORMATIV_COSTS_KEY = "artikli:normativ-costs:{method}:{bom_version}:{stock_version}"
+NORMATIV_COSTS_TTL = 24 * 60 * 60
+COST_METHODS = ("fifo", "weighted")
+
+
+def stock_version() -> str:
+    """
+    Verzija zalihe: svaka promjena slojeva/rezervacija prolazi kroz
+    StockBalance (stock.services), pa je dovoljan jedan agregat.
+    """
+    state = StockBalance.objects.aggregate(last=Max("updated_at"), rows=Count("id"))
+    last = state["last"].isoformat() if state["last"] else "-"
+    return f"{last}:{state['rows']}"
+
+
+def _sellable_components() -> dict[int, tuple[tuple[int, Decimal], ...]]:
+    """Prodajni artikl (pk) -> sastojci; skladisni artikl je sam sebi sastojak."""
+    boms = get_compiled_boms()
+    components = {}
+    for artikl_id, is_stock_item in Artikl.objects.filter(is_sellable=True).values_list("id", "is_stock_item"):
+        if is_stock_item:
+            components[artikl_id] = ((artikl_id, Decimal("1")),)
+        elif artikl_id in boms:
+            components[artikl_id] = boms[artikl_id]
+    return components
+
+
+def _fifo_curves(ingredient_rm_ids) -> dict[tuple[int, int], tuple[list, list, list]]:
+    """
+    Jednim upitom: za svaki (skladiste, artikl) kumulativne kolicine i
+    vrijednosti otvorenih slojeva u FIFO redoslijedu.
+    """
+    lots = (
+        StockLot.objects.filter(artikl_id__in=ingredient_rm_ids, qty_remaining__gt=0)
+        .order_by("warehouse_id", "artikl_id", "received_at", "id")
+        .values_list("warehouse_id", "artikl_id", "qty_remaining", "unit_cost")
+    )
+    grouped: dict[tuple[int, int], tuple[list, list]] = {}
+    for warehouse_id, artikl_id, qty, unit_cost in lots:
+        qtys, costs = grouped.setdefault((warehouse_id, artikl_id), ([], []))
+        qtys.append(qty)
+        costs.append(unit_cost)
+    return {
+        key: (list(accumulate(qtys)), list(accumulate(q * c for q, c in zip(qtys, costs))), costs)
+        for key, (qtys, costs) in grouped.items()
+    }
+
+
+def _fifo_cost(curve, qty: Decimal) -> tuple[Decimal, bool]:
+    cum_qty, cum_value, costs = curve
+    index = bisect_left(cum_qty, qty)
+    if index == len(cum_qty):
+        return cum_value[-1], False
+    consumed_qty = cum_qty[index - 1] if index else Decimal("0")
+    consumed_value = cum_value[index - 1] if index else Decimal("0")
+    return consumed_value + (qty - consumed_qty) * costs[index], True
+
+
+def _weighted_unit_costs(ingredient_rm_ids) -> dict[tuple[int, int], Decimal]:
+    balances = StockBalance.objects.filter(artikl_id__in=ingredient_rm_ids, on_hand__gt=0).values_list(
+        "warehouse_id", "artikl_id", "on_hand", "value"
+    )
+    return {(warehouse_id, artikl_id): value / on_hand for warehouse_id, artikl_id, on_hand, value in balances}
+
+
+def compute_normativ_costs(method: str = "fifo") -> dict[tuple[int, int], dict]:
+    """
+    Nabavna cijena jedne prodaje za sve prodajne artikle i sva skladista:
+    (Artikl.id, WarehouseId.rm_id) -> {"cost", "complete"}.
+    fifo: cijena prvih slojeva koji bi se potrosili; weighted: prosjek iz
+    StockBalance. complete=False ako nekog sastojka nema dovoljno na skladistu.
+    """
+    if method not in COST_METHODS:
+        raise ValueError(f"Nepodrzana metoda: {method}.")
+    components = _sellable_components()
+    ingredient_ids = {ingredient_id for parts in components.values() for ingredient_id, _ in parts}
+    rm_ids = dict(Artikl.objects.filter(id__in=ingredient_ids).values_list("id", "rm_id"))
+
+    if method == "fifo":
+        curves = _fifo_curves(rm_ids.values())
+        warehouses_by_artikl: dict[int, list[int]] = {}
+        for warehouse_id, artikl_rm_id in curves:
+            warehouses_by_artikl.setdefault(artikl_rm_id, []).append(warehouse_id)
+    else:
+        unit_costs = _weighted_unit_costs(rm_ids.values())
+        warehouses_by_artikl = {}
+        for warehouse_id, artikl_rm_id in unit_costs:
+            warehouses_by_artikl.setdefault(artikl_rm_id, []).append(warehouse_id)
+
+    results: dict[tuple[int, int], dict] = {}
+    for artikl_id, parts in components.items():
+        warehouse_ids = {
+            warehouse_id
+            for ingredient_id, _ in parts
+            for warehouse_id in warehouses_by_artikl.get(rm_ids.get(ingredient_id), ())
+        }
+        for warehouse_id in warehouse_ids:
+            total = Decimal("0")
+            complete = True
+            for ingredient_id, qty in parts:
+                key = (warehouse_id, rm_ids.get(ingredient_id))
+                if method == "fifo":
+                    curve = curves.get(key)
+                    cost, enough = _fifo_cost(curve, qty) if curve else (Decimal("0"), False)
+                else:
+                    unit_cost = unit_costs.get(key)
+                    cost, enough = (qty * unit_cost, True) if unit_cost is not None else (Decimal("0"), False)
+                total += cost
+                complete = complete and enough
+            results[(artikl_id, warehouse_id)] = {
+                "cost": total.quantize(FOURPLACES, rounding=ROUND_HALF_UP),
+                "complete": complete,
+            }
+    return results
+
+
+def get_normativ_costs(method: str = "fifo") -> dict[tuple[int, int], dict]:
+    """compute_normativ_costs iz dijeljenog cachea, po verziji zalihe i normativa."""
+    if method not in COST_METHODS:
+        raise ValueError(f"Nepodrzana metoda: {method}.")
+    if boms_pending():
+        return compute_normativ_costs(method)
+    try:
+        key = NORMATIV_COSTS_KEY.format(
+            method=method,
+            bom_version=cache.get(BOM_VERSION_KEY) or "-",
+            stock_version=stock_version(),
+        )
+        costs = cache.get(key)
+    except Exception:
+        logger.warning("Normativ cost cache unavailable", exc_info=True)
+        return compute_normativ_costs(method)
+    if costs is None:
+        costs = compute_normativ_costs(method)
+        try:
+            cache.set(key, costs, NORMATIV_COSTS_TTL)
+        except Exception:
+            logger.warning("Normativ costs not cached", exc_info=True)
+    return costs
+
+
+def normativ_margins(*, date_from, date_to, method: str = "fifo", warehouse_id: int | None = None) -> list[dict]:
+    """
+    Prodajna cijena (prosjek iz SalesDailyRollup za period) naspram nabavne
+    cijene normativa po artiklu i skladistu (warehouse_id je WarehouseId.rm_id).
+    """
+    from sales.models import SalesDailyRollup
+
+    costs = get_normativ_costs(method)
+    if warehouse_id is not None:
+        costs = {key: value for key, value in costs.items() if key[1] == warehouse_id}
+
+    prices = {
+        row["artikl_id"]: row
+        for row in SalesDailyRollup.objects.filter(
+            date__gte=date_from, date__lte=date_to, artikl_id__in={artikl_id for artikl_id, _ in costs}
+        )
+        .values("artikl_id")
+        .annotate(quantity=Sum("quantity"), gross=Sum("gross_amount"), net=Sum("net_amount"))
+        .order_by()
+    }
+    artikli = dict(Artikl.objects.filter(id__in={artikl_id for artikl_id, _ in costs}).values_list("id", "name"))
+
+    rows = []
+    for (artikl_id, wh_id), cost in sorted(costs.items()):
+        price = prices.get(artikl_id)
+        net_price = gross_price = margin = margin_pct = None
+        if price and price["quantity"]:
+            net_price = (price["net"] / price["quantity"]).quantize(FOURPLACES, rounding=ROUND_HALF_UP)
+            gross_price = (price["gross"] / price["quantity"]).quantize(FOURPLACES, rounding=ROUND_HALF_UP)
+            margin = net_price - cost["cost"]
+            if net_price:
+                margin_pct = (margin * 100 / net_price).quantize(Decimal("0.01"), rounding=ROUND_HALF_UP)
+        rows.append(
+            {
+                "artikl_id": artikl_id,
+                "name": artikli.get(artikl_id, ""),
+                "warehouse": wh_id,
+                "cost": cost["cost"],
+                "cost_complete": cost["complete"],
+                "sale_price_net": net_price,
+                "sale_price_gross": gross_price,
+                "margin": margin,
+                "margin_pct": margin_pct,
+            }
+        )
+    return rows
@@ -48,6 +48,15 @@ class Artikl(models.Model):
     def __str__(self) -> str:
         return f"{self.code} - {self.name}"
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_image_name = (instance.image.name or "") if "image" in field_names else None
+        instance._loaded_is_stock_item = instance.is_stock_item if "is_stock_item" in field_names else None
+        if "drink_category_id" in field_names:
+            instance._loaded_drink_category_id = instance.drink_category_id
+        return instance
+
     def save(self, *args, **kwargs):
         if not self.code:
             while True:
@@ -57,6 +66,16 @@ class Artikl(models.Model):
                     break
         super().save(*args, **kwargs)
 
+        loaded_image_name = getattr(self, "_loaded_image_name", "")
+        if loaded_image_name is None:
+            return
+        image_name = self.image.name or ""
+        if image_name != loaded_image_name:
+            from artikli.thumbnails import refresh_thumbnails
+
+            refresh_thumbnails(self)
+            self._loaded_image_name = image_name
+
     class Meta:
         verbose_name = "Artikl"
         verbose_name_plural = "Artikli"
@@ -1,3 +1,4 @@
+import copy
 import json
 import os
 from pathlib import Path
@@ -55,6 +56,18 @@ class RemarisConnector:
         self._save_cookies()
         return response
 
+    def fork(self):
+        """
+        Kopija konektora s vlastitom sesijom i istim auth cookiejima, za
+        paralelne zahtjeve (requests.Session nije thread-safe). Kopija ne
+        sprema cookieje na disk.
+        """
+        clone = copy.copy(self)
+        clone.session = requests.Session()
+        clone.session.cookies.update(self.session.cookies)
+        clone.cookie_readonly = True
+        return clone
+
     def post_json(self, path, payload, referer_path):
         headers = {
             "Content-Type": "application/json",
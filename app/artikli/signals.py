@@ -0,0 +1,22 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from artikli.bom import invalidate_boms
+from artikli.models import Artikl, Normativ, NormativItem
+
+
+@receiver(post_save, sender=Normativ)
+@receiver(post_delete, sender=Normativ)
+@receiver(post_save, sender=NormativItem)
+@receiver(post_delete, sender=NormativItem)
+def invalidate_boms_on_normativ_change(sender, **kwargs):
+    invalidate_boms()
+
+
+@receiver(post_save, sender=Artikl)
+def invalidate_boms_on_stock_flag_change(sender, instance, created, **kwargs):
+    # is_stock_item odlucuje razvija li se ugnijezdeni normativ.
+    loaded = getattr(instance, "_loaded_is_stock_item", None)
+    if not created and loaded is not None and loaded != instance.is_stock_item:
+        invalidate_boms()
+    instance._loaded_is_stock_item = instance.is_stock_item
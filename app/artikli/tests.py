@@ -1,3 +1,241 @@
-from django.test import TestCase
+import io
+import shutil
+import tempfile
+from datetime import date
+from decimal import Decimal
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from PIL import Image
+from rest_framework.test import APIClient
+
+from artikli.bom import BOM_VERSION_KEY, get_compiled_boms, invalidate_boms
+from artikli.costing import compute_normativ_costs, get_normativ_costs
+from artikli.models import Artikl, Normativ, NormativItem
+from artikli.thumbnails import image_token, thumbnail_name
+from sales.models import SalesDailyRollup
+from stock.models import StockBalance, StockLot, WarehouseId
+
+
+def _png_upload(name="kava.png", color="red"):
+    buffer = io.BytesIO()
+    Image.new("RGB", (300, 400), color).save(buffer, format="PNG")
+    return SimpleUploadedFile(name, buffer.getvalue(), content_type="image/png")
+
+
+class ArtiklThumbnailTests(TestCase):
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root, ignore_errors=True)
+        override = override_settings(MEDIA_ROOT=self.media_root)
+        override.enable()
+        self.addCleanup(override.disable)
+
+        self.artikl = Artikl.objects.create(rm_id=10, name="Kava", image=_png_upload())
+        self.client = APIClient()
+        self.client.force_authenticate(get_user_model().objects.create_user("pos", password="x"))
+
+    def test_default_variants_generated_on_upload(self):
+        self.assertTrue(default_storage.exists(thumbnail_name(self.artikl, (46, 75))))
+        self.assertTrue(default_storage.exists(thumbnail_name(self.artikl, (125, 200))))
+
+    def test_serves_cached_variant_with_validators(self):
+        token = image_token(self.artikl)
+        response = self.client.get(f"/api/artikli/10/image-46x75/?v={token}")
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["Content-Type"], "image/png")
+        self.assertIn("immutable", response["Cache-Control"])
+        self.assertEqual(Image.open(io.BytesIO(response.content)).size, (46, 75))
+
+        response = self.client.get("/api/artikli/10/image-46x75/", HTTP_IF_NONE_MATCH=response["ETag"])
+        self.assertEqual(response.status_code, 304)
+
+    def test_generic_size_and_webp(self):
+        response = self.client.get("/api/artikli/10/image/?size=92x150&fmt=webp")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["Content-Type"], "image/webp")
+        self.assertEqual(Image.open(io.BytesIO(response.content)).size, (92, 150))
+        self.assertTrue(default_storage.exists(thumbnail_name(self.artikl, (92, 150), "webp")))
+
+        self.assertEqual(self.client.get("/api/artikli/10/image/?size=5000x5000").status_code, 400)
+
+    def test_new_image_invalidates_old_variants(self):
+        old_name = thumbnail_name(self.artikl, (46, 75))
+        artikl = Artikl.objects.get(pk=self.artikl.pk)
+        artikl.image = _png_upload("kava2.png", color="blue")
+        artikl.save()
+
+        self.assertFalse(default_storage.exists(old_name))
+        self.assertTrue(default_storage.exists(thumbnail_name(artikl, (46, 75))))
+
+    def test_cmyk_jpeg_keeps_jpeg_and_converts_mode(self):
+        buffer = io.BytesIO()
+        Image.new("CMYK", (300, 400), (0, 80, 80, 0)).save(buffer, format="JPEG")
+        Artikl.objects.create(
+            rm_id=11, name="Caj", image=SimpleUploadedFile("caj.jpg", buffer.getvalue(), content_type="image/jpeg")
+        )
+
+        response = self.client.get("/api/artikli/11/image-46x75/")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["Content-Type"], "image/jpeg")
+        self.assertEqual(Image.open(io.BytesIO(response.content)).mode, "RGB")
+
+        response = self.client.get("/api/artikli/11/image/?size=92x150&fmt=png")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(Image.open(io.BytesIO(response.content)).mode, "RGB")
+
+
+@override_settings(CACHES={"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}})
+class CompiledBomTests(TestCase):
+    def setUp(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            invalidate_boms()
+            self.kava = Artikl.objects.create(rm_id=1, name="Kava zrno", is_stock_item=True)
+            self.mlijeko = Artikl.objects.create(rm_id=2, name="Mlijeko", is_stock_item=True)
+            self.espresso = Artikl.objects.create(rm_id=3, name="Espresso")
+            self.macchiato = Artikl.objects.create(rm_id=4, name="Macchiato")
+            espresso = Normativ.objects.create(product=self.espresso)
+            NormativItem.objects.create(normativ=espresso, ingredient=self.kava, qty=Decimal("0.0090"))
+            macchiato = Normativ.objects.create(product=self.macchiato)
+            NormativItem.objects.create(normativ=macchiato, ingredient=self.espresso, qty=Decimal("2.0000"))
+            NormativItem.objects.create(normativ=macchiato, ingredient=self.mlijeko, qty=Decimal("0.0500"))
+
+    def test_nested_normativ_is_flattened(self):
+        boms = get_compiled_boms()
+        self.assertEqual(dict(boms[self.espresso.id]), {self.kava.id: Decimal("0.0090")})
+        self.assertEqual(
+            dict(boms[self.macchiato.id]),
+            {self.kava.id: Decimal("0.0180"), self.mlijeko.id: Decimal("0.0500")},
+        )
+
+    def test_cached_until_normativ_changes(self):
+        get_compiled_boms()
+        with self.assertNumQueries(0):
+            get_compiled_boms()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            NormativItem.objects.filter(normativ__product=self.espresso).get().delete()
+        with self.assertNumQueries(1):
+            boms = get_compiled_boms()
+        self.assertNotIn(self.espresso.id, boms)
+
+    def test_version_bumped_only_after_commit(self):
+        version = cache.get(BOM_VERSION_KEY)
+        with self.captureOnCommitCallbacks() as callbacks:
+            NormativItem.objects.filter(normativ__product=self.espresso).get().delete()
+            # Ova dretva vidi svoju promjenu, ali je ne sprema u procesni cache.
+            self.assertNotIn(self.espresso.id, get_compiled_boms())
+        self.assertEqual(cache.get(BOM_VERSION_KEY), version)
+
+        for callback in callbacks:
+            callback()
+        self.assertNotEqual(cache.get(BOM_VERSION_KEY), version)
+        with self.assertNumQueries(1):
+            self.assertNotIn(self.espresso.id, get_compiled_boms())
+        with self.assertNumQueries(0):
+            get_compiled_boms()
+
+    def test_cycle_is_excluded(self):
+        NormativItem.objects.create(
+            normativ=self.espresso.normativ, ingredient=self.macchiato, qty=Decimal("1.0000")
+        )
+        boms = get_compiled_boms()
+        self.assertNotIn(self.espresso.id, boms)
+        self.assertNotIn(self.macchiato.id, boms)
+
+
+@override_settings(CACHES={"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}})
+class NormativCostingTests(TestCase):
+    def setUp(self):
+        self.warehouse = WarehouseId.objects.create(rm_id=5, name="Sank")
+        with self.captureOnCommitCallbacks(execute=True):
+            invalidate_boms()
+            self.kava = Artikl.objects.create(rm_id=1, name="Kava zrno", is_stock_item=True)
+            self.espresso = Artikl.objects.create(rm_id=3, name="Espresso")
+            normativ = Normativ.objects.create(product=self.espresso)
+            NormativItem.objects.create(normativ=normativ, ingredient=self.kava, qty=Decimal("0.0100"))
+        now = timezone.now()
+        for days, qty, cost in ((2, "0.0040", "20.0000"), (1, "1.0000", "30.0000")):
+            StockLot.objects.create(
+                warehouse=self.warehouse,
+                artikl=self.kava,
+                received_at=now - timezone.timedelta(days=days),
+                unit_cost=Decimal(cost),
+                qty_in=Decimal(qty),
+                qty_remaining=Decimal(qty),
+            )
+        StockBalance.objects.create(
+            warehouse=self.warehouse,
+            artikl=self.kava,
+            on_hand=Decimal("1.0040"),
+            value=Decimal("30.0800"),
+        )
+
+    def test_fifo_cost_spans_lots(self):
+        costs = compute_normativ_costs("fifo")
+        # 0.004 kg po 20 + 0.006 kg po 30
+        self.assertEqual(costs[(self.espresso.id, 5)], {"cost": Decimal("0.2600"), "complete": True})
+        self.assertEqual(costs[(self.kava.id, 5)], {"cost": Decimal("29.9600"), "complete": True})
+
+    def test_weighted_cost(self):
+        costs = compute_normativ_costs("weighted")
+        self.assertEqual(costs[(self.espresso.id, 5)]["cost"], Decimal("0.2996"))
+
+    def test_costs_cached_per_stock_version(self):
+        get_normativ_costs("fifo")
+        with self.assertNumQueries(1):
+            get_normativ_costs("fifo")
+
+        StockBalance.objects.update(updated_at=timezone.now() + timezone.timedelta(seconds=1))
+        StockLot.objects.filter(unit_cost=Decimal("20.0000")).update(qty_remaining=0)
+        self.assertEqual(get_normativ_costs("fifo")[(self.espresso.id, 5)]["cost"], Decimal("0.3000"))
+
+    def test_admin_changelist_loads_costs_once(self):
+        self.client.force_login(
+            get_user_model().objects.create_superuser(username="admin", password="x", email="a@example.com")
+        )
+        url = reverse("admin:artikli_artikl_changelist")
+        self.client.get(url)
+        with CaptureQueriesContext(connection) as few:
+            response = self.client.get(url)
+        self.assertContains(response, "WH 5: 0.2600")
+
+        for rm_id in range(20, 30):
+            Artikl.objects.create(rm_id=rm_id, name=f"Koktel {rm_id}")
+        with CaptureQueriesContext(connection) as many:
+            self.client.get(url)
+        self.assertEqual(len(many), len(few))
+
+        response = self.client.get(reverse("admin:artikli_artikl_change", args=[self.espresso.pk]))
+        self.assertContains(response, "WH 5 (Sank): 0.2600")
+
+    def test_margin_api(self):
+        SalesDailyRollup.objects.create(
+            date=date(2026, 3, 1),
+            artikl=self.espresso,
+            line_count=2,
+            quantity=Decimal("2.0000"),
+            gross_amount=Decimal("3.00"),
+            net_amount=Decimal("2.40"),
+            vat_amount=Decimal("0.60"),
+        )
+        client = APIClient()
+        client.force_authenticate(get_user_model().objects.create_user("pos", password="x"))
+
+        response = client.get("/api/artikli/margins/?date_from=2026-03-01&date_to=2026-03-31&warehouse=5")
+        self.assertEqual(response.status_code, 200)
+        row = next(row for row in response.data["rows"] if row["artikl_id"] == self.espresso.id)
+        self.assertEqual(row["sale_price_net"], Decimal("1.2000"))
+        self.assertEqual(row["margin"], Decimal("0.9400"))
+        self.assertEqual(row["margin_pct"], Decimal("78.33"))
+
+        response = client.get("/api/artikli/margins/?method=lifo")
+        self.assertEqual(response.status_code, 400)
@@ -0,0 +1,105 @@
+import hashlib
+import io
+import logging
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from PIL import Image, ImageOps
+
+logger = logging.getLogger(__name__)
+
+THUMBNAIL_DIR = "artikli/thumbs"
+DEFAULT_SIZES = ((46, 75), (125, 200))
+FORMATS = {
+    "jpeg": ("JPEG", "image/jpeg"),
+    "png": ("PNG", "image/png"),
+    "webp": ("WEBP", "image/webp"),
+}
+SOURCE_FORMATS = {".jpg": "jpeg", ".jpeg": "jpeg", ".webp": "webp"}
+
+
+def parse_size(value: str) -> tuple[int, int]:
+    """'46x75' -> (46, 75); dozvoljene su samo velicine iz ARTIKL_THUMBNAIL_SIZES."""
+    allowed = {size.strip() for size in settings.ARTIKL_THUMBNAIL_SIZES}
+    value = (value or "").strip().lower()
+    if value not in allowed:
+        raise ValueError(f"Nedozvoljena velicina slike: {value or '-'}.")
+    width, height = value.split("x", 1)
+    return int(width), int(height)
+
+
+def image_token(artikl) -> str:
+    return hashlib.sha1(artikl.image.name.encode("utf-8")).hexdigest()[:12]
+
+
+def default_format(artikl) -> str:
+    """Format varijante kad ga klijent ne trazi: isti kao original (JPEG ostaje JPEG)."""
+    name = artikl.image.name.lower()
+    return next((fmt for ext, fmt in SOURCE_FORMATS.items() if name.endswith(ext)), "png")
+
+
+def thumbnail_name(artikl, size: tuple[int, int], fmt: str = "png") -> str:
+    width, height = size
+    return f"{THUMBNAIL_DIR}/{artikl.pk}/{image_token(artikl)}_{width}x{height}.{fmt}"
+
+
+def render_thumbnail(artikl, size: tuple[int, int], fmt: str = "png") -> bytes:
+    pil_format, _ = FORMATS[fmt]
+    with artikl.image.open("rb") as image_file:
+        img = Image.open(image_file)
+        img = ImageOps.exif_transpose(img)
+        img = ImageOps.fit(img, size, Image.LANCZOS)
+        if pil_format == "JPEG":
+            if img.mode != "RGB":
+                img = img.convert("RGB")
+        elif img.mode not in ("RGB", "RGBA", "L", "LA"):
+            # CMYK, P, I;16... PNG/WebP ih ne mogu zapisati izravno.
+            has_alpha = "A" in img.getbands() or "transparency" in img.info
+            img = img.convert("RGBA" if has_alpha else "RGB")
+        buffer = io.BytesIO()
+        img.save(buffer, format=pil_format)
+        return buffer.getvalue()
+
+
+def get_thumbnail(artikl, size: tuple[int, int], fmt: str | None = None) -> str:
+    """
+    Vraca ime spremljene varijante na storageu; generira je samo ako jos ne
+    postoji. Ime sadrzi token originalne slike pa nova slika daje nova imena.
+    """
+    fmt = fmt or default_format(artikl)
+    if fmt not in FORMATS:
+        raise ValueError(f"Nepodrzan format slike: {fmt}.")
+    name = thumbnail_name(artikl, size, fmt)
+    if default_storage.exists(name):
+        return name
+    saved = default_storage.save(name, ContentFile(render_thumbnail(artikl, size, fmt)))
+    if saved != name:
+        # Paralelni zahtjev je vec spremio istu varijantu.
+        default_storage.delete(saved)
+    return name
+
+
+def delete_thumbnails(artikl, keep_current: bool = True) -> None:
+    directory = f"{THUMBNAIL_DIR}/{artikl.pk}"
+    try:
+        _, files = default_storage.listdir(directory)
+    except (FileNotFoundError, NotImplementedError):
+        return
+    keep_prefix = f"{image_token(artikl)}_" if keep_current and artikl.image else None
+    for filename in files:
+        if keep_prefix and filename.startswith(keep_prefix):
+            continue
+        default_storage.delete(f"{directory}/{filename}")
+
+
+def refresh_thumbnails(artikl) -> None:
+    """Brise varijante stare slike i unaprijed generira zadane velicine nove."""
+    delete_thumbnails(artikl)
+    if not artikl.image:
+        return
+    for size in DEFAULT_SIZES:
+        try:
+            get_thumbnail(artikl, size)
+        except Exception:
+            logger.exception("Failed to generate thumbnail %sx%s for artikl %s", *size, artikl.pk)
@@ -198,6 +198,22 @@ USE_I18N = True
 USE_TZ = True
 
 
+# Cache (dijeljen izmedu web i celery procesa; koristi se za single-flight refresh)
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.redis.RedisCache",
+        "LOCATION": os.getenv("CACHE_URL", "redis://redis:6379/1"),
+    }
+}
+
+# Koliko dugo (s) se stanje artikla iz Remarisa smatra svjezim u ArtiklDetailView.
+PRODUCT_STOCK_REFRESH_TTL = int(os.getenv("PRODUCT_STOCK_REFRESH_TTL", "300"))
+
+# Razvijeni normativi drze se u memoriji procesa; ako dijeljeni cache nije
+# dostupan za verziju, ponovno se ucitavaju nakon ovoliko sekundi.
+NORMATIV_BOM_CACHE_TTL = int(os.getenv("NORMATIV_BOM_CACHE_TTL", "60"))
+
+
 # Celery
 CELERY_BROKER_URL = os.getenv("CELERY_BROKER_URL", "redis://redis:6379/0")
 CELERY_RESULT_BACKEND = os.getenv("CELERY_RESULT_BACKEND", CELERY_BROKER_URL)
@@ -207,12 +223,32 @@ CELERY_BEAT_SCHEDULE = {
         "task": "mailbox_app.tasks.sync_imap_mailbox",
         "schedule": crontab(minute="*"),
     },
+    "import-sales-invoices-incremental": {
+        "task": "sales.tasks.import_sales_invoices_incremental",
+        "schedule": crontab(minute=f"*/{os.getenv('SALES_INCREMENTAL_IMPORT_MINUTES', '5')}"),
+    },
     "import-sales-invoices-daily": {
         "task": "sales.tasks.import_sales_invoices_today",
         "schedule": crontab(hour=23, minute=59),
     },
+    "archive-exhausted-stock-lots-daily": {
+        "task": "stock.tasks.archive_exhausted_stock_lots",
+        "schedule": crontab(hour=3, minute=30),
+    },
 }
 
+# Inkrementalni uvoz prometa: nakon uvoza novih racuna opcionalno robno
+# razduzi dan i vrati Z sazetak dana u rezultatu taska. Nocni puni uvoz
+# ostaje kao uskladjivanje.
+SALES_INCREMENTAL_STOCK_OUT = os.getenv("SALES_INCREMENTAL_STOCK_OUT", "False").lower() == "true"
+SALES_INCREMENTAL_Z_SUMMARY = os.getenv("SALES_INCREMENTAL_Z_SUMMARY", "False").lower() == "true"
+
+# Broj paralelnih Remaris zahtjeva pri syncu stanja skladista.
+REMARIS_SYNC_MAX_WORKERS = int(os.getenv("REMARIS_SYNC_MAX_WORKERS", "4"))
+
+# Potroseni FIFO slojevi stariji od ovog broja dana sele se u StockLotArchive.
+STOCK_LOT_ARCHIVE_AFTER_DAYS = int(os.getenv("STOCK_LOT_ARCHIVE_AFTER_DAYS", "180"))
+
 
 # Static files (CSS, JavaScript, Images)
 # https://docs.djangoproject.com/en/5.2/howto/static-files/
@@ -222,6 +258,8 @@ STATIC_ROOT = BASE_DIR / 'staticfiles'
 STATICFILES_STORAGE = "whitenoise.storage.CompressedManifestStaticFilesStorage"
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
+# Dozvoljene velicine thumbnaila artikala (?size=WxH).
+ARTIKL_THUMBNAIL_SIZES = os.getenv("ARTIKL_THUMBNAIL_SIZES", "46x75,125x200,92x150,250x400").split(",")
 
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
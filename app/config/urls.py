@@ -29,7 +29,7 @@ from mailbox_app.api_views import MailboxSyncView
 from mailbox_app.api import MailMessageDetailView, MailMessageListView
 from contacts.api import SupplierListView
 from configuration.api import PaymentTypeListView
-from accounting.api import CashLedgerView
+from accounting.api import CashLedgerExportView, CashLedgerView
 from orders.api import (
     PurchaseOrderDetailView,
     PurchaseOrderItemDetailView,
@@ -42,16 +42,19 @@ from artikli.api import (
     ArtiklDetailView,
     ArtiklListView,
     UnitOfMeasureListView,
+    ArtiklImageView,
     ArtiklImage46x75View,
     ArtiklImage125x200View,
     DrinkCategoryListView,
     DrinkCategoryDetailView,
+    NormativMarginView,
 )
 from sales.api import (
     RepresentationDetailView,
     RepresentationListView,
     RepresentationReasonDetailView,
     RepresentationReasonListView,
+    SalesRollupView,
 )
 from stock.api import (
     InventoryDetailView,
@@ -81,7 +84,9 @@ urlpatterns = [
     path('api/me/', MeView.as_view(), name='api-me'),
     path('api/users/<int:user_id>/', UserDetailView.as_view(), name='api-user-detail'),
     path('api/artikli/', ArtiklListView.as_view(), name='api-artikl-list'),
+    path('api/artikli/margins/', NormativMarginView.as_view(), name='api-artikl-margins'),
     path('api/artikli/<int:rm_id>/', ArtiklDetailView.as_view(), name='api-artikl-detail'),
+    path('api/artikli/<int:rm_id>/image/', ArtiklImageView.as_view(), name='api-artikl-image'),
     path('api/artikli/<int:rm_id>/image-46x75/', ArtiklImage46x75View.as_view(), name='api-artikl-image-46x75'),
     path('api/artikli/<int:rm_id>/image-125x200/', ArtiklImage125x200View.as_view(), name='api-artikl-image-125x200'),
     path('api/drink-categories/', DrinkCategoryListView.as_view(), name='api-drink-category-list'),
@@ -90,6 +95,7 @@ urlpatterns = [
     path('api/representations/<int:pk>/', RepresentationDetailView.as_view(), name='api-representation-detail'),
     path('api/representation-reasons/', RepresentationReasonListView.as_view(), name='api-representation-reason-list'),
     path('api/representation-reasons/<int:pk>/', RepresentationReasonDetailView.as_view(), name='api-representation-reason-detail'),
+    path('api/sales/rollup/', SalesRollupView.as_view(), name='api-sales-rollup'),
     path('api/units/', UnitOfMeasureListView.as_view(), name='api-unit-list'),
     path('api/inventories/', InventoryListCreateView.as_view(), name='api-inventory-list'),
     path('api/inventories/<int:pk>/', InventoryDetailView.as_view(), name='api-inventory-detail'),
@@ -106,6 +112,7 @@ urlpatterns = [
     path('api/payment-types/', PaymentTypeListView.as_view(), name='api-payment-type-list'),
     path('api/suppliers/<int:supplier_id>/artikli/', SupplierArtiklListView.as_view(), name='api-supplier-artikl-list'),
     path("api/accounting/cash-ledger/", CashLedgerView.as_view(), name="api-cash-ledger"),
+    path("api/accounting/cash-ledger/export/", CashLedgerExportView.as_view(), name="api-cash-ledger-export"),
     path("api/operations/shifts/", ShiftListCreateView.as_view(), name="api-shift-list-create"),
     path("api/operations/shifts/<int:shift_id>/cash-count/", ShiftCashCountCreateView.as_view(), name="api-shift-cash-count"),
     path("api/operations/shifts/<int:shift_id>/cash-summary/", ShiftCashSummaryView.as_view(), name="api-shift-cash-summary"),
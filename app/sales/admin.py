@@ -3,26 +3,50 @@ from decimal import Decimal, ROUND_HALF_UP
 
 from django import forms
 from django.contrib import admin, messages
-from django.db.models import Count, Exists, OuterRef, Q, Subquery, Sum
-from django.db.models import CharField, Value
-from django.db.models.functions import Cast, Concat
+from django.db.models import BooleanField, Count, Exists, ExpressionWrapper, F, IntegerField, OuterRef, Q, Subquery, Sum
+from django.db.models.functions import Coalesce
 from django.urls import reverse
 from django.utils.html import format_html
-from stock.models import StockMove, StockMoveLine, WarehouseTransfer, WarehouseTransferItem, WarehouseId
+from stock.models import WarehouseTransfer, WarehouseTransferItem, WarehouseId
 from django.utils import timezone
 from mptt.admin import TreeRelatedFieldListFilter
 
-from artikli.models import NormativItem
 from sales.models import (
     Representation,
     RepresentationItem,
     RepresentationReason,
+    SalesBackfillChunk,
+    SalesDailyRollup,
+    SalesImportWatermark,
     SalesInvoice,
     SalesInvoiceItem,
+    SalesInvoiceStockMove,
+    SalesProductAlias,
     SalesZPosting,
 )
+from sales.product_matching import learn_product_alias, resolve_unmatched_items
+from sales.rollups import (
+    refresh_rollups_for_items,
+    refresh_sales_daily_rollups,
+    sales_rollup_range_totals,
+)
 from sales.remaris_importer import import_sales_invoices, load_import_defaults
-from sales.services import create_sales_z, get_sales_z_summary, post_sales_items_stock_out, post_sales_z_posting
+from sales.services import (
+    create_sales_z,
+    get_sales_z_summaries,
+    post_sales_day_stock_out,
+    post_sales_items_stock_out,
+    post_sales_z_posting,
+)
+
+
+# Pocetak raspona za IssuedOnTotalFilter (raspon uvijek zavrsava danas).
+ISSUED_ON_RANGE_DAYS = {
+    "today": lambda today: today,
+    "last7": lambda today: today - timedelta(days=6),
+    "month": lambda today: today.replace(day=1),
+    "year": lambda today: date(today.year, 1, 1),
+}
 
 
 def _store_z_results(request, *, title: str, results: list[dict]):
@@ -60,7 +84,7 @@ def import_sales_invoices_action(modeladmin, request, queryset):
     date_to = date_from
 
     defaults = load_import_defaults()
-    created, updated, skipped = import_sales_invoices(
+    created, updated, unchanged = import_sales_invoices(
         date_from=date_from,
         date_to=date_to,
         **defaults,
@@ -68,7 +92,7 @@ def import_sales_invoices_action(modeladmin, request, queryset):
 
     modeladmin.message_user(
         request,
-        f"Import complete. created={created} updated={updated} skipped={skipped}",
+        f"Import complete. created={created} updated={updated} unchanged={unchanged}",
         level=messages.SUCCESS,
     )
 
@@ -81,12 +105,19 @@ def post_sales_z_action(modeladmin, request, queryset):
     created = 0
     skipped = 0
     results: list[dict] = []
-    for issued_on, warehouse_id, pos_id in sorted(combos):
-        summary = get_sales_z_summary(
-            issued_on=issued_on,
-            warehouse_id=warehouse_id,
-            pos_id=pos_id,
+    if not combos:
+        return
+    summaries = {
+        (summary["issued_on"], summary["warehouse_id"], summary["pos_id"]): summary
+        for summary in get_sales_z_summaries(
+            date_from=min(issued_on for issued_on, _, _ in combos),
+            date_to=max(issued_on for issued_on, _, _ in combos),
         )
+    }
+    warehouse_names = dict(WarehouseId.objects.filter(id__in={c[1] for c in combos}).values_list("id", "name"))
+    pos_names = dict(Pos.objects.filter(id__in={c[2] for c in combos}).values_list("id", "name"))
+    for issued_on, warehouse_id, pos_id in sorted(combos, key=lambda c: (c[0], c[1] or 0, c[2] or 0)):
+        summary = summaries[(issued_on, warehouse_id, pos_id)]
         try:
             create_sales_z(
                 issued_on=issued_on,
@@ -101,8 +132,8 @@ def post_sales_z_action(modeladmin, request, queryset):
             status = "skipped"
             note = str(exc)
 
-        warehouse_label = WarehouseId.objects.filter(id=warehouse_id).values_list("name", flat=True).first() or str(warehouse_id or "")
-        pos_label = Pos.objects.filter(id=pos_id).values_list("name", flat=True).first() or str(pos_id or "")
+        warehouse_label = warehouse_names.get(warehouse_id) or str(warehouse_id or "")
+        pos_label = pos_names.get(pos_id) or str(pos_id or "")
         results.append(
             {
                 "issued_on": str(summary["issued_on"]),
@@ -110,7 +141,7 @@ def post_sales_z_action(modeladmin, request, queryset):
                 "pos": pos_label,
                 "net_amount": f"{summary['net_amount']:.2f}",
                 "vat_amount": f"{summary['vat_amount']:.2f}",
-                "pnp_amount": f"{summary.get('pnp_amount', 0):.2f}",
+                "pnp_amount": f"{summary['pnp_amount']:.2f}" if summary["pnp_amount"] is not None else "-",
                 "total_amount": f"{summary['total_amount']:.2f}",
                 "status": status,
                 "note": note,
@@ -126,6 +157,43 @@ def post_sales_z_action(modeladmin, request, queryset):
         _store_z_results(request, title="Rezultat Z knjiženja (akcija)", results=results)
 
 
+@admin.action(description="Robno razduži (dnevno)", permissions=["change"])
+def post_sales_day_stock_out_action(modeladmin, request, queryset):
+    from pos.models import Pos
+    combos = set(queryset.values_list("issued_on", "warehouse_id", "pos_id"))
+    warehouses = WarehouseId.objects.in_bulk({warehouse_id for _, warehouse_id, _ in combos if warehouse_id})
+    poses = Pos.objects.in_bulk({pos_id for _, _, pos_id in combos if pos_id})
+    created = 0
+    skipped = 0
+    errors: list[str] = []
+    warnings: list[str] = []
+    for issued_on, warehouse_id, pos_id in sorted(combos, key=lambda c: (c[0], c[1] or 0, c[2] or 0)):
+        label = f"{issued_on:%d.%m.%Y} (lok {warehouse_id}, POS {pos_id})"
+        try:
+            move, skipped_items = post_sales_day_stock_out(
+                issued_on=issued_on,
+                warehouse=warehouses.get(warehouse_id),
+                pos=poses.get(pos_id),
+                user=request.user,
+            )
+            created += 1
+            for msg in skipped_items:
+                warnings.append(f"{label}: {msg}")
+        except Exception as exc:
+            skipped += 1
+            errors.append(f"{label}: {exc}")
+
+    modeladmin.message_user(
+        request,
+        f"Dnevno razduzenje gotovo. created={created} skipped={skipped}",
+        level=messages.SUCCESS,
+    )
+    for msg in warnings[:20]:
+        modeladmin.message_user(request, msg, level=messages.WARNING)
+    for msg in errors[:20]:
+        modeladmin.message_user(request, msg, level=messages.ERROR)
+
+
 @admin.register(SalesInvoice)
 class SalesInvoiceAdmin(admin.ModelAdmin):
     class SalesInvoiceAdminForm(forms.ModelForm):
@@ -149,52 +217,26 @@ class SalesInvoiceAdmin(admin.ModelAdmin):
         parameter_name = "issued_on_range"
 
         def lookups(self, request, model_admin):
-            base_qs = model_admin.get_queryset(request)
             today = timezone.localdate()
-            ranges = [
-                ("today", "Danas", today, today),
-                ("last7", "Prošlih 7 dana", today - timedelta(days=6), today),
-                ("month", "Ovaj mjesec", today.replace(day=1), today),
-                ("year", "Ova godina", date(today.year, 1, 1), today),
-            ]
-            lookups = [("any", "Bilo koji datum", None, None)]
-            for key, label, start, end in ranges:
-                totals = base_qs.filter(issued_on__gte=start, issued_on__lte=end).aggregate(
-                    total=Sum("total_amount"),
-                    net=Sum("net_amount"),
-                    vat=Sum("vat_amount"),
-                )
-                total = (totals.get("total") or Decimal("0.00")).quantize(
-                    Decimal("0.01"), rounding=ROUND_HALF_UP
-                )
-                net = (totals.get("net") or Decimal("0.00")).quantize(
-                    Decimal("0.01"), rounding=ROUND_HALF_UP
-                )
-                vat = (totals.get("vat") or Decimal("0.00")).quantize(
-                    Decimal("0.01"), rounding=ROUND_HALF_UP
-                )
-                lookups.append((key, f"{label} (net {net:.2f} | PDV {vat:.2f} | bruto {total:.2f})", start, end))
-            return [(key, label) for key, label, _, _ in lookups]
+            labels = {"today": "Danas", "last7": "Prošlih 7 dana", "month": "Ovaj mjesec", "year": "Ova godina"}
+            ranges = [(key, labels[key], start(today), today) for key, start in ISSUED_ON_RANGE_DAYS.items()]
+            range_totals = sales_rollup_range_totals({key: (start, end) for key, _, start, end in ranges})
+            lookups = [("any", "Bilo koji datum")]
+            for key, label, _, _ in ranges:
+                totals = range_totals[key]
+                total = totals["gross_amount"].quantize(Decimal("0.01"), rounding=ROUND_HALF_UP)
+                net = totals["net_amount"].quantize(Decimal("0.01"), rounding=ROUND_HALF_UP)
+                vat = totals["vat_amount"].quantize(Decimal("0.01"), rounding=ROUND_HALF_UP)
+                lookups.append((key, f"{label} (net {net:.2f} | PDV {vat:.2f} | bruto {total:.2f})"))
+            return lookups
 
         def queryset(self, request, queryset):
             value = self.value()
             if not value or value == "any":
                 return queryset
-            today = timezone.localdate()
-            if value == "today":
-                return queryset.filter(issued_on=today)
-            if value == "last7":
-                return queryset.filter(
-                    issued_on__gte=today - timedelta(days=6),
-                    issued_on__lte=today,
-                )
-            if value == "month":
-                return queryset.filter(issued_on__gte=today.replace(day=1), issued_on__lte=today)
-            if value == "year":
-                return queryset.filter(
-                    issued_on__gte=date(today.year, 1, 1),
-                    issued_on__lte=today,
-                )
+            if value in ISSUED_ON_RANGE_DAYS:
+                today = timezone.localdate()
+                return queryset.filter(issued_on__gte=ISSUED_ON_RANGE_DAYS[value](today), issued_on__lte=today)
             return queryset
 
     list_display = (
@@ -216,7 +258,7 @@ class SalesInvoiceAdmin(admin.ModelAdmin):
     readonly_fields = ("issued_on", "issued_at")
     list_filter = (IssuedOnTotalFilter, "issued_on", "waiter_name")
     search_fields = ("rm_number", "location_name", "waiter_name", "buyer_name", "issued_on__exact")
-    actions = [import_sales_invoices_action, post_sales_z_action]
+    actions = [import_sales_invoices_action, post_sales_z_action, post_sales_day_stock_out_action]
     change_list_template = "admin/sales/salesinvoice/change_list.html"
 
     def lookup_allowed(self, lookup, value):
@@ -258,6 +300,21 @@ class SalesInvoiceAdmin(admin.ModelAdmin):
     def issued_at_display(self, obj):
         return obj.issued_at.strftime("%d.%m.%Y %H:%M") if obj.issued_at else ""
 
+    def save_model(self, request, obj, form, change):
+        super().save_model(request, obj, form, change)
+        if change and {"warehouse", "pos"} & set(form.changed_data):
+            refresh_sales_daily_rollups([obj.issued_on])
+
+    def delete_model(self, request, obj):
+        issued_on = obj.issued_on
+        super().delete_model(request, obj)
+        refresh_sales_daily_rollups([issued_on])
+
+    def delete_queryset(self, request, queryset):
+        dates = list(queryset.values_list("issued_on", flat=True).distinct())
+        super().delete_queryset(request, queryset)
+        refresh_sales_daily_rollups(dates)
+
     def changelist_view(self, request, extra_context=None):
         response = super().changelist_view(request, extra_context=extra_context)
         try:
@@ -266,8 +323,7 @@ class SalesInvoiceAdmin(admin.ModelAdmin):
             return response
 
         totals = cl.queryset.aggregate(total=Sum("total_amount"))
-        total = totals.get("total") or Decimal("0.00")
-        total = total.quantize(Decimal("0.01"), rounding=ROUND_HALF_UP)
+        total = (totals.get("total") or Decimal("0.00")).quantize(Decimal("0.01"), rounding=ROUND_HALF_UP)
         response.context_data["grand_total_amount"] = f"{total:.2f}".replace(".", ",")
         response.context_data["z_batch_title"] = request.session.pop("z_batch_title", None)
         response.context_data["z_batch_results"] = request.session.pop("z_batch_results", None)
@@ -281,14 +337,11 @@ class SalesInvoiceAdmin(admin.ModelAdmin):
             pos_id=OuterRef("pos_id"),
             ledger_id=OuterRef("ledger_id"),
         )
-        move_qs = StockMove.objects.filter(
-            move_type=StockMove.MoveType.OUT,
-            reference=Concat(Value("POS racun "), Cast(OuterRef("rm_number"), output_field=CharField())),
-        )
+        link_qs = SalesInvoiceStockMove.objects.filter(invoice_id=OuterRef("pk"))
         return qs.annotate(
             _z_included=Exists(z_qs),
             _z_posted=Exists(z_qs.filter(journal_entry__isnull=False)),
-            _stock_out_done=Exists(move_qs),
+            _stock_out_done=Exists(link_qs),
         )
 
     @admin.display(boolean=True, description="u Z", ordering="_z_included")
@@ -312,7 +365,6 @@ class SalesInvoiceItemAdmin(admin.ModelAdmin):
 
         def __init__(self, field, request, params, model, model_admin, field_path):
             super().__init__(field, request, params, model, model_admin, field_path)
-            base_qs = model_admin.get_queryset(request)
             date_filters = {}
             for key in (
                 "invoice__issued_on__gte",
@@ -322,16 +374,30 @@ class SalesInvoiceItemAdmin(admin.ModelAdmin):
             ):
                 if key in request.GET:
                     date_filters[key] = request.GET.get(key)
-            if date_filters:
-                base_qs = base_qs.filter(**date_filters)
-
-            raw_counts = {
-                row["artikl__drink_category_id"]: row["c"]
-                for row in base_qs
-                .filter(artikl__drink_category_id__isnull=False)
-                .values("artikl__drink_category_id")
-                .annotate(c=Count("id"))
-            }
+
+            if "invoice__issued_at__gte" in request.GET or "invoice__issued_at__lte" in request.GET:
+                base_qs = model_admin.get_queryset(request)
+                if date_filters:
+                    base_qs = base_qs.filter(**date_filters)
+                raw_counts = {
+                    row["artikl__drink_category_id"]: row["c"]
+                    for row in base_qs
+                    .filter(artikl__drink_category_id__isnull=False)
+                    .values("artikl__drink_category_id")
+                    .annotate(c=Count("id"))
+                }
+            else:
+                rollup_filters = {
+                    key.replace("invoice__issued_on", "date"): value for key, value in date_filters.items()
+                }
+                raw_counts = dict(
+                    SalesDailyRollup.objects
+                    .filter(drink_category_id__isnull=False, **rollup_filters)
+                    .values("drink_category_id")
+                    .annotate(c=Sum("line_count"))
+                    .values_list("drink_category_id", "c")
+                    .order_by()
+                )
 
             categories = list(self.other_model.objects.all().only("id", "parent_id"))
             children = {}
@@ -412,13 +478,9 @@ class SalesInvoiceItemAdmin(admin.ModelAdmin):
         def queryset(self, request, queryset):
             value = self.value()
             if value == "1":
-                return queryset.filter(
-                    models.Q(stock_out_posted_at__isnull=False) | models.Q(_stock_out_done=True)
-                )
+                return queryset.filter(_stock_out_done=True)
             if value == "0":
-                return queryset.filter(
-                    stock_out_posted_at__isnull=True
-                ).exclude(_stock_out_done=True)
+                return queryset.filter(_stock_out_done=False)
             return queryset
 
     list_filter = (
@@ -491,9 +553,6 @@ class SalesInvoiceItemAdmin(admin.ModelAdmin):
                     user=request.user,
                 )
                 created += 1
-                SalesInvoiceItem.objects.filter(id__in=[i.id for i in items]).update(
-                    stock_out_posted_at=timezone.now()
-                )
                 for msg in skipped_items:
                     warnings.append(f"Racun {invoice.rm_number}: {msg}")
             except Exception as exc:
@@ -510,6 +569,22 @@ class SalesInvoiceItemAdmin(admin.ModelAdmin):
         for msg in errors[:20]:
             self.message_user(request, msg, level=messages.ERROR)
 
+    def save_model(self, request, obj, form, change):
+        super().save_model(request, obj, form, change)
+        if not (change and "artikl" in form.changed_data):
+            return
+        if not obj.artikl_id:
+            refresh_rollups_for_items([obj.id])
+            return
+        # Alias povezuje ostale stavke i jednom osvjezava rollup, i za ovu stavku.
+        resolved = learn_product_alias(obj.product_name, obj.artikl_id, refresh_item_ids=[obj.id])
+        if resolved:
+            self.message_user(
+                request,
+                f"Alias spremljen; povezano jos {resolved} stavki naziva '{obj.product_name}'.",
+                level=messages.INFO,
+            )
+
     def changelist_view(self, request, extra_context=None):
         response = super().changelist_view(request, extra_context=extra_context)
         try:
@@ -533,32 +608,20 @@ class SalesInvoiceItemAdmin(admin.ModelAdmin):
 
     def get_queryset(self, request):
         qs = super().get_queryset(request)
-        move_qs = StockMove.objects.filter(
-            move_type=StockMove.MoveType.OUT,
-            purpose=StockMove.Purpose.SALE,
-            reference=Concat(
-                Value("POS racun "),
-                Cast(OuterRef("invoice__rm_number"), output_field=CharField()),
+        return qs.annotate(
+            _stock_out_done=ExpressionWrapper(
+                Q(stock_move__isnull=False) | Q(stock_out_posted_at__isnull=False),
+                output_field=BooleanField(),
             ),
-        ).values("id")[:1]
-        ingredient_rm_ids = NormativItem.objects.filter(
-            normativ__product_id=OuterRef("artikl_id"),
-            normativ__is_active=True,
-        ).values("ingredient__rm_id")
-        move_line_qs = StockMoveLine.objects.filter(
-            move__move_type=StockMove.MoveType.OUT,
-            move__purpose=StockMove.Purpose.SALE,
-            move__reference=Concat(
-                Value("POS racun "),
-                Cast(OuterRef("invoice__rm_number"), output_field=CharField()),
+            _stock_move_id=Coalesce(
+                F("stock_move_id"),
+                Subquery(
+                    SalesInvoiceStockMove.objects.filter(invoice_id=OuterRef("invoice_id"))
+                    .order_by("-stock_move_id")
+                    .values("stock_move_id")[:1]
+                ),
+                output_field=IntegerField(),
             ),
-            warehouse_id=OuterRef("invoice__warehouse__rm_id"),
-        ).filter(
-            Q(artikl_id=OuterRef("artikl__rm_id")) | Q(artikl_id__in=Subquery(ingredient_rm_ids))
-        )
-        return qs.annotate(
-            _stock_out_done=Exists(move_line_qs),
-            _stock_move_id=Subquery(move_qs),
         )
 
     @admin.display(boolean=True, description="robno", ordering="_stock_out_done")
@@ -576,6 +639,38 @@ class SalesInvoiceItemAdmin(admin.ModelAdmin):
         return format_html('<a href="{}">#{}</a>', url, move_id)
 
 
+@admin.register(SalesProductAlias)
+class SalesProductAliasAdmin(admin.ModelAdmin):
+    list_display = ("normalized_name", "artikl", "source", "similarity", "is_confirmed", "created_at")
+    list_filter = ("source", "is_confirmed")
+    search_fields = ("normalized_name", "artikl__name", "artikl__code")
+    autocomplete_fields = ("artikl",)
+    actions = ["confirm_aliases_action"]
+
+    @admin.action(description="Potvrdi aliase i povezi stavke", permissions=["change"])
+    def confirm_aliases_action(self, request, queryset):
+        confirmed = queryset.filter(is_confirmed=False).update(is_confirmed=True)
+        resolved = resolve_unmatched_items(dict(queryset.values_list("normalized_name", "artikl_id")))
+        self.message_user(
+            request,
+            f"Potvrdjeno aliasa: {confirmed}, povezano stavki: {resolved}.",
+            level=messages.SUCCESS,
+        )
+
+
+@admin.register(SalesImportWatermark)
+class SalesImportWatermarkAdmin(admin.ModelAdmin):
+    list_display = ("external_location_id", "external_pos_id", "last_rm_number", "last_issued_at", "last_run_at", "locked_until")
+    readonly_fields = ("last_run_at",)
+
+
+@admin.register(SalesBackfillChunk)
+class SalesBackfillChunkAdmin(admin.ModelAdmin):
+    list_display = ("date_from", "date_to", "external_location_id", "external_pos_id", "status", "invoice_count", "updated_at")
+    list_filter = ("status",)
+    readonly_fields = ("updated_at",)
+
+
 @admin.register(SalesZPosting)
 class SalesZPostingAdmin(admin.ModelAdmin):
     list_display = (
@@ -1,7 +1,11 @@
-from rest_framework import generics, serializers
+from django.utils.dateparse import parse_date
+from rest_framework import generics, serializers, status
+from rest_framework.response import Response
+from rest_framework.views import APIView
 
 from artikli.models import Artikl
 from sales.models import Representation, RepresentationItem, RepresentationReason
+from sales.rollups import sales_rollup_totals
 
 
 class RepresentationItemSerializer(serializers.ModelSerializer):
@@ -91,3 +95,41 @@ class RepresentationReasonListView(generics.ListCreateAPIView):
 class RepresentationReasonDetailView(generics.RetrieveUpdateDestroyAPIView):
     queryset = RepresentationReason.objects.all()
     serializer_class = RepresentationReasonSerializer
+
+
+class SalesRollupView(APIView):
+    """Zbroj prometa za period iz dnevnog rollupa (?date_from&date_to[&group_by&warehouse&pos])."""
+
+    def get(self, request):
+        date_from = parse_date(request.query_params.get("date_from", ""))
+        date_to = parse_date(request.query_params.get("date_to", ""))
+        if not date_from or not date_to:
+            return Response(
+                {"detail": "Parametri date_from i date_to su obavezni (YYYY-MM-DD)."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        if date_from > date_to:
+            return Response(
+                {"detail": "date_from ne smije biti veći od date_to."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        try:
+            warehouse_id = int(request.query_params["warehouse"]) if request.query_params.get("warehouse") else None
+            pos_id = int(request.query_params["pos"]) if request.query_params.get("pos") else None
+            rows = sales_rollup_totals(
+                date_from=date_from,
+                date_to=date_to,
+                warehouse_id=warehouse_id,
+                pos_id=pos_id,
+                group_by=request.query_params.get("group_by") or None,
+            )
+        except ValueError as exc:
+            return Response({"detail": str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+
+        return Response(
+            {
+                "date_from": date_from.isoformat(),
+                "date_to": date_to.isoformat(),
+                "rows": rows,
+            }
+        )
@@ -0,0 +1,212 @@
+import logging
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, ThreadPoolExecutor, wait
+from datetime import date as date_cls, timedelta
+from pathlib import Path
+
+import django
+from django.conf import settings
+from django.db import connections
+from django.db.models import Q
+from django.utils import timezone
+
+from artikli.remaris_connector import RemarisConnector
+from sales.models import SalesBackfillChunk
+from sales.remaris_importer import _download_report_excel, _parse_sales_report, import_invoice_rows
+
+logger = logging.getLogger(__name__)
+
+# Odsjecak u statusu RUNNING dulje od ovoga smatra se napustenim (pad procesa).
+BACKFILL_CHUNK_STALE = timedelta(hours=1)
+
+
+def split_date_range(date_from: date_cls, date_to: date_cls, chunk_days: int) -> list[tuple[date_cls, date_cls]]:
+    if date_to < date_from:
+        raise ValueError("Datum 'do' je prije datuma 'od'.")
+    if chunk_days < 1:
+        raise ValueError("Odsjecak mora imati barem jedan dan.")
+    ranges = []
+    start = date_from
+    while start <= date_to:
+        end = min(start + timedelta(days=chunk_days - 1), date_to)
+        ranges.append((start, end))
+        start = end + timedelta(days=1)
+    return ranges
+
+
+def backfill_sales_invoices(
+    *,
+    date_from: date_cls,
+    date_to: date_cls,
+    organization_id: int,
+    location_id: int,
+    pos_id: int,
+    currency: str,
+    warehouse_id: int | None = None,
+    chunk_days: int = 7,
+    download_workers: int | None = None,
+    parse_workers: int | None = None,
+    connector: RemarisConnector | None = None,
+) -> dict:
+    """
+    Uvozi promet za dulji period po odsjecima od chunk_days dana.
+    Izvjestaji se skidaju paralelno (dretve), parsiraju u zasebnim procesima
+    (parse_workers=0 parsira u glavnom procesu), a zapis u bazu ide redom,
+    jedna transakcija po odsjecku. Svaki odsjecak ima checkpoint
+    (SalesBackfillChunk); zavrseni se kod ponovnog pokretanja preskacu.
+    """
+    if download_workers is None:
+        download_workers = settings.REMARIS_SYNC_MAX_WORKERS
+    if parse_workers is None:
+        parse_workers = os.cpu_count() or 1
+
+    # Svaki odsjecak se preuzima uvjetnim UPDATE-om, pa dva istovremena
+    # pokretanja ne obraduju isti odsjecak.
+    Status = SalesBackfillChunk.Status
+    claimable = Q(status__in=[Status.PENDING, Status.FAILED]) | Q(
+        status=Status.RUNNING, updated_at__lt=timezone.now() - BACKFILL_CHUNK_STALE
+    )
+    chunks = []
+    skipped = 0
+    running = 0
+    for start, end in split_date_range(date_from, date_to, chunk_days):
+        chunk, _ = SalesBackfillChunk.objects.get_or_create(
+            external_location_id=location_id,
+            external_pos_id=pos_id,
+            date_from=start,
+            date_to=end,
+        )
+        if chunk.status == Status.DONE:
+            skipped += 1
+        elif SalesBackfillChunk.objects.filter(claimable, pk=chunk.pk).update(
+            status=Status.RUNNING, updated_at=timezone.now()
+        ):
+            chunk.status = Status.RUNNING
+            chunks.append(chunk)
+        else:
+            running += 1
+
+    result = {
+        "chunks": len(chunks),
+        "skipped": skipped,
+        "running": running,
+        "failed": 0,
+        "created": 0,
+        "updated": 0,
+        "unchanged": 0,
+        "seconds": 0.0,
+        "invoices_per_second": 0.0,
+    }
+    if not chunks:
+        return result
+
+    started = time.perf_counter()
+    def release_unfinished() -> None:
+        SalesBackfillChunk.objects.filter(pk__in=[chunk.pk for chunk in chunks], status=Status.RUNNING).update(
+            status=Status.PENDING
+        )
+
+    if connector is None:
+        connector = RemarisConnector()
+        try:
+            connector.login()
+        except BaseException:
+            release_unfinished()
+            raise
+    local = threading.local()
+
+    def download(chunk: SalesBackfillChunk) -> Path:
+        worker = getattr(local, "connector", None)
+        if worker is None:
+            worker = local.connector = connector.fork()
+        return _download_report_excel(
+            worker,
+            date_from=chunk.date_from,
+            date_to=chunk.date_to,
+            organization_id=organization_id,
+            location_id=location_id,
+            pos_id=pos_id,
+            currency=currency,
+            warehouse_id=warehouse_id,
+        )
+
+    def fail(chunk: SalesBackfillChunk, exc: BaseException) -> None:
+        logger.warning("Sales backfill %s..%s failed: %s", chunk.date_from, chunk.date_to, exc)
+        chunk.status = SalesBackfillChunk.Status.FAILED
+        chunk.error = str(exc)
+        chunk.save(update_fields=["status", "error", "updated_at"])
+        result["failed"] += 1
+
+    def write(chunk: SalesBackfillChunk, invoices) -> None:
+        created, updated, unchanged = import_invoice_rows(
+            invoices,
+            organization_id=organization_id,
+            location_id=location_id,
+            pos_id=pos_id,
+            currency=currency,
+        )
+        result["created"] += created
+        result["updated"] += updated
+        result["unchanged"] += unchanged
+        chunk.status = SalesBackfillChunk.Status.DONE
+        chunk.invoice_count = created + updated + unchanged
+        chunk.error = ""
+        chunk.save(update_fields=["status", "invoice_count", "error", "updated_at"])
+
+    parse_pool = None
+    if parse_workers > 0:
+        # spawn umjesto fork: fork uz aktivne dretve (preuzimanje) moze
+        # naslijediti zakljucan lock. Novi proces sam podize Django.
+        connections.close_all()
+        parse_pool = ProcessPoolExecutor(
+            max_workers=parse_workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=django.setup,
+        )
+    download_pool = ThreadPoolExecutor(
+        max_workers=max(1, min(download_workers, len(chunks))),
+        thread_name_prefix="remaris-sales",
+    )
+    pending: dict[Future, tuple[str, SalesBackfillChunk, Path | None]] = {}
+    try:
+        for chunk in chunks:
+            pending[download_pool.submit(download, chunk)] = ("download", chunk, None)
+
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                stage, chunk, path = pending.pop(future)
+                try:
+                    if stage == "download":
+                        path = future.result()
+                        if parse_pool is None:
+                            write(chunk, _parse_sales_report(path))
+                            path.unlink(missing_ok=True)
+                        else:
+                            pending[parse_pool.submit(_parse_sales_report, path)] = ("parse", chunk, path)
+                    else:
+                        path.unlink(missing_ok=True)
+                        write(chunk, future.result())
+                except Exception as exc:
+                    if path is not None:
+                        path.unlink(missing_ok=True)
+                    fail(chunk, exc)
+    finally:
+        download_pool.shutdown(wait=True, cancel_futures=True)
+        if parse_pool is not None:
+            parse_pool.shutdown(wait=True, cancel_futures=True)
+        for _, _, path in pending.values():
+            if path is not None:
+                path.unlink(missing_ok=True)
+        # Prekinuto pokretanje vraca svoje neobradene odsjecke za sljedece.
+        release_unfinished()
+
+    seconds = time.perf_counter() - started
+    invoices = result["created"] + result["updated"] + result["unchanged"]
+    result["seconds"] = seconds
+    result["invoices_per_second"] = invoices / seconds if seconds else 0.0
+    logger.info("Sales backfill %s..%s: %s", date_from, date_to, result)
+    return result
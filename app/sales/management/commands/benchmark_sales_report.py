@@ -0,0 +1,47 @@
+import time
+import tracemalloc
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+
+from sales.remaris_importer import iter_sales_report
+
+
+class Command(BaseCommand):
+    help = "Benchmark the Remaris sales report parser (time and peak memory, including the loaded sheet)."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "paths",
+            nargs="+",
+            help="Putanje do XLS izvjestaja (npr. mjesecni i godisnji izvoz iz Remarisa).",
+        )
+
+    def handle(self, *args, **options):
+        for raw_path in options["paths"]:
+            path = Path(raw_path)
+            if not path.exists():
+                raise CommandError(f"Datoteka ne postoji: {path}")
+
+            tracemalloc.start()
+            started = time.perf_counter()
+            invoices = 0
+            items = 0
+            for invoice in iter_sales_report(path):
+                invoices += 1
+                items += len(invoice.items)
+            elapsed = time.perf_counter() - started
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+
+            self.stdout.write(
+                "{name}: size={size_kb}KB invoices={invoices} items={items} "
+                "seconds={seconds:.2f} peak_mem={peak_kb}KB".format(
+                    name=path.name,
+                    size_kb=path.stat().st_size // 1024,
+                    invoices=invoices,
+                    items=items,
+                    seconds=elapsed,
+                    peak_kb=peak // 1024,
+                )
+            )
@@ -29,11 +29,16 @@ class Command(BaseCommand):
             if options.get(key) is not None:
                 defaults[key] = options[key]
 
-        created, updated, skipped = import_sales_invoices(
+        timings = {}
+        created, updated, unchanged = import_sales_invoices(
             date_from=date_from,
             date_to=date_to,
+            timings=timings,
             **defaults,
         )
         self.stdout.write(
-            f"Import complete. created={created} updated={updated} skipped={skipped}"
+            f"Import complete. created={created} updated={updated} unchanged={unchanged}"
         )
+        if options["verbosity"] > 1:
+            for phase, seconds in timings.items():
+                self.stdout.write(f"  {phase}: {seconds:.3f}s")
@@ -0,0 +1,34 @@
+from datetime import date as date_cls, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+
+from sales.models import SalesInvoice
+from sales.rollups import refresh_sales_daily_rollups
+
+
+class Command(BaseCommand):
+    help = "Rebuild SalesDailyRollup rows from sales invoice items (whole history or a date range)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--from", dest="date_from")
+        parser.add_argument("--to", dest="date_to")
+
+    def handle(self, *args, **options):
+        try:
+            date_from = date_cls.fromisoformat(options["date_from"]) if options["date_from"] else None
+            date_to = date_cls.fromisoformat(options["date_to"]) if options["date_to"] else None
+        except ValueError as exc:
+            raise CommandError("Dates must be in YYYY-MM-DD format.") from exc
+
+        dates = SalesInvoice.objects.values_list("issued_on", flat=True).distinct()
+        if date_from:
+            dates = dates.filter(issued_on__gte=date_from)
+        if date_to:
+            dates = dates.filter(issued_on__lte=date_to)
+        dates = set(dates)
+        if date_from and date_to:
+            # I dani bez racuna, da se obrisu zastarjeli rollupi.
+            dates.update(date_from + timedelta(days=i) for i in range((date_to - date_from).days + 1))
+
+        rows = refresh_sales_daily_rollups(dates)
+        self.stdout.write(f"Rebuilt {rows} rollup rows for {len(dates)} days.")
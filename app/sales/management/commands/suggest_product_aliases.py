@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from sales.product_matching import resolve_unmatched_items, suggest_product_aliases
+
+
+class Command(BaseCommand):
+    help = "Resolve unmatched sales lines via aliases and suggest new aliases by trigram similarity."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--threshold", type=float, default=0.5)
+
+    def handle(self, *args, **options):
+        resolved = resolve_unmatched_items()
+        suggested = suggest_product_aliases(threshold=options["threshold"])
+        self.stdout.write(f"Resolved lines: {resolved}. New alias suggestions: {suggested}.")
@@ -0,0 +1,29 @@
+# Generated by Django 5.2.18 on 2026-10-17 12:44
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sales', '0016_representationitem_transfer_posted_at'),
+        ('stock', '0036_stockcostsnapshot'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SalesInvoiceStockMove',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('invoice', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='stock_move_links', to='sales.salesinvoice')),
+                ('stock_move', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='sales_invoice_links', to='stock.stockmove')),
+            ],
+            options={
+                'verbose_name': 'Robno razduzenje racuna',
+                'verbose_name_plural': 'Robna razduzenja racuna',
+                'constraints': [models.UniqueConstraint(fields=('invoice', 'stock_move'), name='uq_sales_invoice_stock_move')],
+            },
+        ),
+    ]
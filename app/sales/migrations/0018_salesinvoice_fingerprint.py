@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-17 12:57
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sales', '0017_salesinvoicestockmove'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='salesinvoice',
+            name='fingerprint',
+            field=models.CharField(blank=True, default='', help_text='SHA-256 zaglavlja i stavki iz Remaris izvjestaja; import preskace nepromijenjene racune.', max_length=64, verbose_name='Otisak sadrzaja'),
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 5.2.18 on 2026-10-17 12:58
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sales', '0018_salesinvoice_fingerprint'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SalesImportWatermark',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('external_location_id', models.IntegerField(verbose_name='Remaris lokacija')),
+                ('external_pos_id', models.IntegerField(verbose_name='Remaris POS')),
+                ('last_rm_number', models.IntegerField(blank=True, null=True, verbose_name='Zadnji broj racuna')),
+                ('last_issued_at', models.DateTimeField(blank=True, null=True, verbose_name='Zadnji racun izdan')),
+                ('last_run_at', models.DateTimeField(blank=True, null=True, verbose_name='Zadnje pokretanje')),
+            ],
+            options={
+                'verbose_name': 'Oznaka uvoza prometa',
+                'verbose_name_plural': 'Oznake uvoza prometa',
+                'constraints': [models.UniqueConstraint(fields=('external_location_id', 'external_pos_id'), name='uq_sales_import_watermark')],
+            },
+        ),
+    ]
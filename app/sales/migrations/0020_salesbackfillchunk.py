@@ -0,0 +1,33 @@
+# Generated by Django 5.2.18 on 2026-10-17 13:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sales', '0019_salesimportwatermark'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SalesBackfillChunk',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('external_location_id', models.IntegerField(verbose_name='Remaris lokacija')),
+                ('external_pos_id', models.IntegerField(verbose_name='Remaris POS')),
+                ('date_from', models.DateField(verbose_name='Od')),
+                ('date_to', models.DateField(verbose_name='Do')),
+                ('status', models.CharField(choices=[('pending', 'Na cekanju'), ('done', 'Zavrseno'), ('failed', 'Greska')], default='pending', max_length=10, verbose_name='Status')),
+                ('invoice_count', models.PositiveIntegerField(default=0, verbose_name='Broj racuna')),
+                ('error', models.TextField(blank=True, default='', verbose_name='Greska')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Azurirano')),
+            ],
+            options={
+                'verbose_name': 'Backfill odsjecak prometa',
+                'verbose_name_plural': 'Backfill odsjecci prometa',
+                'ordering': ('date_from',),
+                'constraints': [models.UniqueConstraint(fields=('external_location_id', 'external_pos_id', 'date_from', 'date_to'), name='uq_sales_backfill_chunk')],
+            },
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 5.2.18 on 2026-10-17 13:02
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('artikli', '0025_alter_drinkcategory_options_and_more'),
+        ('sales', '0020_salesbackfillchunk'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SalesProductAlias',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('normalized_name', models.CharField(max_length=255, unique=True, verbose_name='Normalizirani naziv')),
+                ('source', models.CharField(choices=[('manual', 'Rucno'), ('suggested', 'Prijedlog')], default='manual', max_length=10, verbose_name='Izvor')),
+                ('similarity', models.DecimalField(blank=True, decimal_places=3, max_digits=4, null=True, verbose_name='Slicnost')),
+                ('is_confirmed', models.BooleanField(default=True, verbose_name='Potvrdjeno')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Kreirano')),
+                ('artikl', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='sales_aliases', to='artikli.artikl', verbose_name='Artikl')),
+            ],
+            options={
+                'verbose_name': 'Alias artikla (promet)',
+                'verbose_name_plural': 'Aliasi artikala (promet)',
+                'ordering': ('normalized_name',),
+            },
+        ),
+    ]
@@ -0,0 +1,77 @@
+# Generated by Django 5.2.18 on 2026-10-17 13:06
+
+import django.db.models.deletion
+from decimal import Decimal, ROUND_HALF_UP
+from django.db import migrations, models
+from django.db.models import Count, Sum
+
+
+def populate_rollups(apps, schema_editor):
+    SalesDailyRollup = apps.get_model("sales", "SalesDailyRollup")
+    SalesInvoiceItem = apps.get_model("sales", "SalesInvoiceItem")
+
+    rows = (
+        SalesInvoiceItem.objects.values(
+            "invoice__issued_on",
+            "invoice__warehouse_id",
+            "invoice__pos_id",
+            "artikl_id",
+            "artikl__drink_category_id",
+        )
+        .annotate(line_count=Count("id"), quantity=Sum("quantity"), gross=Sum("amount"))
+        .order_by()
+    )
+    rollups = []
+    for row in rows.iterator():
+        gross = row["gross"] or Decimal("0.00")
+        net = (gross / Decimal("1.25")).quantize(Decimal("0.01"), rounding=ROUND_HALF_UP)
+        rollups.append(
+            SalesDailyRollup(
+                date=row["invoice__issued_on"],
+                warehouse_id=row["invoice__warehouse_id"],
+                pos_id=row["invoice__pos_id"],
+                artikl_id=row["artikl_id"],
+                drink_category_id=row["artikl__drink_category_id"],
+                line_count=row["line_count"],
+                quantity=row["quantity"] or Decimal("0.0000"),
+                gross_amount=gross,
+                net_amount=net,
+                vat_amount=(gross - net).quantize(Decimal("0.01"), rounding=ROUND_HALF_UP),
+            )
+        )
+    SalesDailyRollup.objects.bulk_create(rollups, batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('artikli', '0025_alter_drinkcategory_options_and_more'),
+        ('pos', '0002_posprofile'),
+        ('sales', '0021_salesproductalias'),
+        ('stock', '0039_stocklotarchive'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SalesDailyRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(verbose_name='Datum')),
+                ('line_count', models.PositiveIntegerField(default=0, verbose_name='Broj stavki')),
+                ('quantity', models.DecimalField(decimal_places=4, default=Decimal('0.0000'), max_digits=14, verbose_name='Kolicina')),
+                ('gross_amount', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=14, verbose_name='Bruto')),
+                ('net_amount', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=14, verbose_name='Neto')),
+                ('vat_amount', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=14, verbose_name='PDV')),
+                ('artikl', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='sales_rollups', to='artikli.artikl', verbose_name='Artikl')),
+                ('drink_category', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='sales_rollups', to='artikli.drinkcategory', verbose_name='Kategorija napitaka')),
+                ('pos', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='sales_rollups', to='pos.pos', verbose_name='POS')),
+                ('warehouse', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='sales_rollups', to='stock.warehouseid', verbose_name='Lokacija')),
+            ],
+            options={
+                'verbose_name': 'Dnevni promet (zbirno)',
+                'verbose_name_plural': 'Dnevni promet (zbirno)',
+                'indexes': [models.Index(fields=['date', 'warehouse', 'pos'], name='sales_rollup_date_idx')],
+            },
+        ),
+        migrations.RunPython(populate_rollups, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,97 @@
+# Generated by Django 5.2.18 on 2026-10-17 13:07
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Exists, OuterRef, Subquery
+
+LEGACY_REFERENCE_PREFIX = "POS racun "
+BATCH_SIZE = 500
+
+
+def link_legacy_stock_moves(apps, schema_editor):
+    """
+    Stara razduzenja (po racunu/stavkama) bila su vezana samo preko
+    StockMove.reference = "POS racun <rm_number>". Za njih se stvara
+    SalesInvoiceStockMove, a stavke dobivaju stock_move ako kretanje ima
+    liniju za artikl stavke ili neki sastojak njegovog aktivnog normativa.
+    """
+    SalesInvoice = apps.get_model("sales", "SalesInvoice")
+    SalesInvoiceItem = apps.get_model("sales", "SalesInvoiceItem")
+    SalesInvoiceStockMove = apps.get_model("sales", "SalesInvoiceStockMove")
+    StockMove = apps.get_model("stock", "StockMove")
+    StockMoveLine = apps.get_model("stock", "StockMoveLine")
+    NormativItem = apps.get_model("artikli", "NormativItem")
+
+    moves_by_rm_number = {}
+    legacy_moves = StockMove.objects.filter(
+        move_type="out",
+        reference__startswith=LEGACY_REFERENCE_PREFIX,
+    ).values_list("id", "reference")
+    for move_id, reference in legacy_moves.iterator():
+        try:
+            rm_number = int(reference[len(LEGACY_REFERENCE_PREFIX):])
+        except ValueError:
+            continue
+        moves_by_rm_number.setdefault(rm_number, []).append(move_id)
+    if moves_by_rm_number:
+        invoice_ids = dict(
+            SalesInvoice.objects.filter(rm_number__in=list(moves_by_rm_number)).values_list("rm_number", "id")
+        )
+        move_artikli = {}
+        for move_id, artikl_id in StockMoveLine.objects.filter(
+            move_id__in=[m for moves in moves_by_rm_number.values() for m in moves]
+        ).values_list("move_id", "artikl_id"):
+            move_artikli.setdefault(move_id, set()).add(artikl_id)
+        ingredients = {}
+        for product_id, ingredient_rm_id in NormativItem.objects.filter(normativ__is_active=True).values_list(
+            "normativ__product_id", "ingredient__rm_id"
+        ):
+            ingredients.setdefault(product_id, set()).add(ingredient_rm_id)
+
+        links = []
+        moves_by_invoice = {}
+        for rm_number, move_ids in moves_by_rm_number.items():
+            invoice_id = invoice_ids.get(rm_number)
+            if invoice_id:
+                links.extend(SalesInvoiceStockMove(invoice_id=invoice_id, stock_move_id=m) for m in move_ids)
+                moves_by_invoice[invoice_id] = sorted(move_ids, reverse=True)
+
+        updates = []
+        items = SalesInvoiceItem.objects.filter(
+            invoice_id__in=list(moves_by_invoice), stock_move__isnull=True, artikl__isnull=False
+        ).values_list("id", "invoice_id", "artikl_id", "artikl__rm_id")
+        for item_id, invoice_id, artikl_id, artikl_rm_id in items.iterator():
+            wanted = {artikl_rm_id} | ingredients.get(artikl_id, set())
+            for move_id in moves_by_invoice[invoice_id]:
+                if wanted & move_artikli.get(move_id, set()):
+                    updates.append(SalesInvoiceItem(id=item_id, stock_move_id=move_id))
+                    break
+        SalesInvoiceItem.objects.bulk_update(updates, ["stock_move"], batch_size=BATCH_SIZE)
+        SalesInvoiceStockMove.objects.bulk_create(links, batch_size=BATCH_SIZE, ignore_conflicts=True)
+
+    # Dnevna razduzenja vec imaju link po racunu; razduzene stavke dobivaju
+    # isto kretanje (najnovije, ako racun ima vise linkova) jednim UPDATE-om.
+    links = SalesInvoiceStockMove.objects.filter(invoice_id=OuterRef("invoice_id"))
+    SalesInvoiceItem.objects.filter(
+        Exists(links),
+        stock_move__isnull=True,
+        stock_out_posted_at__isnull=False,
+    ).update(stock_move_id=Subquery(links.order_by("-stock_move_id").values("stock_move_id")[:1]))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sales', '0022_salesdailyrollup'),
+        ('stock', '0039_stocklotarchive'),
+        ('artikli', '0025_alter_drinkcategory_options_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='salesinvoiceitem',
+            name='stock_move',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='sales_invoice_items', to='stock.stockmove'),
+        ),
+        migrations.RunPython(link_legacy_stock_moves, migrations.RunPython.noop),
+    ]
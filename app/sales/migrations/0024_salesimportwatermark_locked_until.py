@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-17 13:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sales', '0023_salesinvoiceitem_stock_move'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='salesimportwatermark',
+            name='locked_until',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='Uvoz u tijeku do'),
+        ),
+    ]
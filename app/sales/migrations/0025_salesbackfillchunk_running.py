@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-17 13:41
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sales', '0024_salesimportwatermark_locked_until'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='salesbackfillchunk',
+            name='status',
+            field=models.CharField(choices=[('pending', 'Na cekanju'), ('running', 'U tijeku'), ('done', 'Zavrseno'), ('failed', 'Greska')], default='pending', max_length=10, verbose_name='Status'),
+        ),
+    ]
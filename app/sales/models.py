@@ -50,6 +50,13 @@ class SalesInvoice(models.Model):
         related_name="sales_invoices",
         db_column="pos_id",
     )
+    fingerprint = models.CharField(
+        max_length=64,
+        blank=True,
+        default="",
+        verbose_name="Otisak sadrzaja",
+        help_text="SHA-256 zaglavlja i stavki iz Remaris izvjestaja; import preskace nepromijenjene racune.",
+    )
 
     def __str__(self) -> str:
         return f"Racun {self.rm_number} ({self.issued_on:%Y-%m-%d})"
@@ -89,7 +96,13 @@ class SalesInvoiceItem(models.Model):
         blank=True,
     )
     stock_out_posted_at = models.DateTimeField(null=True, blank=True)
-    stock_out_posted_at = models.DateTimeField(null=True, blank=True)
+    stock_move = models.ForeignKey(
+        "stock.StockMove",
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name="sales_invoice_items",
+    )
 
     def __str__(self) -> str:
         return f"{self.product_name} x {self.quantity}"
@@ -99,6 +112,173 @@ class SalesInvoiceItem(models.Model):
         verbose_name_plural = "Stavke racuna (promet)"
 
 
+class SalesInvoiceStockMove(models.Model):
+    invoice = models.ForeignKey(
+        "sales.SalesInvoice",
+        on_delete=models.CASCADE,
+        related_name="stock_move_links",
+    )
+    stock_move = models.ForeignKey(
+        "stock.StockMove",
+        on_delete=models.CASCADE,
+        related_name="sales_invoice_links",
+    )
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self) -> str:
+        return f"Racun {self.invoice_id} -> kretanje {self.stock_move_id}"
+
+    class Meta:
+        verbose_name = "Robno razduzenje racuna"
+        verbose_name_plural = "Robna razduzenja racuna"
+        constraints = [
+            models.UniqueConstraint(
+                fields=["invoice", "stock_move"],
+                name="uq_sales_invoice_stock_move",
+            )
+        ]
+
+
+class SalesDailyRollup(models.Model):
+    """
+    Dnevni zbroj prometa po lokaciji, POS-u i artiklu (stavke bez artikla su
+    u retku s artikl=NULL). Odrzava ga uvoz prometa; neto/PDV su izracunati
+    iz bruto iznosa retka istom stopom kao i na racunima.
+    """
+    date = models.DateField(verbose_name="Datum")
+    warehouse = models.ForeignKey(
+        "stock.WarehouseId",
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name="sales_rollups",
+        verbose_name="Lokacija",
+    )
+    pos = models.ForeignKey(
+        "pos.Pos",
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name="sales_rollups",
+        verbose_name="POS",
+    )
+    artikl = models.ForeignKey(
+        "artikli.Artikl",
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name="sales_rollups",
+        verbose_name="Artikl",
+    )
+    drink_category = models.ForeignKey(
+        "artikli.DrinkCategory",
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name="sales_rollups",
+        verbose_name="Kategorija napitaka",
+    )
+    line_count = models.PositiveIntegerField(default=0, verbose_name="Broj stavki")
+    quantity = models.DecimalField(max_digits=14, decimal_places=4, default=Decimal("0.0000"), verbose_name="Kolicina")
+    gross_amount = models.DecimalField(max_digits=14, decimal_places=2, default=Decimal("0.00"), verbose_name="Bruto")
+    net_amount = models.DecimalField(max_digits=14, decimal_places=2, default=Decimal("0.00"), verbose_name="Neto")
+    vat_amount = models.DecimalField(max_digits=14, decimal_places=2, default=Decimal("0.00"), verbose_name="PDV")
+
+    def __str__(self) -> str:
+        return f"{self.date} {self.artikl_id or '-'}: {self.gross_amount}"
+
+    class Meta:
+        verbose_name = "Dnevni promet (zbirno)"
+        verbose_name_plural = "Dnevni promet (zbirno)"
+        indexes = [
+            models.Index(fields=["date", "warehouse", "pos"], name="sales_rollup_date_idx"),
+        ]
+
+
+class SalesProductAlias(models.Model):
+    """Normalizirani naziv stavke s blagajne -> artikl (rucne ispravke i prijedlozi)."""
+
+    class Source(models.TextChoices):
+        MANUAL = "manual", "Rucno"
+        SUGGESTED = "suggested", "Prijedlog"
+
+    normalized_name = models.CharField(max_length=255, unique=True, verbose_name="Normalizirani naziv")
+    artikl = models.ForeignKey(
+        "artikli.Artikl",
+        on_delete=models.CASCADE,
+        related_name="sales_aliases",
+        verbose_name="Artikl",
+    )
+    source = models.CharField(max_length=10, choices=Source.choices, default=Source.MANUAL, verbose_name="Izvor")
+    similarity = models.DecimalField(max_digits=4, decimal_places=3, null=True, blank=True, verbose_name="Slicnost")
+    is_confirmed = models.BooleanField(default=True, verbose_name="Potvrdjeno")
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name="Kreirano")
+
+    def __str__(self) -> str:
+        return f"{self.normalized_name} -> {self.artikl_id}"
+
+    class Meta:
+        verbose_name = "Alias artikla (promet)"
+        verbose_name_plural = "Aliasi artikala (promet)"
+        ordering = ("normalized_name",)
+
+
+class SalesImportWatermark(models.Model):
+    """Zadnji uvezeni racun po Remaris (lokacija, POS) za inkrementalni import."""
+    external_location_id = models.IntegerField(verbose_name="Remaris lokacija")
+    external_pos_id = models.IntegerField(verbose_name="Remaris POS")
+    last_rm_number = models.IntegerField(null=True, blank=True, verbose_name="Zadnji broj racuna")
+    last_issued_at = models.DateTimeField(null=True, blank=True, verbose_name="Zadnji racun izdan")
+    last_run_at = models.DateTimeField(null=True, blank=True, verbose_name="Zadnje pokretanje")
+    locked_until = models.DateTimeField(null=True, blank=True, verbose_name="Uvoz u tijeku do")
+
+    def __str__(self) -> str:
+        return f"Lokacija {self.external_location_id} / POS {self.external_pos_id}: {self.last_rm_number or '-'}"
+
+    class Meta:
+        verbose_name = "Oznaka uvoza prometa"
+        verbose_name_plural = "Oznake uvoza prometa"
+        constraints = [
+            models.UniqueConstraint(
+                fields=["external_location_id", "external_pos_id"],
+                name="uq_sales_import_watermark",
+            )
+        ]
+
+
+class SalesBackfillChunk(models.Model):
+    """Checkpoint jednog vremenskog odsjecka backfilla prometa (nastavak nakon greske)."""
+
+    class Status(models.TextChoices):
+        PENDING = "pending", "Na cekanju"
+        RUNNING = "running", "U tijeku"
+        DONE = "done", "Zavrseno"
+        FAILED = "failed", "Greska"
+
+    external_location_id = models.IntegerField(verbose_name="Remaris lokacija")
+    external_pos_id = models.IntegerField(verbose_name="Remaris POS")
+    date_from = models.DateField(verbose_name="Od")
+    date_to = models.DateField(verbose_name="Do")
+    status = models.CharField(max_length=10, choices=Status.choices, default=Status.PENDING, verbose_name="Status")
+    invoice_count = models.PositiveIntegerField(default=0, verbose_name="Broj racuna")
+    error = models.TextField(blank=True, default="", verbose_name="Greska")
+    updated_at = models.DateTimeField(auto_now=True, verbose_name="Azurirano")
+
+    def __str__(self) -> str:
+        return f"{self.date_from}..{self.date_to} ({self.get_status_display()})"
+
+    class Meta:
+        verbose_name = "Backfill odsjecak prometa"
+        verbose_name_plural = "Backfill odsjecci prometa"
+        ordering = ("date_from",)
+        constraints = [
+            models.UniqueConstraint(
+                fields=["external_location_id", "external_pos_id", "date_from", "date_to"],
+                name="uq_sales_backfill_chunk",
+            )
+        ]
+
+
 class SalesZPosting(models.Model):
     issued_on = models.DateField()
     ledger = models.ForeignKey(
@@ -0,0 +1,155 @@
+from collections import defaultdict
+from decimal import Decimal
+from typing import Iterable
+
+from django.db import transaction
+
+from artikli.models import Artikl
+from sales.models import SalesInvoiceItem, SalesProductAlias
+from sales.rollups import refresh_rollups_for_items
+
+
+def normalize_product_name(name: str) -> str:
+    """'  Pivo   OŽUJSKO 0,5 ' -> 'pivo ožujsko 0,5'"""
+    return " ".join((name or "").split()).casefold()
+
+
+def load_artikl_ids_by_name() -> dict[str, int]:
+    """
+    Mapa normalizirani naziv -> Artikl.id za jedan uvoz. Potvrdjeni aliasi
+    imaju prednost pred nazivom artikla; kod duplikata naziva vrijedi
+    artikl s najmanjim pk.
+    """
+    artikl_ids: dict[str, int] = {}
+    for artikl_id, name in Artikl.objects.order_by("pk").values_list("id", "name"):
+        artikl_ids.setdefault(normalize_product_name(name), artikl_id)
+    artikl_ids.update(
+        SalesProductAlias.objects.filter(is_confirmed=True).values_list("normalized_name", "artikl_id")
+    )
+    return artikl_ids
+
+
+def resolve_unmatched_items(
+    artikl_ids: dict[str, int] | None = None,
+    *,
+    candidates=None,
+    refresh_item_ids: Iterable[int] = (),
+) -> int:
+    """
+    Povezuje stavke bez artikla preko naziva/aliasa; jedan UPDATE po artiklu.
+    candidates suzava stavke koje se provjeravaju (queryset), a rollup se
+    jednom osvjezava za povezane stavke i refresh_item_ids.
+    """
+    if artikl_ids is None:
+        artikl_ids = load_artikl_ids_by_name()
+    item_ids_by_artikl = defaultdict(list)
+    unmatched = (SalesInvoiceItem.objects.all() if candidates is None else candidates).filter(artikl__isnull=True)
+    for item_id, product_name in unmatched.values_list("id", "product_name").iterator():
+        artikl_id = artikl_ids.get(normalize_product_name(product_name))
+        if artikl_id:
+            item_ids_by_artikl[artikl_id].append(item_id)
+
+    resolved = 0
+    refresh_item_ids = list(refresh_item_ids)
+    with transaction.atomic():
+        for artikl_id, item_ids in item_ids_by_artikl.items():
+            resolved += SalesInvoiceItem.objects.filter(id__in=item_ids, artikl__isnull=True).update(
+                artikl_id=artikl_id
+            )
+        if resolved:
+            refresh_item_ids += [item_id for item_ids in item_ids_by_artikl.values() for item_id in item_ids]
+        if refresh_item_ids:
+            refresh_rollups_for_items(refresh_item_ids)
+    return resolved
+
+
+def learn_product_alias(product_name: str, artikl_id: int, *, refresh_item_ids: Iterable[int] = ()) -> int:
+    """
+    Sprema rucnu ispravku kao potvrdjeni alias i odmah povezuje ostale
+    stavke istog naziva koje jos nemaju artikl. Kandidati se suzavaju u bazi
+    (svaka rijec naziva), a normalizirani naziv provjerava se u Pythonu.
+    Vraca broj povezanih stavki.
+    """
+    normalized = normalize_product_name(product_name)
+    if not normalized:
+        refresh_item_ids = list(refresh_item_ids)
+        if refresh_item_ids:
+            refresh_rollups_for_items(refresh_item_ids)
+        return 0
+    SalesProductAlias.objects.update_or_create(
+        normalized_name=normalized,
+        defaults={
+            "artikl_id": artikl_id,
+            "source": SalesProductAlias.Source.MANUAL,
+            "similarity": None,
+            "is_confirmed": True,
+        },
+    )
+    candidates = SalesInvoiceItem.objects.all()
+    for word in normalized.split():
+        candidates = candidates.filter(product_name__icontains=word)
+    return resolve_unmatched_items(
+        {normalized: artikl_id}, candidates=candidates, refresh_item_ids=refresh_item_ids
+    )
+
+
+def _trigrams(value: str) -> set[str]:
+    # Isto kao pg_trgm: svaka rijec se nadopunjuje s dva razmaka sprijeda i jednim straga.
+    grams = set()
+    for word in value.split():
+        padded = f"  {word} "
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return grams
+
+
+def trigram_similarity(a: str, b: str) -> float:
+    grams_a = _trigrams(normalize_product_name(a))
+    grams_b = _trigrams(normalize_product_name(b))
+    if not grams_a or not grams_b:
+        return 0.0
+    return len(grams_a & grams_b) / len(grams_a | grams_b)
+
+
+def suggest_product_aliases(threshold: float = 0.5) -> int:
+    """
+    Batch prijedlozi za nazive stavki bez artikla: najslicniji artikl po
+    trigram slicnosti iznad praga sprema se kao nepotvrdjeni alias.
+    Postojeci aliasi se ne diraju. Vraca broj novih prijedloga.
+    """
+    existing = set(SalesProductAlias.objects.values_list("normalized_name", flat=True))
+    names = {
+        normalize_product_name(name)
+        for name in SalesInvoiceItem.objects.filter(artikl__isnull=True).values_list("product_name", flat=True).distinct()
+    }
+    names -= existing
+    names.discard("")
+    if not names:
+        return 0
+
+    candidates = [
+        (artikl_id, _trigrams(normalize_product_name(name)))
+        for artikl_id, name in Artikl.objects.order_by("pk").values_list("id", "name")
+    ]
+    suggestions = []
+    for name in sorted(names):
+        grams = _trigrams(name)
+        best_id = None
+        best_score = 0.0
+        for artikl_id, artikl_grams in candidates:
+            if not artikl_grams:
+                continue
+            score = len(grams & artikl_grams) / len(grams | artikl_grams)
+            if score > best_score:
+                best_id, best_score = artikl_id, score
+        if best_id is not None and best_score >= threshold:
+            suggestions.append(
+                SalesProductAlias(
+                    normalized_name=name,
+                    artikl_id=best_id,
+                    source=SalesProductAlias.Source.SUGGESTED,
+                    similarity=Decimal(str(round(best_score, 3))),
+                    is_confirmed=False,
+                )
+            )
+    SalesProductAlias.objects.bulk_create(suggestions, ignore_conflicts=True)
+    return len(suggestions)
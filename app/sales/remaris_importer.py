@@ -1,23 +1,34 @@
+import hashlib
 import html
+import json
+import logging
 import os
 import re
+import time
 from dataclasses import dataclass
-from datetime import date as date_cls, datetime as datetime_cls
+from datetime import date as date_cls, datetime as datetime_cls, timedelta
 from decimal import Decimal, ROUND_HALF_UP
 from pathlib import Path
 from tempfile import NamedTemporaryFile
-from typing import Iterable
+from itertools import islice
+from typing import Iterable, Iterator
 
 import xlrd
+from django.core.exceptions import ValidationError
 from django.db import transaction
+from django.db.models import Max, Q
 from django.utils import timezone
 
 from artikli.remaris_connector import RemarisConnector
-from sales.models import SalesInvoice, SalesInvoiceItem
+from sales.models import SalesImportWatermark, SalesInvoice, SalesInvoiceItem
+from sales.rollups import refresh_sales_daily_rollups
+from sales.product_matching import load_artikl_ids_by_name, normalize_product_name
+from sales.services import get_sales_z_summaries, post_sales_day_stock_out
 from accounting.models import Ledger
 from stock.models import WarehouseId
 from pos.models import Pos
-from artikli.models import Artikl
+
+logger = logging.getLogger(__name__)
 
 
 @dataclass
@@ -83,20 +94,43 @@ def _excel_datetime(value, datemode):
     return None
 
 
+IMPORT_CHUNK_SIZE = 500
+DOWNLOAD_CHUNK_SIZE = 64 * 1024
+# Koliko dugo se inkrementalni uvoz smatra aktivnim ako proces padne bez otpustanja.
+SALES_IMPORT_LEASE = timedelta(minutes=15)
+
+
+def iter_sales_report(path: Path) -> Iterator[SalesInvoiceRow]:
+    """
+    Vraca racune iz Remaris XLS izvjestaja jedan po jedan (generator).
+    xlrd kod .xls ipak ucita cijeli list u memoriju (on_demand odgadja samo
+    ostale listove); generator stedi na SalesInvoiceRow objektima i pusta
+    zapis u bazu po chunkovima. Workbook se oslobada kad generator zavrsi
+    ili se zatvori.
+    """
+    book = xlrd.open_workbook(path.as_posix(), on_demand=True)
+    try:
+        sheet = book.sheet_by_index(0)
+        yield from _iter_sheet_invoices(sheet, book.datemode)
+    finally:
+        book.release_resources()
+
+
 def _parse_sales_report(path: Path) -> list[SalesInvoiceRow]:
-    book = xlrd.open_workbook(path.as_posix())
-    sheet = book.sheet_by_index(0)
-    invoices: list[SalesInvoiceRow] = []
+    return list(iter_sales_report(path))
+
+
+def _iter_sheet_invoices(sheet, datemode) -> Iterator[SalesInvoiceRow]:
     row_idx = 0
 
     while row_idx < sheet.nrows:
         row = sheet.row_values(row_idx)
         if len(row) > 1 and _safe_text(row[1]) == "Račun:":
             rm_number = int(row[3]) if row[3] not in ("", None) else None
-            issued_on_dt = _excel_datetime(row[8], book.datemode)
+            issued_on_dt = _excel_datetime(row[8], datemode)
 
             row_dt = sheet.row_values(row_idx + 1) if row_idx + 1 < sheet.nrows else []
-            issued_at_dt = _excel_datetime(row_dt[3] if len(row_dt) > 3 else None, book.datemode)
+            issued_at_dt = _excel_datetime(row_dt[3] if len(row_dt) > 3 else None, datemode)
             waiter_name = _safe_text(row_dt[8] if len(row_dt) > 8 else "")
 
             row_buyer = sheet.row_values(row_idx + 2) if row_idx + 2 < sheet.nrows else []
@@ -140,24 +174,26 @@ def _parse_sales_report(path: Path) -> list[SalesInvoiceRow]:
                 row_idx += 1
 
             if rm_number is not None and issued_on_dt and issued_at_dt:
-                invoices.append(
-                    SalesInvoiceRow(
-                        rm_number=rm_number,
-                        issued_on=issued_on_dt.date(),
-                        issued_at=issued_at_dt,
-                        location_name=location_name,
-                        buyer_name=buyer_name,
-                        waiter_name=waiter_name,
-                        total_amount=total_amount,
-                        currency="",
-                        items=items,
-                    )
+                yield SalesInvoiceRow(
+                    rm_number=rm_number,
+                    issued_on=issued_on_dt.date(),
+                    issued_at=issued_at_dt,
+                    location_name=location_name,
+                    buyer_name=buyer_name,
+                    waiter_name=waiter_name,
+                    total_amount=total_amount,
+                    currency="",
+                    items=items,
                 )
             continue
 
         row_idx += 1
 
-    return invoices
+
+def _chunked(iterable: Iterable, size: int) -> Iterator[list]:
+    iterator = iter(iterable)
+    while chunk := list(islice(iterator, size)):
+        yield chunk
 
 
 def _download_report_excel(
@@ -291,15 +327,249 @@ def _download_report_excel(
 
     download_path = html.unescape(match.group(1))
     download_url = connector.base_url + download_path
-    download_response = connector.session.get(download_url)
-    download_response.raise_for_status()
-
     tmp = NamedTemporaryFile(delete=False, suffix=".xls")
-    tmp.write(download_response.content)
-    tmp.close()
+    try:
+        with connector.session.get(download_url, stream=True) as download_response:
+            download_response.raise_for_status()
+            for chunk in download_response.iter_content(chunk_size=DOWNLOAD_CHUNK_SIZE):
+                tmp.write(chunk)
+        tmp.close()
+    except BaseException:
+        tmp.close()
+        Path(tmp.name).unlink(missing_ok=True)
+        raise
     return Path(tmp.name)
 
 
+INVOICE_UPSERT_FIELDS = [
+    "issued_on",
+    "issued_at",
+    "location_name",
+    "buyer_name",
+    "waiter_name",
+    "total_amount",
+    "net_amount",
+    "vat_amount",
+    "currency",
+    "ledger",
+    "warehouse",
+    "pos",
+    "fingerprint",
+]
+
+
+def _invoice_fingerprint(invoice: SalesInvoiceRow, *, currency: str, ledger_id, warehouse_id, pos_id) -> str:
+    """SHA-256 zaglavlja i stavki racuna onako kako ih vraca Remaris izvjestaj."""
+    payload = [
+        invoice.issued_on.isoformat(),
+        invoice.issued_at.isoformat(),
+        invoice.location_name,
+        invoice.buyer_name,
+        invoice.waiter_name,
+        str(invoice.total_amount),
+        currency,
+        ledger_id,
+        warehouse_id,
+        pos_id,
+        [
+            [
+                item.product_name,
+                str(item.quantity),
+                str(item.amount),
+                None if item.discount_value is None else str(item.discount_value),
+                None if item.discount_percent is None else str(item.discount_percent),
+            ]
+            for item in invoice.items
+        ],
+    ]
+    return hashlib.sha256(json.dumps(payload, ensure_ascii=False).encode("utf-8")).hexdigest()
+
+
+def _write_invoice_chunk(
+    invoices: list[SalesInvoiceRow],
+    *,
+    currency: str,
+    ledger,
+    warehouse,
+    pos,
+    artikl_ids: dict[str, int],
+    timings: dict[str, float],
+    touched_dates: set[date_cls] | None = None,
+) -> tuple[int, int, int]:
+    """
+    Sprema jedan chunk racuna: jedan upit za postojece racune, jedan bulk
+    upsert racuna po rm_number, jedan delete i jedan bulk_create stavki.
+    Stavke se vezu na artikl preko artikl_ids (normalizirani naziv -> id).
+    Dani promijenjenih racuna dodaju se u touched_dates (za dnevni rollup).
+    Racuni s nepromijenjenim otiskom se preskacu, osim ako im se stavka bez
+    artikla sada moze povezati. Vraca (created, updated, unchanged).
+    """
+    started = time.perf_counter()
+    tz = timezone.get_current_timezone()
+    # Zadnji redak za isti rm_number pobjeduje (kao kod uzastopnog update_or_create).
+    by_number = {invoice.rm_number: invoice for invoice in invoices}
+    existing = dict(
+        SalesInvoice.objects.filter(rm_number__in=list(by_number)).values_list("rm_number", "fingerprint")
+    )
+    fingerprints = {
+        rm_number: _invoice_fingerprint(
+            invoice,
+            currency=currency,
+            ledger_id=ledger.id,
+            warehouse_id=warehouse.id,
+            pos_id=pos.id,
+        )
+        for rm_number, invoice in by_number.items()
+    }
+    changed = {
+        rm_number: invoice
+        for rm_number, invoice in by_number.items()
+        if existing.get(rm_number) != fingerprints[rm_number]
+    }
+    # Otisak ne ukljucuje vezu na artikl: nepromijenjeni racun se ipak
+    # ponovno zapisuje ako se neka njegova stavka bez artikla sada moze povezati.
+    relinkable = (
+        SalesInvoiceItem.objects.filter(
+            invoice__rm_number__in=[rm_number for rm_number in by_number if rm_number not in changed],
+            artikl__isnull=True,
+        )
+        .values_list("invoice__rm_number", "product_name")
+    )
+    for rm_number, product_name in relinkable:
+        if normalize_product_name(product_name) in artikl_ids:
+            changed[rm_number] = by_number[rm_number]
+    unchanged = len(by_number) - len(changed)
+    rm_numbers = list(changed)
+    if touched_dates is not None:
+        touched_dates.update(invoice.issued_on for invoice in changed.values())
+    if not changed:
+        timings["lookup"] = timings.get("lookup", 0.0) + time.perf_counter() - started
+        return 0, 0, unchanged
+
+    timings["lookup"] = timings.get("lookup", 0.0) + time.perf_counter() - started
+
+    started = time.perf_counter()
+    rows = []
+    for invoice in changed.values():
+        issued_at = invoice.issued_at
+        if timezone.is_naive(issued_at):
+            issued_at = timezone.make_aware(issued_at, tz)
+        net_amount, vat_amount = _compute_net_vat(invoice.total_amount)
+        rows.append(
+            SalesInvoice(
+                rm_number=invoice.rm_number,
+                issued_on=invoice.issued_on,
+                issued_at=issued_at,
+                location_name=invoice.location_name,
+                buyer_name=invoice.buyer_name,
+                waiter_name=invoice.waiter_name,
+                total_amount=invoice.total_amount,
+                net_amount=net_amount,
+                vat_amount=vat_amount,
+                currency=currency,
+                ledger=ledger,
+                warehouse=warehouse,
+                pos=pos,
+                fingerprint=fingerprints[invoice.rm_number],
+            )
+        )
+    SalesInvoice.objects.bulk_create(
+        rows,
+        update_conflicts=True,
+        unique_fields=["rm_number"],
+        update_fields=INVOICE_UPSERT_FIELDS,
+    )
+    invoice_ids = dict(
+        SalesInvoice.objects.filter(rm_number__in=rm_numbers).values_list("rm_number", "id")
+    )
+    timings["invoices"] = timings.get("invoices", 0.0) + time.perf_counter() - started
+
+    started = time.perf_counter()
+    SalesInvoiceItem.objects.filter(invoice_id__in=invoice_ids.values()).delete()
+    SalesInvoiceItem.objects.bulk_create(
+        [
+            SalesInvoiceItem(
+                invoice_id=invoice_ids[invoice.rm_number],
+                artikl_id=artikl_ids.get(normalize_product_name(item.product_name)),
+                product_name=item.product_name,
+                quantity=item.quantity,
+                amount=item.amount,
+                discount_value=item.discount_value,
+                discount_percent=item.discount_percent,
+            )
+            for invoice in changed.values()
+            for item in invoice.items
+        ]
+    )
+    timings["items"] = timings.get("items", 0.0) + time.perf_counter() - started
+
+    created = len(set(rm_numbers) - set(existing))
+    return created, len(rm_numbers) - created, unchanged
+
+
+def import_invoice_rows(
+    rows: Iterable[SalesInvoiceRow],
+    *,
+    organization_id: int,
+    location_id: int,
+    pos_id: int,
+    currency: str,
+    timings: dict[str, float] | None = None,
+) -> tuple[int, int, int]:
+    """
+    Zapisuje parsirane racune u chunkovima unutar jedne transakcije i
+    osvjezava dnevni rollup za dane s promjenama. Ledger, skladiste, POS i
+    mapa artikala dohvacaju se jednom po importu, ne po chunku.
+    Vraca (created, updated, unchanged).
+    """
+    timings = {} if timings is None else timings
+    created = 0
+    updated = 0
+    unchanged = 0
+
+    started = time.perf_counter()
+    artikl_ids = load_artikl_ids_by_name()
+    ledger = Ledger.objects.filter(external_organization_id=organization_id).first() or Ledger.objects.first()
+    warehouse = WarehouseId.objects.filter(external_location_id=location_id).first()
+    pos = Pos.objects.filter(external_pos_id=pos_id).first()
+    timings["lookup"] = time.perf_counter() - started
+
+    touched_dates: set[date_cls] = set()
+    with transaction.atomic():
+        chunks = _chunked(rows, IMPORT_CHUNK_SIZE)
+        while True:
+            started = time.perf_counter()
+            chunk = next(chunks, None)
+            timings["parse"] = timings.get("parse", 0.0) + time.perf_counter() - started
+            if chunk is None:
+                break
+            if not ledger:
+                raise ValueError(f"Nema Ledger mapiranja za organization_id={organization_id}.")
+            if not warehouse:
+                raise ValueError(f"Nema WarehouseId mapiranja za location_id={location_id}.")
+            if not pos:
+                raise ValueError(f"Nema POS mapiranja za pos_id={pos_id}.")
+            c, u, n = _write_invoice_chunk(
+                chunk,
+                currency=currency,
+                ledger=ledger,
+                warehouse=warehouse,
+                pos=pos,
+                artikl_ids=artikl_ids,
+                timings=timings,
+                touched_dates=touched_dates,
+            )
+            created += c
+            updated += u
+            unchanged += n
+
+        if touched_dates:
+            started = time.perf_counter()
+            refresh_sales_daily_rollups(touched_dates)
+            timings["rollups"] = time.perf_counter() - started
+    return created, updated, unchanged
+
+
 def import_sales_invoices(
     date_from: date_cls,
     date_to: date_cls,
@@ -308,7 +578,17 @@ def import_sales_invoices(
     pos_id: int,
     currency: str,
     warehouse_id: int | None = None,
+    timings: dict[str, float] | None = None,
+    min_rm_number: int | None = None,
 ) -> tuple[int, int, int]:
+    """
+    Uvozi racune iz Remaris izvjestaja. Vraca (created, updated, unchanged).
+    Ako je zadan, rjecnik timings se puni trajanjem faza (download, parse,
+    lookup, invoices, items) u sekundama. min_rm_number preskace racune s
+    brojem manjim ili jednakim zadanom (inkrementalni uvoz).
+    """
+    timings = {} if timings is None else timings
+    started = time.perf_counter()
     connector = RemarisConnector()
     connector.login()
 
@@ -322,80 +602,152 @@ def import_sales_invoices(
         currency=currency,
         warehouse_id=warehouse_id,
     )
+    timings["download"] = time.perf_counter() - started
+
+    try:
+        rows = iter_sales_report(report_path)
+        if min_rm_number is not None:
+            rows = (row for row in rows if row.rm_number > min_rm_number)
+        created, updated, unchanged = import_invoice_rows(
+            rows,
+            organization_id=organization_id,
+            location_id=location_id,
+            pos_id=pos_id,
+            currency=currency,
+            timings=timings,
+        )
+    finally:
+        report_path.unlink(missing_ok=True)
+
+    logger.info(
+        "Sales import %s..%s: created=%s updated=%s unchanged=%s timings=%s",
+        date_from,
+        date_to,
+        created,
+        updated,
+        unchanged,
+        {phase: round(seconds, 3) for phase, seconds in timings.items()},
+    )
+    return created, updated, unchanged
 
-    invoices = _parse_sales_report(report_path)
-    created = 0
-    updated = 0
-    skipped = 0
-
-    tz = timezone.get_current_timezone()
-
-    with transaction.atomic():
-        for invoice in invoices:
-            issued_at = invoice.issued_at
-            if timezone.is_naive(issued_at):
-                issued_at = timezone.make_aware(issued_at, tz)
-
-            ledger = Ledger.objects.filter(external_organization_id=organization_id).first() or Ledger.objects.first()
-            warehouse = WarehouseId.objects.filter(external_location_id=location_id).first()
-            pos = Pos.objects.filter(external_pos_id=pos_id).first()
-            if not ledger:
-                raise ValueError(f"Nema Ledger mapiranja za organization_id={organization_id}.")
-            if not warehouse:
-                raise ValueError(f"Nema WarehouseId mapiranja za location_id={location_id}.")
-            if not pos:
-                raise ValueError(f"Nema POS mapiranja za pos_id={pos_id}.")
 
-            defaults = {
-                "issued_at": issued_at,
-                "location_name": invoice.location_name,
-                "buyer_name": invoice.buyer_name,
-                "waiter_name": invoice.waiter_name,
-                "total_amount": invoice.total_amount,
-                "currency": currency,
-                "ledger": ledger,
-                "warehouse": warehouse,
-                "pos": pos,
-            }
-            net_amount, vat_amount = _compute_net_vat(invoice.total_amount)
-
-            obj, was_created = SalesInvoice.objects.update_or_create(
-                rm_number=invoice.rm_number,
-                defaults={
-                    **defaults,
-                    "issued_on": invoice.issued_on,
-                    "net_amount": net_amount,
-                    "vat_amount": vat_amount,
-                },
-            )
+def import_sales_invoices_incremental(
+    organization_id: int,
+    location_id: int,
+    pos_id: int,
+    currency: str,
+    warehouse_id: int | None = None,
+    post_stock_out: bool = False,
+    z_summary: bool = False,
+) -> dict:
+    """
+    Uvozi samo racune novije od oznake (SalesImportWatermark) za lokaciju/POS.
+    Izvjestaj se trazi od dana zadnjeg uvezenog racuna do danas, pa racuni
+    izdani oko ponoci ne ispadaju. Paralelno pokretanje za isti POS se
+    preskace. Izmjene starijih racuna hvata nocni puni uvoz.
+    Uz post_stock_out robno se razduzuje, a uz z_summary u rezultat se dodaju
+    Z sazeci za svaki dan koji je dobio nove racune.
+    """
+    today = timezone.localdate()
+    watermark, _ = SalesImportWatermark.objects.get_or_create(
+        external_location_id=location_id, external_pos_id=pos_id
+    )
 
-            obj.items.all().delete()
-            product_names = {it.product_name for it in invoice.items if it.product_name}
-            artikl_map = {
-                a.name: a.id
-                for a in Artikl.objects.filter(name__in=product_names)
-            }
-            SalesInvoiceItem.objects.bulk_create(
-                [
-                    SalesInvoiceItem(
-                        invoice=obj,
-                        artikl_id=artikl_map.get(item.product_name),
-                        product_name=item.product_name,
-                        quantity=item.quantity,
-                        amount=item.amount,
-                        discount_value=item.discount_value,
-                        discount_percent=item.discount_percent,
-                    )
-                    for item in invoice.items
-                ]
+    # Paralelno pokretanje se preskace preko zakupa na retku oznake; red se
+    # zakljucava samo za citanje i azuriranje, ne za vrijeme preuzimanja.
+    now = timezone.now()
+    claimed = (
+        SalesImportWatermark.objects.filter(pk=watermark.pk)
+        .filter(Q(locked_until__isnull=True) | Q(locked_until__lt=now))
+        .update(locked_until=now + SALES_IMPORT_LEASE)
+    )
+    if not claimed:
+        return {"skipped": True}
+
+    try:
+        watermark.refresh_from_db()
+        previous_rm_number = watermark.last_rm_number or 0
+        date_from = today
+        if watermark.last_issued_at:
+            date_from = min(timezone.localdate(watermark.last_issued_at), today)
+
+        created, updated, unchanged = import_sales_invoices(
+            date_from=date_from,
+            date_to=today,
+            organization_id=organization_id,
+            location_id=location_id,
+            pos_id=pos_id,
+            currency=currency,
+            warehouse_id=warehouse_id,
+            min_rm_number=watermark.last_rm_number,
+        )
+
+        latest = SalesInvoice.objects.filter(
+            warehouse__external_location_id=location_id,
+            pos__external_pos_id=pos_id,
+        ).aggregate(last_rm_number=Max("rm_number"), last_issued_at=Max("issued_at"))
+        with transaction.atomic():
+            watermark = SalesImportWatermark.objects.select_for_update().get(pk=watermark.pk)
+            if latest["last_rm_number"] is not None:
+                watermark.last_rm_number = max(latest["last_rm_number"], watermark.last_rm_number or 0)
+            if latest["last_issued_at"] is not None:
+                watermark.last_issued_at = max(filter(None, (latest["last_issued_at"], watermark.last_issued_at)))
+            watermark.last_run_at = timezone.now()
+            watermark.locked_until = None
+            watermark.save(update_fields=["last_rm_number", "last_issued_at", "last_run_at", "locked_until"])
+    except Exception:
+        SalesImportWatermark.objects.filter(pk=watermark.pk).update(locked_until=None)
+        raise
+
+    result = {
+        "created": created,
+        "updated": updated,
+        "unchanged": unchanged,
+        "last_rm_number": watermark.last_rm_number,
+    }
+    if not (created and (post_stock_out or z_summary)):
+        return result
+
+    # Racuni izdani prije ponoci mogu stici tek nakon ponoci: obraduje se
+    # svaki dan koji je u ovom pokretanju dobio nove racune.
+    warehouse = WarehouseId.objects.filter(external_location_id=location_id).first()
+    pos = Pos.objects.filter(external_pos_id=pos_id).first()
+    days = list(
+        SalesInvoice.objects.filter(
+            warehouse=warehouse,
+            pos=pos,
+            issued_on__gte=date_from,
+            rm_number__gt=previous_rm_number,
+        )
+        .values_list("issued_on", flat=True)
+        .distinct()
+        .order_by("issued_on")
+    )
+    if post_stock_out:
+        result["stock_moves"] = {}
+        result["stock_out_skipped"] = 0
+        result["stock_out_errors"] = {}
+        for issued_on in days:
+            try:
+                move, skipped = post_sales_day_stock_out(issued_on=issued_on, warehouse=warehouse, pos=pos)
+                result["stock_moves"][issued_on.isoformat()] = move.id
+                result["stock_out_skipped"] += len(skipped)
+            except (ValueError, ValidationError) as exc:
+                logger.warning("Incremental stock out for %s failed: %s", issued_on, exc)
+                result["stock_out_errors"][issued_on.isoformat()] = str(exc)
+    if z_summary and days:
+        result["z_summaries"] = [
+            summary
+            for summary in get_sales_z_summaries(
+                date_from=days[0],
+                date_to=days[-1],
+                warehouse_id=warehouse.id if warehouse else None,
+                pos_id=pos.id if pos else None,
+                exact=True,
             )
-
-            if was_created:
-                created += 1
-            else:
-                updated += 1
-
-    return created, updated, skipped
+            if summary["issued_on"] in days
+        ]
+    return result
 
 
 def load_import_defaults() -> dict:
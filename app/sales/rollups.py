@@ -0,0 +1,131 @@
+from datetime import date as date_cls
+from decimal import Decimal
+from typing import Iterable
+
+from django.db import transaction
+from django.db.models import Count, Q, Sum
+
+from sales.models import SalesDailyRollup, SalesInvoiceItem
+
+ROLLUP_DAYS_PER_BATCH = 31
+
+
+def refresh_sales_daily_rollups(dates: Iterable[date_cls]) -> int:
+    """
+    Ponovno slaze SalesDailyRollup za zadane dane iz stavki racuna (jedan
+    grupirani upit i jedan bulk_create po batchu dana). Vraca broj redaka.
+    """
+    from sales.remaris_importer import _compute_net_vat
+
+    dates = sorted({day for day in dates if day})
+    written = 0
+    for start in range(0, len(dates), ROLLUP_DAYS_PER_BATCH):
+        batch = dates[start:start + ROLLUP_DAYS_PER_BATCH]
+        grouped = (
+            SalesInvoiceItem.objects.filter(invoice__issued_on__in=batch)
+            .values(
+                "invoice__issued_on",
+                "invoice__warehouse_id",
+                "invoice__pos_id",
+                "artikl_id",
+                "artikl__drink_category_id",
+            )
+            .annotate(line_count=Count("id"), quantity=Sum("quantity"), gross=Sum("amount"))
+            .order_by()
+        )
+        rows = []
+        for row in grouped:
+            gross = row["gross"] or Decimal("0.00")
+            net, vat = _compute_net_vat(gross)
+            rows.append(
+                SalesDailyRollup(
+                    date=row["invoice__issued_on"],
+                    warehouse_id=row["invoice__warehouse_id"],
+                    pos_id=row["invoice__pos_id"],
+                    artikl_id=row["artikl_id"],
+                    drink_category_id=row["artikl__drink_category_id"],
+                    line_count=row["line_count"],
+                    quantity=row["quantity"] or Decimal("0.0000"),
+                    gross_amount=gross,
+                    net_amount=net,
+                    vat_amount=vat,
+                )
+            )
+        with transaction.atomic():
+            SalesDailyRollup.objects.filter(date__in=batch).delete()
+            SalesDailyRollup.objects.bulk_create(rows, batch_size=500)
+        written += len(rows)
+    return written
+
+
+def refresh_rollups_for_items(item_ids: Iterable[int]) -> int:
+    dates = (
+        SalesInvoiceItem.objects.filter(id__in=list(item_ids))
+        .values_list("invoice__issued_on", flat=True)
+        .distinct()
+    )
+    return refresh_sales_daily_rollups(dates)
+
+
+def sync_rollup_drink_category(artikl_id: int, drink_category_id: int | None) -> int:
+    """Kategorija je denormalizirana po artiklu, pa je dovoljan jedan UPDATE."""
+    return (
+        SalesDailyRollup.objects.filter(artikl_id=artikl_id)
+        .exclude(drink_category_id=drink_category_id)
+        .update(drink_category_id=drink_category_id)
+    )
+
+
+def sales_rollup_totals(*, date_from, date_to, warehouse_id=None, pos_id=None, group_by=None) -> list[dict]:
+    """
+    Zbroj prometa za period iz SalesDailyRollup. group_by je None (jedan
+    redak) ili jedno od "date", "artikl", "drink_category".
+    """
+    qs = SalesDailyRollup.objects.filter(date__gte=date_from, date__lte=date_to)
+    if warehouse_id is not None:
+        qs = qs.filter(warehouse_id=warehouse_id)
+    if pos_id is not None:
+        qs = qs.filter(pos_id=pos_id)
+
+    group_fields = {
+        None: [],
+        "date": ["date"],
+        "artikl": ["artikl_id", "artikl__name"],
+        "drink_category": ["drink_category_id", "drink_category__name"],
+    }
+    if group_by not in group_fields:
+        raise ValueError(f"Nepodrzano grupiranje: {group_by}.")
+    fields = group_fields[group_by]
+    aggregates = {
+        "line_count": Sum("line_count"),
+        "quantity": Sum("quantity"),
+        "gross_amount": Sum("gross_amount"),
+        "net_amount": Sum("net_amount"),
+        "vat_amount": Sum("vat_amount"),
+    }
+    if not fields:
+        totals = qs.aggregate(**aggregates)
+        return [{key: value if value is not None else 0 for key, value in totals.items()}]
+    return list(qs.values(*fields).annotate(**aggregates).order_by(*fields[:1]))
+
+
+def sales_rollup_range_totals(ranges: dict[str, tuple[date_cls, date_cls]]) -> dict[str, dict]:
+    """Bruto/neto/PDV za vise raspona datuma jednim upitom nad SalesDailyRollup."""
+    if not ranges:
+        return {}
+    aggregates = {}
+    for key, (start, end) in ranges.items():
+        in_range = Q(date__gte=start, date__lte=end)
+        for field in ("gross_amount", "net_amount", "vat_amount"):
+            aggregates[f"{key}_{field}"] = Sum(field, filter=in_range)
+    totals = SalesDailyRollup.objects.filter(
+        date__gte=min(start for start, _ in ranges.values()),
+        date__lte=max(end for _, end in ranges.values()),
+    ).aggregate(**aggregates)
+    return {
+        key: {
+            field: totals[f"{key}_{field}"] or Decimal("0.00")
+            for field in ("gross_amount", "net_amount", "vat_amount")
+        }
+        for key in ranges
+    }
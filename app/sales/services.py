@@ -1,14 +1,16 @@
 from decimal import Decimal, ROUND_HALF_UP
 
 from django.db import transaction
-from django.db.models import Sum
+from django.db.models import Max, Min, Sum
+from django.utils import timezone
 
 from accounting.services import get_account_by_code, post_sales_cash_accounts
-from sales.models import SalesInvoice, SalesZPosting
+from sales.models import SalesInvoice, SalesInvoiceItem, SalesInvoiceStockMove, SalesZPosting
 from accounting.models import Ledger
 from stock.models import WarehouseId
 from pos.models import Pos
-from artikli.models import Normativ
+from artikli.bom import get_compiled_boms
+from artikli.models import Artikl
 from configuration.models import CompanyProfile
 from stock.services import post_stock_out
 
@@ -29,37 +31,55 @@ def _get_pnp_rate(ledger: Ledger | None) -> Decimal | None:
     return Decimal(str(profile.lgu.pnp_rate))
 
 
+def _pnp_from_vat_groups(amounts_by_vat_rate, pnp_rate: Decimal) -> Decimal:
+    """
+    PnP iz bruto iznosa grupiranih po stopi PDV-a: neto = bruto / (1 + PDV),
+    PnP = neto * stopa, zaokruzeno jednom na kraju (kao i po stavkama).
+    """
+    total = Decimal("0.00")
+    for vat_rate, gross in amounts_by_vat_rate:
+        net = Decimal(str(gross)) / (Decimal("1.00") + Decimal(str(vat_rate)))
+        total += net * pnp_rate
+    return total.quantize(Decimal("0.01"), rounding=ROUND_HALF_UP)
+
+
+def _pnp_items(items_qs):
+    return items_qs.filter(artikl__pnp_category__isnull=False)
+
+
+def _missing_tax_group_error(items_qs) -> str | None:
+    product_name = (
+        _pnp_items(items_qs)
+        .filter(artikl__tax_group__isnull=True)
+        .values_list("product_name", flat=True)
+        .first()
+    )
+    if product_name is None:
+        return None
+    return f"Artikl {product_name} nema tax_group, a ima PnP kategoriju."
+
+
 def _compute_pnp_amount(qs) -> Decimal:
-    invoice_ids = list(qs.values_list("id", flat=True))
-    if not invoice_ids:
+    """PnP za skup racuna jednim grupiranim upitom po stopi PDV-a."""
+    items_qs = SalesInvoiceItem.objects.filter(invoice__in=qs)
+    groups = list(
+        _pnp_items(items_qs)
+        .values("artikl__tax_group__rate")
+        .annotate(gross=Sum("amount"))
+        .values_list("artikl__tax_group__rate", "gross")
+        .order_by()
+    )
+    if not groups:
         return Decimal("0.00")
 
     ledger_id = qs.values_list("ledger_id", flat=True).first()
     ledger = Ledger.objects.filter(id=ledger_id).first() if ledger_id else None
     pnp_rate = _get_pnp_rate(ledger)
-
-    from sales.models import SalesInvoiceItem
-    pnp_items_qs = (
-        SalesInvoiceItem.objects
-        .filter(invoice_id__in=invoice_ids, artikl__pnp_category__isnull=False)
-        .select_related("artikl__tax_group")
-    )
-
-    if not pnp_items_qs.exists():
-        return Decimal("0.00")
     if pnp_rate is None:
         raise ValueError("Nedostaje PnP stopa (CompanyProfile.lgu).")
-
-    total = Decimal("0.00")
-    for item in pnp_items_qs:
-        if not item.artikl or not item.artikl.tax_group_id:
-            raise ValueError(f"Artikl {item.product_name} nema tax_group, a ima PnP kategoriju.")
-        vat_rate = Decimal(str(item.artikl.tax_group.rate))
-        gross = Decimal(str(item.amount))
-        net = gross / (Decimal("1.00") + vat_rate)
-        total += net * pnp_rate
-
-    return total.quantize(Decimal("0.01"), rounding=ROUND_HALF_UP)
+    if any(vat_rate is None for vat_rate, _ in groups):
+        raise ValueError(_missing_tax_group_error(items_qs))
+    return _pnp_from_vat_groups(groups, pnp_rate)
 
 
 def create_sales_z(
@@ -148,54 +168,51 @@ def post_sales_z_posting(*, posting: SalesZPosting, posted_by=None) -> SalesZPos
     return posting
 
 
-def build_stock_out_lines_for_invoice(invoice: SalesInvoice) -> tuple[list[dict], list[str]]:
+def _expand_stock_out_lines(quantities, skipped: list[str]) -> tuple[list[dict], set[int]]:
     """
-    Build stock-out lines for a sales invoice:
-    - If artikl.is_stock_item -> direct deduction
-    - Else if artikl has active Normativ -> deduct ingredients
-    - Else -> skipped with reason
+    Razvija (Artikl, kolicina) parove u izlazne linije po skladisnom artiklu
+    iz kompiliranih normativa (bez upita po stavci). Vraca linije i id-eve
+    prodajnih artikala koji su razduzeni.
     """
-    lines_by_artikl: dict[int, dict] = {}
-    skipped: list[str] = []
-
-    items = invoice.items.select_related("artikl").all()
-    for item in items:
-        artikl = item.artikl
-        if not artikl:
-            skipped.append(f"Stavka '{item.product_name}' nema artikl.")
+    boms = get_compiled_boms()
+    artikli: dict[int, Artikl] = {}
+    qty_by_ingredient: dict[int, Decimal] = {}
+    expanded: set[int] = set()
+    for artikl, qty in quantities:
+        if artikl.is_stock_item:
+            artikli[artikl.id] = artikl
+            components = ((artikl.id, Decimal("1")),)
+        elif artikl.id in boms:
+            components = boms[artikl.id]
+        else:
+            skipped.append(f"Artikl {artikl} nije skladisni i nema normativ.")
             continue
 
-        qty = Decimal(str(item.quantity))
-        if qty <= 0:
-            skipped.append(f"Artikl {artikl} ima kolicinu {qty}.")
-            continue
+        expanded.add(artikl.id)
+        for ingredient_id, ingredient_qty in components:
+            line_qty = ingredient_qty * qty
+            if line_qty <= 0:
+                continue
+            qty_by_ingredient[ingredient_id] = qty_by_ingredient.get(ingredient_id, Decimal("0.00")) + line_qty
 
-        if artikl.is_stock_item:
-            key = artikl.id
-            line = lines_by_artikl.get(key)
-            if not line:
-                line = {"artikl": artikl, "quantity": Decimal("0.00")}
-                lines_by_artikl[key] = line
-            line["quantity"] += qty
-            continue
+    missing = [ingredient_id for ingredient_id in qty_by_ingredient if ingredient_id not in artikli]
+    if missing:
+        artikli.update(Artikl.objects.in_bulk(missing))
+    lines = [
+        {"artikl": artikli[ingredient_id], "quantity": qty}
+        for ingredient_id, qty in qty_by_ingredient.items()
+    ]
+    return lines, expanded
 
-        normativ = Normativ.objects.filter(product=artikl, is_active=True).first()
-        if normativ:
-            for nitem in normativ.items.select_related("ingredient").all():
-                ing = nitem.ingredient
-                ing_qty = Decimal(str(nitem.qty)) * qty
-                if ing_qty <= 0:
-                    continue
-                key = ing.id
-                line = lines_by_artikl.get(key)
-                if not line:
-                    line = {"artikl": ing, "quantity": Decimal("0.00")}
-                    lines_by_artikl[key] = line
-                line["quantity"] += ing_qty
-        else:
-            skipped.append(f"Artikl {artikl} nije skladisni i nema normativ.")
 
-    return list(lines_by_artikl.values()), skipped
+def build_stock_out_lines_for_invoice(invoice: SalesInvoice) -> tuple[list[dict], list[str]]:
+    """
+    Build stock-out lines for a sales invoice:
+    - If artikl.is_stock_item -> direct deduction
+    - Else if artikl has active Normativ -> deduct ingredients (nested normativs expanded)
+    - Else -> skipped with reason
+    """
+    return build_stock_out_lines_for_items(invoice.items.select_related("artikl").all())
 
 
 def build_stock_out_lines_for_items(items) -> tuple[list[dict], list[str]]:
@@ -203,9 +220,8 @@ def build_stock_out_lines_for_items(items) -> tuple[list[dict], list[str]]:
     Build stock-out lines for specific sales invoice items.
     Same rules as invoice-level, but only for provided items.
     """
-    lines_by_artikl: dict[int, dict] = {}
     skipped: list[str] = []
-
+    quantities: list[tuple[Artikl, Decimal]] = []
     for item in items:
         artikl = item.artikl
         if not artikl:
@@ -216,35 +232,24 @@ def build_stock_out_lines_for_items(items) -> tuple[list[dict], list[str]]:
         if qty <= 0:
             skipped.append(f"Artikl {artikl} ima kolicinu {qty}.")
             continue
+        quantities.append((artikl, qty))
 
-        if artikl.is_stock_item:
-            key = artikl.id
-            line = lines_by_artikl.get(key)
-            if not line:
-                line = {"artikl": artikl, "quantity": Decimal("0.00")}
-                lines_by_artikl[key] = line
-            line["quantity"] += qty
-            continue
+    lines, _ = _expand_stock_out_lines(quantities, skipped)
+    return lines, skipped
 
-        normativ = Normativ.objects.filter(product=artikl, is_active=True).first()
-        if normativ:
-            for nitem in normativ.items.select_related("ingredient").all():
-                ing = nitem.ingredient
-                ing_qty = Decimal(str(nitem.qty)) * qty
-                if ing_qty <= 0:
-                    continue
-                key = ing.id
-                line = lines_by_artikl.get(key)
-                if not line:
-                    line = {"artikl": ing, "quantity": Decimal("0.00")}
-                    lines_by_artikl[key] = line
-                line["quantity"] += ing_qty
-        else:
-            skipped.append(f"Artikl {artikl} nije skladisni i nema normativ.")
 
-    return list(lines_by_artikl.values()), skipped
+def _link_stock_move(*, invoice_ids, move, item_ids) -> None:
+    SalesInvoiceStockMove.objects.bulk_create(
+        [SalesInvoiceStockMove(invoice_id=invoice_id, stock_move=move) for invoice_id in invoice_ids],
+        ignore_conflicts=True,
+    )
+    SalesInvoiceItem.objects.filter(id__in=list(item_ids)).update(
+        stock_move=move,
+        stock_out_posted_at=timezone.now(),
+    )
 
 
+@transaction.atomic
 def post_sales_items_stock_out(*, invoice: SalesInvoice, items, user=None):
     if not invoice.warehouse_id:
         raise ValueError("Racun nema vezano skladiste (warehouse).")
@@ -263,10 +268,12 @@ def post_sales_items_stock_out(*, invoice: SalesInvoice, items, user=None):
         auto_cogs=True,
         posted_by=user,
     )
+    _link_stock_move(invoice_ids=[invoice.id], move=move, item_ids=[item.id for item in items])
 
     return move, skipped
 
 
+@transaction.atomic
 def post_sales_invoice_stock_out(invoice: SalesInvoice, *, user=None):
     if not invoice.warehouse_id:
         raise ValueError("Racun nema vezano skladiste (warehouse).")
@@ -285,39 +292,190 @@ def post_sales_invoice_stock_out(invoice: SalesInvoice, *, user=None):
         auto_cogs=True,
         posted_by=user,
     )
+    _link_stock_move(
+        invoice_ids=[invoice.id],
+        move=move,
+        item_ids=invoice.items.filter(stock_move__isnull=True).values_list("id", flat=True),
+    )
 
     return move, skipped
 
 
-def get_sales_z_summary(*, issued_on, warehouse_id, pos_id) -> dict:
-    qs = SalesInvoice.objects.filter(
-        issued_on=issued_on,
-        warehouse_id=warehouse_id,
-        pos_id=pos_id,
+@transaction.atomic
+def post_sales_day_stock_out(*, issued_on, warehouse, pos, user=None):
+    """
+    Robno razduzenje cijelog dana (datum/lokacija/POS) jednim FIFO izlazom:
+    - kolicine svih racuna se netiraju po artiklu
+    - normativi se razvijaju iz kompiliranog cachea (artikli.bom)
+    - za svaki obuhvaceni racun sprema se SalesInvoiceStockMove (sljedivost)
+    Racuni koji su vec robno razduzeni (cijeli ili po stavkama) se preskacu.
+    """
+    if not warehouse:
+        raise ValueError("Nedostaje skladiste (warehouse).")
+
+    invoices = SalesInvoice.objects.filter(issued_on=issued_on, warehouse=warehouse, pos=pos)
+    invoice_ids = list(invoices.exclude(stock_move_links__isnull=False).values_list("id", flat=True))
+    if not invoice_ids:
+        if invoices.exists():
+            raise ValueError("Svi racuni za zadani datum/lokaciju/POS su vec robno razduzeni.")
+        raise ValueError("Nema racuna za razduzenje za zadani datum/lokaciju/POS.")
+
+    items = list(
+        SalesInvoiceItem.objects
+        .filter(invoice_id__in=invoice_ids, stock_out_posted_at__isnull=True)
+        .values_list("id", "artikl_id", "product_name", "quantity")
     )
-    totals = qs.aggregate(
-        net=Sum("net_amount"),
-        vat=Sum("vat_amount"),
-        total=Sum("total_amount"),
+    skipped: list[str] = []
+    qty_by_artikl: dict[int, Decimal] = {}
+    for _, artikl_id, product_name, quantity in items:
+        if not artikl_id:
+            skipped.append(f"Stavka '{product_name}' nema artikl.")
+            continue
+        qty_by_artikl[artikl_id] = qty_by_artikl.get(artikl_id, Decimal("0.00")) + Decimal(str(quantity))
+
+    artikli = Artikl.objects.in_bulk(list(qty_by_artikl))
+    quantities: list[tuple[Artikl, Decimal]] = []
+    for artikl_id, qty in qty_by_artikl.items():
+        if qty <= 0:
+            skipped.append(f"Artikl {artikli[artikl_id]} ima netiranu kolicinu {qty}.")
+            continue
+        quantities.append((artikli[artikl_id], qty))
+    lines, posted_artikl_ids = _expand_stock_out_lines(quantities, skipped)
+
+    if not lines:
+        raise ValueError("Nema stavki za razduzenje.")
+
+    move_date = SalesInvoice.objects.filter(id__in=invoice_ids).aggregate(last=Max("issued_at"))["last"]
+    pos_label = pos.external_pos_id if pos else "?"
+    move = post_stock_out(
+        warehouse=warehouse,
+        items=lines,
+        move_date=move_date,
+        reference=f"POS promet {issued_on} (POS {pos_label})",
+        note=f"Robno razduzenje dnevnog prometa ({len(invoice_ids)} racuna)",
+        purpose="sale",
+        auto_cogs=True,
+        posted_by=user,
     )
-    net = totals.get("net") or Decimal("0.00")
-    vat = totals.get("vat") or Decimal("0.00")
-    total = totals.get("total") or Decimal("0.00")
-    pnp_amount = _compute_pnp_amount(qs)
-    has_invoices = qs.exists()
-    already_posted = SalesZPosting.objects.filter(
-        issued_on=issued_on,
+
+    _link_stock_move(
+        invoice_ids=invoice_ids,
+        move=move,
+        item_ids=[item_id for item_id, artikl_id, _, _ in items if artikl_id in posted_artikl_ids],
+    )
+
+    return move, skipped
+
+
+def get_sales_z_summaries(*, date_from, date_to, warehouse_id=None, pos_id=None, exact=False) -> list[dict]:
+    """
+    Z sazeci za sve (dan, lokacija, POS) kombinacije u periodu s konstantnim
+    brojem upita: iznosi i PnP se agregiraju u bazi, grupirano po danu,
+    lokaciji, POS-u (i stopi PDV-a za PnP). Ako se PnP ne moze izracunati,
+    sazetak ima pnp_amount=None i poruku u pnp_error.
+    warehouse_id/pos_id None znaci sve lokacije/POS-ove, a uz exact=True
+    samo racune bez lokacije/POS-a.
+    """
+    filters = {"issued_on__gte": date_from, "issued_on__lte": date_to}
+    if warehouse_id is not None or exact:
+        filters["warehouse_id"] = warehouse_id
+    if pos_id is not None or exact:
+        filters["pos_id"] = pos_id
+    invoices = SalesInvoice.objects.filter(**filters)
+
+    rows = (
+        invoices.values("issued_on", "warehouse_id", "pos_id")
+        .annotate(
+            net=Sum("net_amount"),
+            vat=Sum("vat_amount"),
+            total=Sum("total_amount"),
+            first_ledger_id=Min("ledger_id"),
+        )
+        .order_by("issued_on", "warehouse_id", "pos_id")
+    )
+
+    items_qs = SalesInvoiceItem.objects.filter(invoice__in=invoices)
+    pnp_groups: dict[tuple, list] = {}
+    for issued_on, wh_id, p_id, vat_rate, gross in (
+        _pnp_items(items_qs)
+        .values("invoice__issued_on", "invoice__warehouse_id", "invoice__pos_id", "artikl__tax_group__rate")
+        .annotate(gross=Sum("amount"))
+        .values_list("invoice__issued_on", "invoice__warehouse_id", "invoice__pos_id", "artikl__tax_group__rate", "gross")
+        .order_by()
+    ):
+        pnp_groups.setdefault((issued_on, wh_id, p_id), []).append((vat_rate, gross))
+
+    posted = set(SalesZPosting.objects.filter(**filters).values_list("issued_on", "warehouse_id", "pos_id"))
+
+    pnp_rates: dict = {}
+    summaries = []
+    for row in rows:
+        key = (row["issued_on"], row["warehouse_id"], row["pos_id"])
+        groups = pnp_groups.get(key)
+        pnp_amount = Decimal("0.00")
+        pnp_error = None
+        if groups:
+            ledger_id = row["first_ledger_id"]
+            if ledger_id not in pnp_rates:
+                ledger = (
+                    Ledger.objects.select_related("company_profile__lgu").filter(id=ledger_id).first()
+                    if ledger_id
+                    else None
+                )
+                pnp_rates[ledger_id] = _get_pnp_rate(ledger)
+            if pnp_rates[ledger_id] is None:
+                pnp_error = "Nedostaje PnP stopa (CompanyProfile.lgu)."
+            elif any(vat_rate is None for vat_rate, _ in groups):
+                pnp_error = _missing_tax_group_error(
+                    items_qs.filter(invoice__issued_on=key[0], invoice__warehouse_id=key[1], invoice__pos_id=key[2])
+                )
+            else:
+                pnp_amount = _pnp_from_vat_groups(groups, pnp_rates[ledger_id])
+            if pnp_error:
+                pnp_amount = None
+        summaries.append(
+            {
+                "issued_on": key[0],
+                "warehouse_id": key[1],
+                "pos_id": key[2],
+                "net_amount": row["net"] or Decimal("0.00"),
+                "vat_amount": row["vat"] or Decimal("0.00"),
+                "pnp_amount": pnp_amount,
+                "pnp_error": pnp_error,
+                "total_amount": row["total"] or Decimal("0.00"),
+                "has_invoices": True,
+                "already_posted": key in posted,
+            }
+        )
+    return summaries
+
+
+def get_sales_z_summary(*, issued_on, warehouse_id, pos_id) -> dict:
+    summaries = get_sales_z_summaries(
+        date_from=issued_on,
+        date_to=issued_on,
         warehouse_id=warehouse_id,
         pos_id=pos_id,
-    ).exists()
-    return {
-        "issued_on": issued_on,
-        "warehouse_id": warehouse_id,
-        "pos_id": pos_id,
-        "net_amount": net,
-        "vat_amount": vat,
-        "pnp_amount": pnp_amount,
-        "total_amount": total,
-        "has_invoices": has_invoices,
-        "already_posted": already_posted,
-    }
+        exact=True,
+    )
+    if not summaries:
+        return {
+            "issued_on": issued_on,
+            "warehouse_id": warehouse_id,
+            "pos_id": pos_id,
+            "net_amount": Decimal("0.00"),
+            "vat_amount": Decimal("0.00"),
+            "pnp_amount": Decimal("0.00"),
+            "total_amount": Decimal("0.00"),
+            "has_invoices": False,
+            "already_posted": SalesZPosting.objects.filter(
+                issued_on=issued_on,
+                warehouse_id=warehouse_id,
+                pos_id=pos_id,
+            ).exists(),
+        }
+    summary = summaries[0]
+    pnp_error = summary.pop("pnp_error")
+    if pnp_error:
+        raise ValueError(pnp_error)
+    return summary
@@ -0,0 +1,14 @@
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+
+from artikli.models import Artikl
+from sales.rollups import sync_rollup_drink_category
+
+
+@receiver(post_save, sender=Artikl)
+def sync_rollups_on_drink_category_change(sender, instance, created, **kwargs):
+    # SalesDailyRollup nosi kategoriju artikla; filter kategorija cita rollup.
+    if not created and hasattr(instance, "_loaded_drink_category_id"):
+        if instance._loaded_drink_category_id != instance.drink_category_id:
+            sync_rollup_drink_category(instance.id, instance.drink_category_id)
+    instance._loaded_drink_category_id = instance.drink_category_id
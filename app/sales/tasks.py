@@ -1,16 +1,30 @@
 from celery import shared_task
+from django.conf import settings
 from django.utils import timezone
 
-from sales.remaris_importer import import_sales_invoices, load_import_defaults
+from sales.remaris_importer import (
+    import_sales_invoices,
+    import_sales_invoices_incremental as run_incremental_import,
+    load_import_defaults,
+)
 
 
 @shared_task
 def import_sales_invoices_today() -> dict:
     today = timezone.localdate()
     defaults = load_import_defaults()
-    created, updated, skipped = import_sales_invoices(
+    created, updated, unchanged = import_sales_invoices(
         date_from=today,
         date_to=today,
         **defaults,
     )
-    return {"created": created, "updated": updated, "skipped": skipped}
+    return {"created": created, "updated": updated, "unchanged": unchanged}
+
+
+@shared_task
+def import_sales_invoices_incremental() -> dict:
+    return run_incremental_import(
+        **load_import_defaults(),
+        post_stock_out=settings.SALES_INCREMENTAL_STOCK_OUT,
+        z_summary=settings.SALES_INCREMENTAL_Z_SUMMARY,
+    )
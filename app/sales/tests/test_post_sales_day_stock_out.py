@@ -0,0 +1,177 @@
+import importlib
+from datetime import date, datetime
+from decimal import Decimal
+
+from django.apps import apps
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from django.utils import timezone
+
+from accounting.models import Account, Ledger
+from artikli.models import Artikl, Normativ, NormativItem
+from pos.models import Pos
+from sales.models import SalesInvoice, SalesInvoiceItem, SalesInvoiceStockMove
+from sales.services import post_sales_day_stock_out, post_sales_items_stock_out
+from stock.services import post_stock_out
+from stock.models import StockAccountingConfig, StockLot, StockMove, WarehouseId
+
+
+class PostSalesDayStockOutTests(TestCase):
+    def setUp(self):
+        self.ledger = Ledger.objects.create(name="Mozart")
+        cogs = Account.objects.create(
+            ledger=self.ledger,
+            code="5000",
+            name="COGS",
+            type=Account.AccountType.EXPENSE,
+            normal_side=Account.NormalSide.DEBIT,
+        )
+        inventory = Account.objects.create(
+            ledger=self.ledger,
+            code="1310",
+            name="Zaliha robe",
+            type=Account.AccountType.ASSET,
+            normal_side=Account.NormalSide.DEBIT,
+        )
+        cash = Account.objects.create(
+            ledger=self.ledger,
+            code="1000",
+            name="Blagajna",
+            type=Account.AccountType.ASSET,
+            normal_side=Account.NormalSide.DEBIT,
+        )
+        self.warehouse = WarehouseId.objects.create(rm_id=4, name="Sank")
+        StockAccountingConfig.objects.create(
+            inventory_account=inventory,
+            cogs_account=cogs,
+            default_sale_warehouse=self.warehouse,
+            default_purchase_warehouse=self.warehouse,
+            default_cash_account=cash,
+        )
+        self.pos = Pos.objects.create(external_pos_id=6, name="Kasa 1")
+
+        self.pivo = Artikl.objects.create(rm_id=10, name="Pivo", is_stock_item=True)
+        self.kava_zrno = Artikl.objects.create(rm_id=11, name="Kava zrno", is_stock_item=True)
+        self.espresso = Artikl.objects.create(rm_id=12, name="Espresso")
+        normativ = Normativ.objects.create(product=self.espresso)
+        NormativItem.objects.create(normativ=normativ, ingredient=self.kava_zrno, qty=Decimal("0.0090"))
+
+        for artikl, qty in ((self.pivo, "50.0000"), (self.kava_zrno, "2.0000")):
+            StockLot.objects.create(
+                warehouse=self.warehouse,
+                artikl=artikl,
+                received_at=timezone.now(),
+                unit_cost=Decimal("1.00"),
+                qty_in=Decimal(qty),
+                qty_remaining=Decimal(qty),
+            )
+
+        self.issued_on = date(2026, 2, 1)
+        self.invoices = []
+        for rm_number, lines in (
+            (1001, [(self.pivo, "2"), (self.espresso, "3")]),
+            (1002, [(self.pivo, "1"), (self.espresso, "1")]),
+            (1003, [(self.pivo, "-1")]),
+        ):
+            invoice = SalesInvoice.objects.create(
+                rm_number=rm_number,
+                issued_on=self.issued_on,
+                issued_at=timezone.make_aware(datetime(2026, 2, 1, 20, rm_number - 1000)),
+                ledger=self.ledger,
+                warehouse=self.warehouse,
+                pos=self.pos,
+            )
+            for artikl, qty in lines:
+                SalesInvoiceItem.objects.create(
+                    invoice=invoice,
+                    artikl=artikl,
+                    product_name=artikl.name,
+                    quantity=Decimal(qty),
+                    amount=Decimal("2.00"),
+                )
+            self.invoices.append(invoice)
+
+    def test_day_is_posted_as_one_netted_move(self):
+        move, skipped = post_sales_day_stock_out(
+            issued_on=self.issued_on,
+            warehouse=self.warehouse,
+            pos=self.pos,
+        )
+
+        self.assertEqual(skipped, [])
+        self.assertEqual(StockMove.objects.filter(move_type=StockMove.MoveType.OUT).count(), 1)
+        quantities = {line.artikl_id: line.quantity for line in move.lines.all()}
+        self.assertEqual(quantities[self.pivo.rm_id], Decimal("2.0000"))
+        self.assertEqual(quantities[self.kava_zrno.rm_id], Decimal("0.0360"))
+        self.assertIsNotNone(move.journal_entry_id)
+
+        linked = set(SalesInvoiceStockMove.objects.filter(stock_move=move).values_list("invoice_id", flat=True))
+        self.assertEqual(linked, {invoice.id for invoice in self.invoices})
+        self.assertFalse(SalesInvoiceItem.objects.filter(stock_out_posted_at__isnull=True).exists())
+        self.assertFalse(SalesInvoiceItem.objects.exclude(stock_move=move).exists())
+
+    def test_second_run_has_nothing_to_post(self):
+        post_sales_day_stock_out(issued_on=self.issued_on, warehouse=self.warehouse, pos=self.pos)
+
+        with self.assertRaises(ValueError):
+            post_sales_day_stock_out(issued_on=self.issued_on, warehouse=self.warehouse, pos=self.pos)
+
+    def test_items_stock_out_links_invoice(self):
+        invoice = self.invoices[0]
+        pivo_item = invoice.items.get(artikl=self.pivo)
+        move, _ = post_sales_items_stock_out(invoice=invoice, items=[pivo_item])
+
+        pivo_item.refresh_from_db()
+        self.assertEqual(pivo_item.stock_move, move)
+        self.assertIsNotNone(pivo_item.stock_out_posted_at)
+        self.assertIsNone(invoice.items.get(artikl=self.espresso).stock_move_id)
+        self.assertTrue(SalesInvoiceStockMove.objects.filter(invoice=invoice, stock_move=move).exists())
+
+        day_move, _ = post_sales_day_stock_out(issued_on=self.issued_on, warehouse=self.warehouse, pos=self.pos)
+        linked = set(SalesInvoiceStockMove.objects.filter(stock_move=day_move).values_list("invoice_id", flat=True))
+        self.assertEqual(linked, {self.invoices[1].id, self.invoices[2].id})
+
+    def test_migration_links_legacy_reference_moves(self):
+        invoice = self.invoices[1]
+        move = post_stock_out(
+            warehouse=self.warehouse,
+            items=[
+                {"artikl": self.pivo, "quantity": Decimal("1")},
+                {"artikl": self.kava_zrno, "quantity": Decimal("0.0090")},
+            ],
+            move_date=invoice.issued_at,
+            reference=f"POS racun {invoice.rm_number}",
+            purpose="sale",
+        )
+        migration = importlib.import_module("sales.migrations.0023_salesinvoiceitem_stock_move")
+        migration.link_legacy_stock_moves(apps, None)
+
+        self.assertTrue(SalesInvoiceStockMove.objects.filter(invoice=invoice, stock_move=move).exists())
+        self.assertEqual(set(invoice.items.values_list("stock_move_id", flat=True)), {move.id})
+        self.assertFalse(SalesInvoiceItem.objects.exclude(invoice=invoice).filter(stock_move__isnull=False).exists())
+
+    def test_migration_links_items_of_daily_stock_out(self):
+        day_move, _ = post_sales_day_stock_out(issued_on=self.issued_on, warehouse=self.warehouse, pos=self.pos)
+        SalesInvoiceItem.objects.update(stock_move=None)
+
+        migration = importlib.import_module("sales.migrations.0023_salesinvoiceitem_stock_move")
+        with self.assertNumQueries(2):
+            migration.link_legacy_stock_moves(apps, None)
+
+        self.assertEqual(
+            set(SalesInvoiceItem.objects.filter(stock_out_posted_at__isnull=False).values_list("stock_move_id", flat=True)),
+            {day_move.id},
+        )
+
+    def test_admin_shows_stock_out_status_from_links(self):
+        move, _ = post_sales_day_stock_out(issued_on=self.issued_on, warehouse=self.warehouse, pos=self.pos)
+        self.client.force_login(get_user_model().objects.create_superuser("admin", "admin@example.com", "x"))
+
+        response = self.client.get("/admin/sales/salesinvoiceitem/", {"stock_out_done": "1"})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context["cl"].result_count, SalesInvoiceItem.objects.count())
+        self.assertContains(response, f"#{move.id}")
+
+        response = self.client.get("/admin/sales/salesinvoice/")
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(all(invoice._stock_out_done for invoice in response.context["cl"].result_list))
@@ -0,0 +1,103 @@
+from datetime import date, datetime
+from decimal import Decimal
+from unittest import mock
+
+from django.contrib import admin
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import RequestFactory, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from accounting.models import Ledger
+from artikli.models import Artikl
+from pos.models import Pos
+from sales.admin import SalesInvoiceItemAdmin
+from sales.models import SalesInvoice, SalesInvoiceItem, SalesProductAlias
+from sales.product_matching import (
+    learn_product_alias,
+    load_artikl_ids_by_name,
+    normalize_product_name,
+    suggest_product_aliases,
+    trigram_similarity,
+)
+from stock.models import WarehouseId
+
+
+class ProductMatchingTests(TestCase):
+    def setUp(self):
+        self.pivo = Artikl.objects.create(rm_id=10, name="Pivo Ožujsko 0,5")
+        self.sok = Artikl.objects.create(rm_id=11, name="Sok naranča")
+        self.invoice = SalesInvoice.objects.create(
+            rm_number=1,
+            issued_on=date(2026, 1, 5),
+            issued_at=timezone.make_aware(datetime(2026, 1, 5, 20, 0)),
+            ledger=Ledger.objects.create(name="Mozart"),
+            warehouse=WarehouseId.objects.create(rm_id=4, name="Sank", external_location_id=5),
+            pos=Pos.objects.create(external_pos_id=6, name="Kasa 1"),
+        )
+
+    def _item(self, product_name):
+        return SalesInvoiceItem.objects.create(
+            invoice=self.invoice,
+            product_name=product_name,
+            quantity=Decimal("1"),
+            amount=Decimal("3.00"),
+        )
+
+    def test_normalized_names_and_aliases_are_matched(self):
+        SalesProductAlias.objects.create(normalized_name="ozujsko", artikl=self.pivo)
+        SalesProductAlias.objects.create(normalized_name="sok", artikl=self.sok, is_confirmed=False)
+
+        artikl_ids = load_artikl_ids_by_name()
+        self.assertEqual(artikl_ids[normalize_product_name("  PIVO  ožujsko 0,5 ")], self.pivo.id)
+        self.assertEqual(artikl_ids["ozujsko"], self.pivo.id)
+        self.assertNotIn("sok", artikl_ids)
+
+    def test_learned_alias_resolves_other_unmatched_lines(self):
+        fixed = self._item("Ozujsko")
+        other = self._item("OZUJSKO ")
+        unrelated = self._item("Kava")
+        fixed.artikl = self.pivo
+        fixed.save()
+
+        self.assertEqual(learn_product_alias(fixed.product_name, self.pivo.id), 1)
+
+        other.refresh_from_db()
+        unrelated.refresh_from_db()
+        self.assertEqual(other.artikl_id, self.pivo.id)
+        self.assertIsNone(unrelated.artikl_id)
+        self.assertTrue(SalesProductAlias.objects.get(normalized_name="ozujsko").is_confirmed)
+
+    def test_admin_fix_filters_candidates_in_sql_and_refreshes_once(self):
+        fixed = self._item("Ozujsko")
+        other = self._item("ozujsko")
+        self._item("Kava")
+        fixed.artikl = self.pivo
+        fixed.save()
+
+        model_admin = SalesInvoiceItemAdmin(SalesInvoiceItem, admin.site)
+        request = RequestFactory().post("/")
+        request.user = get_user_model().objects.create_superuser("admin", "admin@example.com", "x")
+        form = mock.Mock(changed_data=["artikl"])
+        with mock.patch("sales.product_matching.refresh_rollups_for_items") as refresh, mock.patch.object(
+            model_admin, "message_user"
+        ), CaptureQueriesContext(connection) as queries:
+            model_admin.save_model(request, fixed, form, change=True)
+
+        refresh.assert_called_once()
+        self.assertEqual(sorted(refresh.call_args.args[0]), sorted([fixed.id, other.id]))
+        scan = next(q["sql"] for q in queries if '"product_name"' in q["sql"] and q["sql"].startswith("SELECT"))
+        self.assertIn("LIKE", scan)
+
+    def test_suggestions_are_stored_unconfirmed(self):
+        self._item("Sok naranca")
+        self._item("Kava")
+        self.assertGreater(trigram_similarity("Sok naranca", "Sok naranča"), 0.5)
+
+        self.assertEqual(suggest_product_aliases(threshold=0.5), 1)
+        alias = SalesProductAlias.objects.get()
+        self.assertEqual((alias.normalized_name, alias.artikl_id), ("sok naranca", self.sok.id))
+        self.assertFalse(alias.is_confirmed)
+        self.assertEqual(alias.source, SalesProductAlias.Source.SUGGESTED)
+        self.assertEqual(suggest_product_aliases(threshold=0.5), 0)
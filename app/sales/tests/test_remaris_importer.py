@@ -0,0 +1,255 @@
+import tempfile
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+from pathlib import Path
+from unittest import mock
+
+from django.test import TestCase
+from django.utils import timezone
+
+from accounting.models import Ledger
+from artikli.models import Artikl
+from pos.models import Pos
+from sales.models import SalesImportWatermark, SalesInvoice, SalesInvoiceItem
+from sales.remaris_importer import (
+    import_sales_invoices,
+    import_sales_invoices_incremental,
+    iter_sales_report,
+)
+from stock.models import WarehouseId
+
+
+def _serial(value: datetime) -> float:
+    delta = value - datetime(1899, 12, 30)
+    return delta.days + delta.seconds / 86400
+
+
+def _invoice_rows(rm_number: int, issued_at: datetime, lines: list[tuple[str, int, float]]) -> list[list]:
+    rows = [
+        ["", "Račun:", "", rm_number, "", "", "", "", _serial(issued_at.replace(hour=0, minute=0))],
+        ["", "", "", _serial(issued_at), "", "", "", "", "Ana"],
+        ["", "", "", "Kupac", "", "", "", "", "Caffe"],
+        ["", "Artikl", "", "", "Popust", "%", "Kol.", "", "Iznos"],
+    ]
+    for name, qty, amount in lines:
+        rows.append(["", name, "", "", "", "", qty, "", amount])
+    rows.append(["", "", "", "", "", "", "Ukupno:", "", sum(amount for _, _, amount in lines)])
+    return rows
+
+
+class _FakeSheet:
+    def __init__(self, rows):
+        self.rows = rows
+        self.nrows = len(rows)
+        self.reads = 0
+
+    def row_values(self, idx):
+        self.reads += 1
+        return self.rows[idx]
+
+
+class _FakeBook:
+    datemode = 0
+
+    def __init__(self, rows):
+        self.sheet = _FakeSheet(rows)
+        self.released = False
+
+    def sheet_by_index(self, idx):
+        return self.sheet
+
+    def release_resources(self):
+        self.released = True
+
+
+class SalesReportParserTests(TestCase):
+    def setUp(self):
+        rows = []
+        for rm_number in range(1, 4):
+            rows += _invoice_rows(rm_number, datetime(2026, 1, 5, 20, rm_number), [("Pivo", 2, 6.0), ("Sok", 1, 3.0)])
+        self.book = _FakeBook(rows)
+        patcher = mock.patch("sales.remaris_importer.xlrd.open_workbook", return_value=self.book)
+        self.open_workbook = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_yields_invoices_lazily_and_releases_workbook(self):
+        invoices = iter_sales_report(Path("report.xls"))
+
+        first = next(invoices)
+        self.assertEqual(first.rm_number, 1)
+        self.assertEqual(first.issued_on, date(2026, 1, 5))
+        self.assertEqual(first.total_amount, Decimal("9.0"))
+        self.assertEqual([item.product_name for item in first.items], ["Pivo", "Sok"])
+        self.assertLess(self.book.sheet.reads, self.book.sheet.nrows)
+        self.assertTrue(self.open_workbook.call_args.kwargs["on_demand"])
+
+        self.assertEqual([invoice.rm_number for invoice in invoices], [2, 3])
+        self.assertTrue(self.book.released)
+
+    def _import(self, timings=None):
+        tmp = tempfile.NamedTemporaryFile(delete=False, suffix=".xls")
+        tmp.close()
+        report_path = Path(tmp.name)
+        with mock.patch("sales.remaris_importer.RemarisConnector"), mock.patch(
+            "sales.remaris_importer._download_report_excel", return_value=report_path
+        ), mock.patch("sales.remaris_importer.IMPORT_CHUNK_SIZE", 2):
+            result = import_sales_invoices(
+                date_from=date(2026, 1, 5),
+                date_to=date(2026, 1, 5),
+                organization_id=2,
+                location_id=5,
+                pos_id=6,
+                currency="EUR",
+                timings=timings,
+            )
+        self.assertFalse(report_path.exists())
+        return result
+
+    def test_import_writes_chunks_and_removes_temp_file(self):
+        Ledger.objects.create(name="Mozart")
+        WarehouseId.objects.create(rm_id=4, name="Sank", external_location_id=5)
+        Pos.objects.create(external_pos_id=6, name="Kasa 1")
+        Artikl.objects.create(rm_id=10, name="Pivo")
+
+        timings = {}
+        self.assertEqual(self._import(timings), (3, 0, 0))
+        self.assertEqual(set(timings), {"download", "lookup", "parse", "invoices", "items", "rollups"})
+
+        self.assertEqual(SalesInvoice.objects.count(), 3)
+        invoice = SalesInvoice.objects.get(rm_number=2)
+        self.assertEqual(invoice.items.count(), 2)
+        self.assertEqual(invoice.items.get(product_name="Pivo").artikl.rm_id, 10)
+
+    def test_reimport_skips_unchanged_invoices(self):
+        Ledger.objects.create(name="Mozart")
+        WarehouseId.objects.create(rm_id=4, name="Sank", external_location_id=5)
+        Pos.objects.create(external_pos_id=6, name="Kasa 1")
+
+        self._import()
+        item_ids = set(SalesInvoiceItem.objects.values_list("id", flat=True))
+
+        self.assertEqual(self._import(), (0, 0, 3))
+        self.assertEqual(set(SalesInvoiceItem.objects.values_list("id", flat=True)), item_ids)
+
+        qty_row = next(row for row in self.book.sheet.rows if row[1] == "Sok")
+        qty_row[6] = 4
+        self.assertEqual(self._import(), (0, 1, 2))
+        self.assertEqual(SalesInvoiceItem.objects.get(invoice__rm_number=1, product_name="Sok").quantity, 4)
+
+    def test_reimport_links_items_to_new_artikl(self):
+        Ledger.objects.create(name="Mozart")
+        WarehouseId.objects.create(rm_id=4, name="Sank", external_location_id=5)
+        Pos.objects.create(external_pos_id=6, name="Kasa 1")
+
+        self._import()
+        self.assertFalse(SalesInvoiceItem.objects.filter(artikl__isnull=False).exists())
+
+        Artikl.objects.create(rm_id=10, name="Pivo")
+        self.assertEqual(self._import(), (0, 3, 0))
+        self.assertEqual(
+            set(SalesInvoiceItem.objects.filter(product_name="Pivo").values_list("artikl__rm_id", flat=True)),
+            {10},
+        )
+        self.assertFalse(SalesInvoiceItem.objects.filter(product_name="Sok", artikl__isnull=False).exists())
+
+        self.assertEqual(self._import(), (0, 0, 3))
+
+    def _import_incremental(self, **kwargs):
+        tmp = tempfile.NamedTemporaryFile(delete=False, suffix=".xls")
+        tmp.close()
+        with mock.patch("sales.remaris_importer.RemarisConnector"), mock.patch(
+            "sales.remaris_importer._download_report_excel", return_value=Path(tmp.name)
+        ) as download:
+            result = import_sales_invoices_incremental(
+                organization_id=2,
+                location_id=5,
+                pos_id=6,
+                currency="EUR",
+                **kwargs,
+            )
+        return result, download.call_args.kwargs if download.call_args else None
+
+    def test_incremental_import_advances_watermark(self):
+        Ledger.objects.create(name="Mozart")
+        WarehouseId.objects.create(rm_id=4, name="Sank", external_location_id=5)
+        Pos.objects.create(external_pos_id=6, name="Kasa 1")
+
+        result, _ = self._import_incremental()
+        self.assertEqual((result["created"], result["updated"], result["unchanged"]), (3, 0, 0))
+        watermark = SalesImportWatermark.objects.get(external_location_id=5, external_pos_id=6)
+        self.assertEqual(watermark.last_rm_number, 3)
+        self.assertIsNotNone(watermark.last_run_at)
+
+        new_rows = _invoice_rows(4, datetime(2026, 1, 5, 21, 0), [("Pivo", 1, 3.0)])
+        self.book.sheet.rows += new_rows
+        self.book.sheet.nrows = len(self.book.sheet.rows)
+
+        result, download_kwargs = self._import_incremental()
+        self.assertEqual((result["created"], result["updated"], result["unchanged"]), (1, 0, 0))
+        self.assertEqual(download_kwargs["date_from"], date(2026, 1, 5))
+        watermark.refresh_from_db()
+        self.assertEqual(watermark.last_rm_number, 4)
+        self.assertEqual(SalesInvoice.objects.count(), 4)
+
+    def test_incremental_stock_out_posts_every_new_day(self):
+        Ledger.objects.create(name="Mozart")
+        WarehouseId.objects.create(rm_id=4, name="Sank", external_location_id=5)
+        Pos.objects.create(external_pos_id=6, name="Kasa 1")
+        self._import_incremental()
+
+        # Racun prije ponoci uvezen zajedno s prvim racunom novog dana.
+        self.book.sheet.rows += _invoice_rows(4, datetime(2026, 1, 5, 23, 59), [("Pivo", 1, 3.0)])
+        self.book.sheet.rows += _invoice_rows(5, datetime(2026, 1, 6, 0, 1), [("Sok", 1, 3.0)])
+        self.book.sheet.nrows = len(self.book.sheet.rows)
+
+        move = mock.Mock(id=1)
+        with mock.patch("sales.remaris_importer.post_sales_day_stock_out", return_value=(move, [])) as stock_out:
+            result, _ = self._import_incremental(post_stock_out=True)
+
+        self.assertEqual(result["created"], 2)
+        self.assertEqual(
+            [call.kwargs["issued_on"] for call in stock_out.call_args_list],
+            [date(2026, 1, 5), date(2026, 1, 6)],
+        )
+        self.assertEqual(set(result["stock_moves"]), {"2026-01-05", "2026-01-06"})
+
+    def test_incremental_z_summary_for_new_days(self):
+        Ledger.objects.create(name="Mozart")
+        warehouse = WarehouseId.objects.create(rm_id=4, name="Sank", external_location_id=5)
+        pos = Pos.objects.create(external_pos_id=6, name="Kasa 1")
+        result, _ = self._import_incremental()
+        self.assertNotIn("z_summaries", result)
+
+        self.book.sheet.rows += _invoice_rows(4, datetime(2026, 1, 6, 9, 0), [("Sok", 1, 3.0)])
+        self.book.sheet.nrows = len(self.book.sheet.rows)
+        result, _ = self._import_incremental(z_summary=True)
+
+        self.assertEqual(
+            [(s["issued_on"], s["warehouse_id"], s["pos_id"], s["total_amount"]) for s in result["z_summaries"]],
+            [(date(2026, 1, 6), warehouse.id, pos.id, Decimal("3.00"))],
+        )
+        self.assertNotIn("stock_moves", result)
+
+    def test_incremental_import_lease(self):
+        Ledger.objects.create(name="Mozart")
+        WarehouseId.objects.create(rm_id=4, name="Sank", external_location_id=5)
+        Pos.objects.create(external_pos_id=6, name="Kasa 1")
+        watermark = SalesImportWatermark.objects.create(
+            external_location_id=5,
+            external_pos_id=6,
+            locked_until=timezone.now() + timedelta(minutes=5),
+        )
+        self.assertEqual(self._import_incremental()[0], {"skipped": True})
+
+        watermark.locked_until = timezone.now() - timedelta(minutes=1)
+        watermark.save()
+        with mock.patch("sales.remaris_importer.import_sales_invoices", side_effect=RuntimeError("Remaris")):
+            with self.assertRaises(RuntimeError):
+                self._import_incremental()
+        watermark.refresh_from_db()
+        self.assertIsNone(watermark.locked_until)
+
+        result, _ = self._import_incremental()
+        self.assertEqual(result["created"], 3)
+        watermark.refresh_from_db()
+        self.assertIsNone(watermark.locked_until)
@@ -0,0 +1,109 @@
+import tempfile
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+from pathlib import Path
+from unittest import mock
+
+from django.test import TestCase
+from django.utils import timezone
+
+from accounting.models import Ledger
+from pos.models import Pos
+from sales.backfill import backfill_sales_invoices, split_date_range
+from sales.models import SalesBackfillChunk, SalesInvoice
+from sales.remaris_importer import SalesInvoiceRow, SalesItemRow
+from stock.models import WarehouseId
+
+
+def _invoice(rm_number: int, issued_on: date) -> SalesInvoiceRow:
+    return SalesInvoiceRow(
+        rm_number=rm_number,
+        issued_on=issued_on,
+        issued_at=datetime(issued_on.year, issued_on.month, issued_on.day, 20, 0),
+        location_name="Caffe",
+        buyer_name="",
+        waiter_name="Ana",
+        total_amount=Decimal("6.00"),
+        currency="EUR",
+        items=[SalesItemRow("Pivo", Decimal("2"), Decimal("6.00"), None, None)],
+    )
+
+
+class SalesBackfillTests(TestCase):
+    def setUp(self):
+        Ledger.objects.create(name="Mozart")
+        WarehouseId.objects.create(rm_id=4, name="Sank", external_location_id=5)
+        Pos.objects.create(external_pos_id=6, name="Kasa 1")
+        self.fail_from = None
+        self.reports = {}
+
+    def _download(self, connector, *, date_from, **kwargs):
+        if date_from == self.fail_from:
+            raise ValueError("Remaris report did not return download URL.")
+        tmp = tempfile.NamedTemporaryFile(delete=False, suffix=".xls")
+        tmp.close()
+        path = Path(tmp.name)
+        self.reports[path] = [_invoice(date_from.toordinal(), date_from)]
+        return path
+
+    def _backfill(self):
+        with mock.patch("sales.backfill._download_report_excel", side_effect=self._download), mock.patch(
+            "sales.backfill._parse_sales_report", side_effect=lambda path: self.reports[path]
+        ):
+            result = backfill_sales_invoices(
+                date_from=date(2026, 1, 1),
+                date_to=date(2026, 1, 10),
+                organization_id=2,
+                location_id=5,
+                pos_id=6,
+                currency="EUR",
+                download_workers=2,
+                parse_workers=0,
+                connector=mock.Mock(),
+            )
+        self.assertFalse(any(path.exists() for path in self.reports))
+        return result
+
+    def test_split_date_range(self):
+        self.assertEqual(
+            split_date_range(date(2026, 1, 1), date(2026, 1, 10), 7),
+            [(date(2026, 1, 1), date(2026, 1, 7)), (date(2026, 1, 8), date(2026, 1, 10))],
+        )
+        with self.assertRaises(ValueError):
+            split_date_range(date(2026, 1, 2), date(2026, 1, 1), 1)
+
+    def test_failed_chunk_is_resumed(self):
+        self.fail_from = date(2026, 1, 8)
+        result = self._backfill()
+        self.assertEqual((result["chunks"], result["failed"], result["created"]), (2, 1, 1))
+        failed = SalesBackfillChunk.objects.get(status=SalesBackfillChunk.Status.FAILED)
+        self.assertEqual(failed.date_from, date(2026, 1, 8))
+        self.assertIn("download URL", failed.error)
+
+        self.fail_from = None
+        result = self._backfill()
+        self.assertEqual((result["chunks"], result["skipped"], result["failed"], result["created"]), (1, 1, 0, 1))
+        self.assertEqual(SalesInvoice.objects.count(), 2)
+        self.assertFalse(SalesBackfillChunk.objects.exclude(status=SalesBackfillChunk.Status.DONE).exists())
+
+    def test_chunk_claimed_by_another_run_is_left_alone(self):
+        SalesBackfillChunk.objects.create(
+            external_location_id=5,
+            external_pos_id=6,
+            date_from=date(2026, 1, 1),
+            date_to=date(2026, 1, 7),
+            status=SalesBackfillChunk.Status.RUNNING,
+        )
+        result = self._backfill()
+        self.assertEqual((result["chunks"], result["running"], result["created"]), (1, 1, 1))
+        self.assertEqual(
+            SalesBackfillChunk.objects.get(date_from=date(2026, 1, 1)).status, SalesBackfillChunk.Status.RUNNING
+        )
+
+        # Napusteni odsjecak (pad procesa) preuzima sljedece pokretanje.
+        SalesBackfillChunk.objects.filter(date_from=date(2026, 1, 1)).update(
+            updated_at=timezone.now() - timedelta(hours=2)
+        )
+        result = self._backfill()
+        self.assertEqual((result["chunks"], result["running"], result["created"]), (1, 0, 1))
+        self.assertFalse(SalesBackfillChunk.objects.exclude(status=SalesBackfillChunk.Status.DONE).exists())
@@ -0,0 +1,123 @@
+from datetime import date, datetime
+from decimal import Decimal
+
+from django.contrib.admin.sites import site
+from django.contrib.auth import get_user_model
+from django.forms.models import model_to_dict
+from django.test import RequestFactory, TestCase
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from accounting.models import Ledger
+from artikli.models import Artikl, DrinkCategory
+from pos.models import Pos
+from sales.admin import SalesInvoiceAdmin
+from sales.models import SalesDailyRollup, SalesInvoice, SalesInvoiceItem
+from sales.product_matching import learn_product_alias
+from sales.remaris_importer import SalesInvoiceRow, SalesItemRow, import_invoice_rows
+from sales.rollups import sales_rollup_range_totals, sales_rollup_totals
+from stock.models import WarehouseId
+
+
+def _invoice(rm_number: int, issued_on: date, lines: list[tuple[str, str, str]]) -> SalesInvoiceRow:
+    items = [SalesItemRow(name, Decimal(qty), Decimal(amount), None, None) for name, qty, amount in lines]
+    return SalesInvoiceRow(
+        rm_number=rm_number,
+        issued_on=issued_on,
+        issued_at=datetime(issued_on.year, issued_on.month, issued_on.day, 20, rm_number),
+        location_name="Caffe",
+        buyer_name="",
+        waiter_name="Ana",
+        total_amount=sum((item.amount for item in items), Decimal("0.00")),
+        currency="EUR",
+        items=items,
+    )
+
+
+class SalesDailyRollupTests(TestCase):
+    def setUp(self):
+        Ledger.objects.create(name="Mozart")
+        self.warehouse = WarehouseId.objects.create(rm_id=4, name="Sank", external_location_id=5)
+        self.pos = Pos.objects.create(external_pos_id=6, name="Kasa 1")
+        self.beer = DrinkCategory.objects.create(name="Pivo")
+        self.pivo = Artikl.objects.create(rm_id=10, name="Pivo", drink_category=self.beer)
+        self.day1 = date(2026, 4, 1)
+        self.day2 = date(2026, 4, 2)
+        self.invoices = [
+            _invoice(1, self.day1, [("Pivo", "2", "6.00"), ("Ozujsko", "1", "3.50")]),
+            _invoice(2, self.day1, [("Pivo", "1", "3.00")]),
+            _invoice(3, self.day2, [("Pivo", "3", "9.00")]),
+        ]
+
+    def _import(self):
+        return import_invoice_rows(self.invoices, organization_id=2, location_id=5, pos_id=6, currency="EUR")
+
+    def test_import_maintains_rollups(self):
+        self._import()
+        pivo_day1 = SalesDailyRollup.objects.get(date=self.day1, artikl=self.pivo)
+        self.assertEqual((pivo_day1.line_count, pivo_day1.quantity, pivo_day1.gross_amount), (2, Decimal("3"), Decimal("9.00")))
+        self.assertEqual(pivo_day1.drink_category, self.beer)
+        self.assertEqual(pivo_day1.net_amount + pivo_day1.vat_amount, Decimal("9.00"))
+        self.assertTrue(SalesDailyRollup.objects.filter(date=self.day1, artikl__isnull=True).exists())
+
+        self.invoices[2] = _invoice(3, self.day2, [("Pivo", "4", "12.00")])
+        self._import()
+        self.assertEqual(SalesDailyRollup.objects.get(date=self.day2).gross_amount, Decimal("12.00"))
+
+        totals = sales_rollup_range_totals({"d1": (self.day1, self.day1), "all": (self.day1, self.day2)})
+        self.assertEqual(totals["d1"]["gross_amount"], Decimal("12.50"))
+        self.assertEqual(totals["all"]["gross_amount"], Decimal("24.50"))
+
+    def test_learned_alias_moves_rollup_to_artikl(self):
+        self._import()
+        learn_product_alias("Ozujsko", self.pivo.id)
+        self.assertFalse(SalesDailyRollup.objects.filter(artikl__isnull=True).exists())
+        rows = sales_rollup_totals(date_from=self.day1, date_to=self.day2, group_by="drink_category")
+        self.assertEqual(rows[0]["drink_category_id"], self.beer.id)
+        self.assertEqual(rows[0]["line_count"], SalesInvoiceItem.objects.count())
+
+    def test_rollup_api(self):
+        self._import()
+        client = APIClient()
+        client.force_authenticate(get_user_model().objects.create_user(username="sef", password="x"))
+        url = reverse("api-sales-rollup")
+
+        response = client.get(url, {"date_from": "2026-04-01", "date_to": "2026-04-30", "group_by": "date"})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([row["date"] for row in response.data["rows"]], [self.day1, self.day2])
+
+        response = client.get(url, {"date_from": "2026-04-01", "date_to": "2026-04-30", "group_by": "waiter"})
+        self.assertEqual(response.status_code, 400)
+
+    def test_drink_category_change_updates_rollups(self):
+        self._import()
+        wine = DrinkCategory.objects.create(name="Vino")
+        pivo = Artikl.objects.get(pk=self.pivo.pk)
+        pivo.drink_category = wine
+        pivo.save()
+        self.assertEqual(
+            set(SalesDailyRollup.objects.filter(artikl=self.pivo).values_list("drink_category_id", flat=True)),
+            {wine.id},
+        )
+
+    def test_admin_invoice_delete_and_edit_refresh_rollups(self):
+        self._import()
+        user = get_user_model().objects.create_superuser(username="admin", password="x", email="a@example.com")
+        self.client.force_login(user)
+        invoice = SalesInvoice.objects.get(rm_number=2)
+        response = self.client.post(reverse("admin:sales_salesinvoice_delete", args=[invoice.id]), {"post": "yes"})
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(SalesDailyRollup.objects.get(date=self.day1, artikl=self.pivo).gross_amount, Decimal("6.00"))
+
+        other = WarehouseId.objects.create(rm_id=7, name="Terasa")
+        invoice = SalesInvoice.objects.get(rm_number=3)
+        request = RequestFactory().post("/")
+        request.user = user
+        admin = SalesInvoiceAdmin(SalesInvoice, site)
+        form = admin.get_form(request, invoice, change=True)(
+            {**model_to_dict(invoice), "warehouse": other.pk, "issued_on": "", "issued_at": ""},
+            instance=invoice,
+        )
+        self.assertTrue(form.is_valid(), form.errors)
+        admin.save_model(request, form.save(commit=False), form, change=True)
+        self.assertEqual(SalesDailyRollup.objects.get(date=self.day2).warehouse_id, other.pk)
@@ -0,0 +1,97 @@
+from datetime import date, datetime, timedelta
+from decimal import Decimal, ROUND_HALF_UP
+
+from django.test import TestCase
+from django.utils import timezone
+
+from accounting.models import Ledger
+from artikli.models import Artikl
+from configuration.models import CompanyProfile, ConsumptionTaxCategory, LocalGovernmentUnit, TaxGroup
+from pos.models import Pos
+from sales.models import SalesInvoice, SalesInvoiceItem, SalesZPosting
+from sales.services import get_sales_z_summaries, get_sales_z_summary
+from stock.models import WarehouseId
+
+
+class SalesZSummaryTests(TestCase):
+    def setUp(self):
+        lgu = LocalGovernmentUnit.objects.create(name="Zagreb", pnp_rate=Decimal("0.0300"))
+        self.ledger = Ledger.objects.create(
+            name="Mozart",
+            company_profile=CompanyProfile.objects.create(name="Mozart d.o.o.", lgu=lgu),
+        )
+        self.warehouse = WarehouseId.objects.create(rm_id=4, name="Sank", external_location_id=5)
+        self.pos = Pos.objects.create(external_pos_id=6, name="Kasa 1")
+        pnp = ConsumptionTaxCategory.objects.create(code="PNP", name="Alkohol")
+        self.pivo = Artikl.objects.create(
+            rm_id=10, name="Pivo", pnp_category=pnp, tax_group=TaxGroup.objects.create(name="PDV 25", rate=Decimal("0.25"))
+        )
+        self.vino = Artikl.objects.create(
+            rm_id=11, name="Vino", pnp_category=pnp, tax_group=TaxGroup.objects.create(name="PDV 13", rate=Decimal("0.13"))
+        )
+        self.kava = Artikl.objects.create(rm_id=12, name="Kava")
+        self.start = date(2026, 3, 1)
+        rm_number = 0
+        for day in range(3):
+            for amounts in ((Decimal("3.33"), Decimal("7.77"), Decimal("2.10")), (Decimal("4.01"), Decimal("0.99"), Decimal("1.50"))):
+                rm_number += 1
+                issued_on = self.start + timedelta(days=day)
+                invoice = SalesInvoice.objects.create(
+                    rm_number=rm_number,
+                    issued_on=issued_on,
+                    issued_at=timezone.make_aware(datetime(2026, 3, 1 + day, 20, rm_number)),
+                    ledger=self.ledger,
+                    warehouse=self.warehouse,
+                    pos=self.pos,
+                    net_amount=Decimal("10.00"),
+                    vat_amount=Decimal("2.50"),
+                    total_amount=sum(amounts),
+                )
+                for artikl, amount in zip((self.pivo, self.vino, self.kava), amounts):
+                    SalesInvoiceItem.objects.create(
+                        invoice=invoice, artikl=artikl, product_name=artikl.name, quantity=1, amount=amount
+                    )
+
+    def _per_item_pnp(self, issued_on) -> Decimal:
+        total = Decimal("0.00")
+        for item in SalesInvoiceItem.objects.filter(invoice__issued_on=issued_on, artikl__pnp_category__isnull=False):
+            net = Decimal(str(item.amount)) / (Decimal("1.00") + Decimal(str(item.artikl.tax_group.rate)))
+            total += net * Decimal("0.0300")
+        return total.quantize(Decimal("0.01"), rounding=ROUND_HALF_UP)
+
+    def test_pnp_matches_per_item_computation(self):
+        summary = get_sales_z_summary(issued_on=self.start, warehouse_id=self.warehouse.id, pos_id=self.pos.id)
+        self.assertEqual(summary["pnp_amount"], self._per_item_pnp(self.start))
+        self.assertEqual(summary["net_amount"], Decimal("20.00"))
+        self.assertTrue(summary["has_invoices"])
+
+    def test_month_summaries_use_constant_queries(self):
+        SalesZPosting.objects.create(
+            issued_on=self.start, ledger=self.ledger, warehouse=self.warehouse, pos=self.pos, total_amount=Decimal("1.00")
+        )
+        with self.assertNumQueries(4):
+            summaries = get_sales_z_summaries(date_from=self.start, date_to=self.start + timedelta(days=30))
+        self.assertEqual([s["issued_on"] for s in summaries], [self.start + timedelta(days=d) for d in range(3)])
+        self.assertEqual([s["already_posted"] for s in summaries], [True, False, False])
+        for summary in summaries:
+            self.assertEqual(summary["pnp_amount"], self._per_item_pnp(summary["issued_on"]))
+            self.assertIsNone(summary["pnp_error"])
+
+    def test_missing_tax_group_is_reported(self):
+        self.vino.tax_group = None
+        self.vino.save()
+        summaries = get_sales_z_summaries(date_from=self.start, date_to=self.start)
+        self.assertIsNone(summaries[0]["pnp_amount"])
+        self.assertIn("Vino", summaries[0]["pnp_error"])
+        with self.assertRaisesMessage(ValueError, "Vino"):
+            get_sales_z_summary(issued_on=self.start, warehouse_id=self.warehouse.id, pos_id=self.pos.id)
+
+    def test_none_warehouse_means_invoices_without_warehouse(self):
+        summary = get_sales_z_summary(issued_on=self.start, warehouse_id=None, pos_id=self.pos.id)
+        self.assertFalse(summary["has_invoices"])
+        self.assertEqual(summary["total_amount"], Decimal("0.00"))
+
+        SalesInvoice.objects.filter(rm_number=1).update(warehouse=None)
+        summary = get_sales_z_summary(issued_on=self.start, warehouse_id=None, pos_id=self.pos.id)
+        self.assertTrue(summary["has_invoices"])
+        self.assertEqual(summary["total_amount"], Decimal("13.20"))
@@ -13,7 +13,6 @@ from django.urls import path, reverse
 from django.utils import timezone
 
 from artikli.remaris_connector import RemarisConnector
-from artikli.models import Artikl
 from stock.models import (
     Inventory,
     InventoryItem,
@@ -21,8 +20,10 @@ from stock.models import (
     ReplenishRequestLine,
     StockAllocation,
     StockAccountingConfig,
+    StockBalance,
     StockCostSnapshot,
     StockLot,
+    StockLotArchive,
     StockMove,
     StockMoveLine,
     WarehouseId,
@@ -30,14 +31,17 @@ from stock.models import (
     WarehouseTransfer,
     WarehouseTransferItem,
 )
-from stock.services import post_stock_transfer, replenish_to_sale_warehouse, refresh_internal_warehouse_stock
+from stock.remaris_sync import sync_warehouse_stock
+from stock.services import (
+    post_stock_transfer,
+    receive_stock_lots,
+    replenish_to_sale_warehouse,
+    refresh_internal_warehouse_stock,
+)
 
 
 @admin.action(description="Import stanje skladišta from Remaris", permissions=["change"])
 def import_warehouse_stock(modeladmin, request, queryset):
-    connector = RemarisConnector()
-    connector.login()
-
     warehouse_ids = list(
         queryset.values_list("warehouse_id_id", flat=True).distinct()
     )
@@ -50,62 +54,10 @@ def import_warehouse_stock(modeladmin, request, queryset):
         )
         return
 
-    created = 0
-    updated = 0
-    skipped = 0
-
-    with transaction.atomic():
-        for warehouse_id in warehouse_ids:
-            payload = {
-                "dataSource": "warehouseStockDS",
-                "operationType": "fetch",
-                "startRow": 0,
-                "endRow": 10001,
-                "textMatchStyle": "exact",
-                "componentId": "warehouseStockGrid",
-                "oldValues": None,
-                "data": {
-                    "warehouseId": warehouse_id,
-                    "allBaseGroups": True,
-                    "showFilter": 20,
-                    "request": "?_3403.578121292664",
-                },
-            }
-
-            response = connector.post_json(
-                "WarehouseStock/GetGridData?isc_dataFormat=json",
-                payload,
-                referer_path="/WarehouseStock",
-            )
-
-            data = response.get("response", {}).get("data", [])
-
-            for item in data:
-                wh_id = item.get("id")
-                if wh_id is None:
-                    skipped += 1
-                    continue
-
-                row = WarehouseStock.objects.filter(wh_id=wh_id).first()
-                if not row:
-                    skipped += 1
-                    continue
-
-                product_code = item.get("productCode", "")
-                product = None
-                if product_code:
-                    product = Artikl.objects.filter(code=product_code).first()
-
-                row.warehouse_id_id = warehouse_id
-                row.product = product
-                row.product_name = item.get("productName", "")
-                row.product_code = product_code
-                row.unit = item.get("unit", "")
-                row.quantity = item.get("quantity", 0)
-                row.base_group_name = item.get("baseGroupName", "")
-                row.active = bool(item.get("active", False))
-                row.save()
-                updated += 1
+    created, updated, skipped = sync_warehouse_stock(
+        warehouse_ids=warehouse_ids,
+        existing_only=True,
+    )
 
     modeladmin.message_user(
         request,
@@ -115,9 +67,6 @@ def import_warehouse_stock(modeladmin, request, queryset):
 
 
 def _import_warehouse_stock_for_warehouses(modeladmin, request, queryset):
-    connector = RemarisConnector()
-    connector.login()
-
     warehouses = list(queryset)
     if not warehouses:
         modeladmin.message_user(
@@ -127,67 +76,10 @@ def _import_warehouse_stock_for_warehouses(modeladmin, request, queryset):
         )
         return False
 
-    created = 0
-    updated = 0
-    skipped = 0
-
     try:
-        with transaction.atomic():
-            for warehouse in warehouses:
-                payload = {
-                    "dataSource": "warehouseStockDS",
-                    "operationType": "fetch",
-                    "startRow": 0,
-                    "endRow": 10001,
-                    "textMatchStyle": "exact",
-                    "componentId": "warehouseStockGrid",
-                    "oldValues": None,
-                    "data": {
-                        "warehouseId": warehouse.rm_id,
-                        "allBaseGroups": True,
-                        "showFilter": 20,
-                        "request": "?_3403.578121292664",
-                    },
-                }
-
-                response = connector.post_json(
-                    "WarehouseStock/GetGridData?isc_dataFormat=json",
-                    payload,
-                    referer_path="/WarehouseStock",
-                )
-
-                data = response.get("response", {}).get("data", [])
-
-                for item in data:
-                    wh_id = item.get("id")
-                    if wh_id is None:
-                        skipped += 1
-                        continue
-
-                    product_code = item.get("productCode", "")
-                    product = None
-                    if product_code:
-                        product = Artikl.objects.filter(code=product_code).first()
-
-                    defaults = {
-                        "warehouse_id_id": warehouse.rm_id,
-                        "product": product,
-                        "product_name": item.get("productName", ""),
-                        "product_code": product_code,
-                        "unit": item.get("unit", ""),
-                        "quantity": item.get("quantity", 0),
-                        "base_group_name": item.get("baseGroupName", ""),
-                        "active": bool(item.get("active", False)),
-                    }
-
-                    _, was_created = WarehouseStock.objects.update_or_create(
-                        wh_id=wh_id,
-                        defaults=defaults,
-                    )
-                    if was_created:
-                        created += 1
-                    else:
-                        updated += 1
+        created, updated, skipped = sync_warehouse_stock(
+            warehouse_ids=[warehouse.rm_id for warehouse in warehouses],
+        )
     except requests.RequestException as exc:
         status_code = None
         response_text = None
@@ -707,13 +599,17 @@ def create_transfer_for_inventory_shortage(modeladmin, request, queryset):
                         quantity=qty,
                         unit_cost=unit_cost,
                     )
-                    StockLot.objects.create(
-                        warehouse=inventory.warehouse,
-                        artikl=item.artikl,
-                        received_at=inventory.date,
-                        unit_cost=unit_cost,
-                        qty_in=qty,
-                        qty_remaining=qty,
+                    receive_stock_lots(
+                        [
+                            StockLot(
+                                warehouse=inventory.warehouse,
+                                artikl=item.artikl,
+                                received_at=inventory.date,
+                                unit_cost=unit_cost,
+                                qty_in=qty,
+                                qty_remaining=qty,
+                            )
+                        ]
                     )
                     overage_items_created += 1
 
@@ -1016,13 +912,17 @@ class WarehouseTransferAdmin(admin.ModelAdmin):
                             quantity=item["quantity"],
                             unit_cost=unit_cost,
                         )
-                        StockLot.objects.create(
-                            warehouse=transfer.to_warehouse,
-                            artikl=item["artikl"],
-                            received_at=transfer.date,
-                            unit_cost=unit_cost,
-                            qty_in=item["quantity"],
-                            qty_remaining=item["quantity"],
+                        receive_stock_lots(
+                            [
+                                StockLot(
+                                    warehouse=transfer.to_warehouse,
+                                    artikl=item["artikl"],
+                                    received_at=transfer.date,
+                                    unit_cost=unit_cost,
+                                    qty_in=item["quantity"],
+                                    qty_remaining=item["quantity"],
+                                )
+                            ]
                         )
                 else:
                     post_stock_transfer(
@@ -1133,7 +1033,29 @@ class StockAllocationAdmin(admin.ModelAdmin):
     list_display = ("id", "move_line", "lot", "qty", "unit_cost")
     list_filter = ("lot__warehouse", "lot__artikl")
     search_fields = ("lot__artikl__name", "lot__artikl__code")
-    raw_id_fields = ("move_line", "lot")
+    raw_id_fields = ("move_line", "lot", "archived_lot")
+
+
+@admin.register(StockLotArchive)
+class StockLotArchiveAdmin(admin.ModelAdmin):
+    list_display = ("id", "warehouse", "artikl", "received_at", "unit_cost", "qty_in", "archived_at")
+    list_filter = ("warehouse",)
+    search_fields = ("artikl__name", "artikl__code")
+    raw_id_fields = ("source_item",)
+
+    def has_add_permission(self, request):
+        return False
+
+
+@admin.register(StockBalance)
+class StockBalanceAdmin(admin.ModelAdmin):
+    list_display = ("id", "warehouse", "artikl", "on_hand", "reserved", "value", "updated_at")
+    list_filter = ("warehouse",)
+    search_fields = ("artikl__name", "artikl__code")
+    readonly_fields = ("warehouse", "artikl", "on_hand", "reserved", "value", "updated_at")
+
+    def has_add_permission(self, request):
+        return False
 
 
 @admin.register(StockAccountingConfig)
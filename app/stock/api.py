@@ -1,15 +1,13 @@
 import requests
 
-from django.db import transaction
 from rest_framework import generics, serializers
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 from rest_framework.views import APIView
 
 from artikli.models import Artikl, UnitOfMeasureData
-from artikli.remaris_connector import RemarisConnector
 from stock.models import Inventory, InventoryItem, WarehouseId
-from stock.models import WarehouseStock
+from stock.remaris_sync import sync_warehouse_stock
 
 
 class InventorySerializer(serializers.ModelSerializer):
@@ -109,70 +107,10 @@ class WarehouseStockSyncView(APIView):
                 status=400,
             )
 
-        connector = RemarisConnector()
-        connector.login()
-
-        created = 0
-        updated = 0
-        skipped = 0
-
         try:
-            with transaction.atomic():
-                for warehouse in warehouses:
-                    payload = {
-                        "dataSource": "warehouseStockDS",
-                        "operationType": "fetch",
-                        "startRow": 0,
-                        "endRow": 10001,
-                        "textMatchStyle": "exact",
-                        "componentId": "warehouseStockGrid",
-                        "oldValues": None,
-                        "data": {
-                            "warehouseId": warehouse.rm_id,
-                            "allBaseGroups": True,
-                            "showFilter": 20,
-                            "request": "?_3403.578121292664",
-                        },
-                    }
-
-                    response = connector.post_json(
-                        "WarehouseStock/GetGridData?isc_dataFormat=json",
-                        payload,
-                        referer_path="/WarehouseStock",
-                    )
-
-                    data = response.get("response", {}).get("data", [])
-
-                    for item in data:
-                        wh_id = item.get("id")
-                        if wh_id is None:
-                            skipped += 1
-                            continue
-
-                        product_code = item.get("productCode", "")
-                        product = None
-                        if product_code:
-                            product = Artikl.objects.filter(code=product_code).first()
-
-                        defaults = {
-                            "warehouse_id_id": warehouse.rm_id,
-                            "product": product,
-                            "product_name": item.get("productName", ""),
-                            "product_code": product_code,
-                            "unit": item.get("unit", ""),
-                            "quantity": item.get("quantity", 0),
-                            "base_group_name": item.get("baseGroupName", ""),
-                            "active": bool(item.get("active", False)),
-                        }
-
-                        _, was_created = WarehouseStock.objects.update_or_create(
-                            wh_id=wh_id,
-                            defaults=defaults,
-                        )
-                        if was_created:
-                            created += 1
-                        else:
-                            updated += 1
+            created, updated, skipped = sync_warehouse_stock(
+                warehouse_ids=[warehouse.rm_id for warehouse in warehouses],
+            )
         except requests.RequestException as exc:
             status_code = None
             response_text = None
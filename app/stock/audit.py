@@ -0,0 +1,85 @@
+"""
+Audit zapisi za bulk_create/bulk_update. Bulk operacije ne salju signale pa
+ih auditlog sam ne biljezi; ovdje se zapisi stvaraju jednim bulk_create-om,
+s istim akterom i correlation id-em kao i zapisi iz signala.
+"""
+
+from auditlog.cid import get_cid
+from auditlog.context import auditlog_disabled
+from auditlog.models import LogEntry
+from auditlog.registry import auditlog
+from django.contrib.contenttypes.models import ContentType
+from django.db.models.signals import pre_save
+from django.utils.encoding import smart_str
+
+
+def _log(model, rows: list[tuple[object, dict]], action: int) -> None:
+    if not rows or auditlog_disabled.get() or not auditlog.contains(model):
+        return
+    content_type = ContentType.objects.get_for_model(model)
+    cid = get_cid()
+    # object_repr bez __str__ modela, da se relacije ne ucitavaju po retku.
+    label = smart_str(model._meta.verbose_name)
+    entries = [
+        LogEntry(
+            content_type=content_type,
+            object_pk=str(instance.pk),
+            object_id=instance.pk,
+            object_repr=f"{label} #{instance.pk}",
+            action=action,
+            changes=changes,
+            changes_text="",
+            cid=cid,
+        )
+        for instance, changes in rows
+    ]
+    # Akter i adresa dolaze iz auditlog set_actor konteksta preko pre_save
+    # signala, kao i za pojedinacno spremljene zapise.
+    for entry in entries:
+        pre_save.send(sender=LogEntry, instance=entry, raw=False, using="default", update_fields=None)
+    LogEntry.objects.bulk_create(entries)
+
+
+def log_bulk_create(instances) -> None:
+    """Biljezi CREATE za objekte spremljene preko bulk_create (pk mora biti postavljen)."""
+    instances = list(instances)
+    if not instances:
+        return
+    model = type(instances[0])
+    fields = [field for field in model._meta.concrete_fields if not field.primary_key]
+    _log(
+        model,
+        [
+            (
+                instance,
+                {
+                    field.name: ["None", smart_str(getattr(instance, field.attname))]
+                    for field in fields
+                    if getattr(instance, field.attname) is not None
+                },
+            )
+            for instance in instances
+        ],
+        LogEntry.Action.CREATE,
+    )
+
+
+def log_bulk_update(instances, old_values: dict, fields: list[str]) -> None:
+    """
+    Biljezi UPDATE za objekte spremljene preko bulk_update; old_values je
+    {pk: {polje: stara vrijednost}}. Nepromijenjena polja se ne biljeze.
+    """
+    instances = list(instances)
+    if not instances:
+        return
+    rows = []
+    for instance in instances:
+        old = old_values.get(instance.pk, {})
+        changes = {
+            name: [smart_str(old[name]), smart_str(getattr(instance, name))]
+            for name in fields
+            if name in old and old[name] != getattr(instance, name)
+        }
+        if changes:
+            rows.append((instance, changes))
+    _log(type(instances[0]), rows, LogEntry.Action.UPDATE)
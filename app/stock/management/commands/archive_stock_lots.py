@@ -0,0 +1,26 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from stock.services import archive_exhausted_lots
+
+
+class Command(BaseCommand):
+    help = "Move exhausted StockLot rows older than the horizon into StockLotArchive."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--days",
+            type=int,
+            default=None,
+            help=f"Horizont u danima (default: STOCK_LOT_ARCHIVE_AFTER_DAYS={settings.STOCK_LOT_ARCHIVE_AFTER_DAYS}).",
+        )
+        parser.add_argument("--batch-size", type=int, default=5000, help="Broj slojeva po transakciji.")
+        parser.add_argument("--max-batches", type=int, default=None, help="Najveci broj serija.")
+
+    def handle(self, *args, **options):
+        archived = archive_exhausted_lots(
+            older_than_days=options["days"],
+            batch_size=options["batch_size"],
+            max_batches=options["max_batches"],
+        )
+        self.stdout.write(f"Archive complete. archived={archived}")
@@ -0,0 +1,42 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from stock.models import WarehouseId
+from stock.services import rebuild_stock_balances
+
+
+class Command(BaseCommand):
+    help = "Rebuild StockBalance rows from FIFO lots and open reservations."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--warehouse", type=int, help="Warehouse rm_id (default: sva skladista).")
+        parser.add_argument(
+            "--check",
+            action="store_true",
+            help="Samo prijavi odstupanja, bez ispravka.",
+        )
+
+    def handle(self, *args, **options):
+        warehouse_ids = None
+        warehouse_rm_id = options.get("warehouse")
+        if warehouse_rm_id is not None:
+            if not WarehouseId.objects.filter(rm_id=warehouse_rm_id).exists():
+                raise CommandError(f"Skladiste {warehouse_rm_id} ne postoji.")
+            warehouse_ids = [warehouse_rm_id]
+
+        check_only = options["check"]
+        drift = rebuild_stock_balances(warehouse_ids=warehouse_ids, fix=not check_only)
+        for row in drift:
+            self.stdout.write(
+                f"{row['warehouse_id']}/{row['artikl_id']}: "
+                f"stanje {row['on_hand_actual']} -> {row['on_hand_expected']}, "
+                f"rezervirano {row['reserved_actual']} -> {row['reserved_expected']}, "
+                f"vrijednost {row['value_actual']} -> {row['value_expected']}"
+            )
+
+        self.stdout.write(
+            "Rebuild complete. drift={drift} fixed={fixed}".format(
+                drift=len(drift), fixed=0 if check_only else len(drift)
+            )
+        )
+        if check_only and drift:
+            raise CommandError("StockBalance nije uskladen s FIFO slojevima.")
@@ -0,0 +1,70 @@
+# Generated by Django 5.2.18 on 2026-10-17 12:46
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import DecimalField, ExpressionWrapper, F, Sum
+
+
+def populate_balances(apps, schema_editor):
+    StockBalance = apps.get_model("stock", "StockBalance")
+    StockLot = apps.get_model("stock", "StockLot")
+    StockReservation = apps.get_model("stock", "StockReservation")
+
+    balances = {}
+    lot_rows = (
+        StockLot.objects.filter(warehouse_id__isnull=False, artikl_id__isnull=False, qty_remaining__gt=0)
+        .values("warehouse_id", "artikl_id")
+        .annotate(
+            qty=Sum("qty_remaining"),
+            value=Sum(
+                ExpressionWrapper(
+                    F("qty_remaining") * F("unit_cost"),
+                    output_field=DecimalField(max_digits=22, decimal_places=8),
+                )
+            ),
+        )
+    )
+    for row in lot_rows:
+        key = (row["warehouse_id"], row["artikl_id"])
+        balances[key] = StockBalance(
+            warehouse_id=key[0], artikl_id=key[1], on_hand=row["qty"] or 0, value=row["value"] or 0
+        )
+    reserved_rows = (
+        StockReservation.objects.filter(warehouse_id__isnull=False, artikl_id__isnull=False, released_at__isnull=True)
+        .values("warehouse_id", "artikl_id")
+        .annotate(qty=Sum("quantity"))
+    )
+    for row in reserved_rows:
+        key = (row["warehouse_id"], row["artikl_id"])
+        balance = balances.setdefault(key, StockBalance(warehouse_id=key[0], artikl_id=key[1]))
+        balance.reserved = row["qty"] or 0
+    StockBalance.objects.bulk_create(balances.values(), batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('artikli', '0025_alter_drinkcategory_options_and_more'),
+        ('stock', '0036_stockcostsnapshot'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StockBalance',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('on_hand', models.DecimalField(decimal_places=4, default=0, max_digits=14, verbose_name='Stanje')),
+                ('reserved', models.DecimalField(decimal_places=4, default=0, max_digits=14, verbose_name='Rezervirano')),
+                ('value', models.DecimalField(decimal_places=8, default=0, max_digits=22, verbose_name='Vrijednost')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Azurirano')),
+                ('artikl', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='stock_balances', to='artikli.artikl', to_field='rm_id', verbose_name='Artikl')),
+                ('warehouse', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='stock_balances', to='stock.warehouseid', to_field='rm_id', verbose_name='Skladiste')),
+            ],
+            options={
+                'verbose_name': 'Stanje zalihe (interno)',
+                'verbose_name_plural': 'Stanja zaliha (interno)',
+                'constraints': [models.UniqueConstraint(fields=('warehouse', 'artikl'), name='uniq_stock_balance')],
+            },
+        ),
+        migrations.RunPython(populate_balances, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 5.2.18 on 2026-10-17 12:49
+
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    atomic = False
+
+    dependencies = [
+        ('artikli', '0025_alter_drinkcategory_options_and_more'),
+        ('orders', '0024_warehouseinput_stock_move'),
+        ('stock', '0037_stockbalance'),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name='stockallocation',
+            index=models.Index(fields=['move_line', 'lot'], name='stock_alloc_line_lot_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='stocklot',
+            index=models.Index(condition=models.Q(('qty_remaining__gt', 0)), fields=['warehouse', 'artikl', 'received_at', 'id'], name='stock_lot_open_fifo_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='stockreservation',
+            index=models.Index(condition=models.Q(('released_at__isnull', True)), fields=['warehouse', 'artikl'], name='stock_res_open_idx'),
+        ),
+    ]
@@ -0,0 +1,44 @@
+# Generated by Django 5.2.18 on 2026-10-17 12:50
+
+import django.core.validators
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('artikli', '0025_alter_drinkcategory_options_and_more'),
+        ('orders', '0024_warehouseinput_stock_move'),
+        ('stock', '0038_fifo_indexes'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='stockallocation',
+            name='lot',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='allocations', to='stock.stocklot'),
+        ),
+        migrations.CreateModel(
+            name='StockLotArchive',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('received_at', models.DateTimeField()),
+                ('unit_cost', models.DecimalField(decimal_places=4, max_digits=12)),
+                ('qty_in', models.DecimalField(decimal_places=4, max_digits=12, validators=[django.core.validators.MinValueValidator(0)])),
+                ('archived_at', models.DateTimeField(verbose_name='Arhivirano')),
+                ('artikl', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='archived_stock_lots', to='artikli.artikl', to_field='rm_id')),
+                ('source_item', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='archived_stock_lots', to='orders.warehouseinputitem')),
+                ('warehouse', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='archived_stock_lots', to='stock.warehouseid', to_field='rm_id')),
+            ],
+            options={
+                'verbose_name': 'Arhivirani FIFO sloj',
+                'verbose_name_plural': 'Arhivirani FIFO slojevi',
+            },
+        ),
+        migrations.AddField(
+            model_name='stockallocation',
+            name='archived_lot',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='allocations', to='stock.stocklotarchive'),
+        ),
+    ]
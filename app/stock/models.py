@@ -367,6 +367,59 @@ class StockLot(models.Model):
     class Meta:
         verbose_name = "FIFO sloj"
         verbose_name_plural = "FIFO slojevi"
+        indexes = [
+            # FIFO skeniranje otvorenih slojeva: (skladiste, artikl, qty_remaining > 0)
+            # sortirano po (received_at, id).
+            models.Index(
+                fields=["warehouse", "artikl", "received_at", "id"],
+                condition=models.Q(qty_remaining__gt=0),
+                name="stock_lot_open_fifo_idx",
+            ),
+        ]
+
+
+class StockLotArchive(models.Model):
+    """
+    Potroseni FIFO slojevi (qty_remaining = 0) premjesteni iz StockLot.
+    Primarni kljuc je izvorni StockLot.id kako bi povijest alokacija ostala citljiva.
+    """
+    id = models.BigIntegerField(primary_key=True)
+    warehouse = models.ForeignKey(
+        "stock.WarehouseId",
+        to_field="rm_id",
+        null=True,
+        blank=True,
+        on_delete=models.SET_NULL,
+        related_name="archived_stock_lots",
+    )
+    artikl = models.ForeignKey(
+        "artikli.Artikl",
+        to_field="rm_id",
+        null=True,
+        blank=True,
+        on_delete=models.SET_NULL,
+        related_name="archived_stock_lots",
+    )
+    received_at = models.DateTimeField()
+    unit_cost = models.DecimalField(max_digits=12, decimal_places=4)
+    qty_in = models.DecimalField(max_digits=12, decimal_places=4, validators=[MinValueValidator(0)])
+    source_item = models.ForeignKey(
+        "orders.WarehouseInputItem",
+        null=True,
+        blank=True,
+        on_delete=models.SET_NULL,
+        related_name="archived_stock_lots",
+    )
+    archived_at = models.DateTimeField(verbose_name="Arhivirano")
+
+    def __str__(self) -> str:
+        name = self.artikl.name if self.artikl else "Artikl ?"
+        warehouse_name = self.warehouse.name if self.warehouse else "Skladiste ?"
+        return f"{name} @ {warehouse_name} (0/{self.qty_in}, arhiva)"
+
+    class Meta:
+        verbose_name = "Arhivirani FIFO sloj"
+        verbose_name_plural = "Arhivirani FIFO slojevi"
 
 
 class StockMove(models.Model):
@@ -487,18 +540,34 @@ class StockAllocation(models.Model):
     )
     lot = models.ForeignKey(
         "stock.StockLot",
+        null=True,
+        blank=True,
+        on_delete=models.PROTECT,
+        related_name="allocations",
+    )
+    archived_lot = models.ForeignKey(
+        "stock.StockLotArchive",
+        null=True,
+        blank=True,
         on_delete=models.PROTECT,
         related_name="allocations",
     )
     qty = models.DecimalField(max_digits=12, decimal_places=4, validators=[MinValueValidator(0)])
     unit_cost = models.DecimalField(max_digits=12, decimal_places=4)
 
+    @property
+    def source_lot(self):
+        return self.lot or self.archived_lot
+
     def __str__(self) -> str:
-        return f"{self.lot} -> {self.qty}"
+        return f"{self.source_lot} -> {self.qty}"
 
     class Meta:
         verbose_name = "FIFO alokacija"
         verbose_name_plural = "FIFO alokacije"
+        indexes = [
+            models.Index(fields=["move_line", "lot"], name="stock_alloc_line_lot_idx"),
+        ]
 
 
 class StockReservation(models.Model):
@@ -532,6 +601,57 @@ class StockReservation(models.Model):
     class Meta:
         verbose_name = "Rezervacija zalihe"
         verbose_name_plural = "Rezervacije zaliha"
+        indexes = [
+            models.Index(
+                fields=["warehouse", "artikl"],
+                condition=models.Q(released_at__isnull=True),
+                name="stock_res_open_idx",
+            ),
+        ]
+
+
+class StockBalance(models.Model):
+    """
+    Odrzavano stanje po (skladiste, artikl): zbroj otvorenih FIFO slojeva,
+    aktivnih rezervacija i vrijednosti zalihe. Azurira se u istoj transakciji
+    kao i slojevi/rezervacije (stock.services); rebuild_stock_balances
+    provjerava i ispravlja odstupanja.
+    """
+    warehouse = models.ForeignKey(
+        "stock.WarehouseId",
+        to_field="rm_id",
+        on_delete=models.CASCADE,
+        related_name="stock_balances",
+        verbose_name="Skladiste",
+    )
+    artikl = models.ForeignKey(
+        "artikli.Artikl",
+        to_field="rm_id",
+        on_delete=models.CASCADE,
+        related_name="stock_balances",
+        verbose_name="Artikl",
+    )
+    on_hand = models.DecimalField(max_digits=14, decimal_places=4, default=0, verbose_name="Stanje")
+    reserved = models.DecimalField(max_digits=14, decimal_places=4, default=0, verbose_name="Rezervirano")
+    value = models.DecimalField(max_digits=22, decimal_places=8, default=0, verbose_name="Vrijednost")
+    updated_at = models.DateTimeField(auto_now=True, verbose_name="Azurirano")
+
+    @property
+    def available(self):
+        return self.on_hand - self.reserved
+
+    def __str__(self) -> str:
+        return f"{self.warehouse_id}/{self.artikl_id}: {self.on_hand} (rez. {self.reserved})"
+
+    class Meta:
+        verbose_name = "Stanje zalihe (interno)"
+        verbose_name_plural = "Stanja zaliha (interno)"
+        constraints = [
+            models.UniqueConstraint(
+                fields=["warehouse", "artikl"],
+                name="uniq_stock_balance",
+            )
+        ]
 
 
 class StockAccountingConfig(models.Model):
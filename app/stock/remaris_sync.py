@@ -0,0 +1,221 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from decimal import Decimal, ROUND_HALF_UP
+from typing import Iterable, Iterator
+
+from django.conf import settings
+from django.db import transaction
+
+from artikli.models import Artikl
+from artikli.remaris_connector import RemarisConnector
+from stock.models import WarehouseStock
+
+FOURPLACES = Decimal("0.0001")
+SYNC_FIELDS = [
+    "warehouse_id",
+    "product",
+    "product_name",
+    "product_code",
+    "unit",
+    "quantity",
+    "base_group_name",
+    "active",
+]
+
+
+def fetch_warehouse_stock_rows(connector: RemarisConnector, warehouse_id: int) -> list[dict]:
+    payload = {
+        "dataSource": "warehouseStockDS",
+        "operationType": "fetch",
+        "startRow": 0,
+        "endRow": 10001,
+        "textMatchStyle": "exact",
+        "componentId": "warehouseStockGrid",
+        "oldValues": None,
+        "data": {
+            "warehouseId": warehouse_id,
+            "allBaseGroups": True,
+            "showFilter": 20,
+            "request": "?_3403.578121292664",
+        },
+    }
+
+    response = connector.post_json(
+        "WarehouseStock/GetGridData?isc_dataFormat=json",
+        payload,
+        referer_path="/WarehouseStock",
+    )
+    return response.get("response", {}).get("data", [])
+
+
+def iter_warehouse_stock_rows(
+    connector: RemarisConnector,
+    warehouse_ids: list[int],
+    *,
+    max_workers: int | None = None,
+) -> Iterator[tuple[int, list[dict]]]:
+    """
+    Dohvaca skladista paralelno (ogranicen broj dretvi) i vraca
+    (warehouse_id, rows) redom kojim odgovori stizu. Svaka dretva koristi
+    vlastitu kopiju konektora s dijeljenim auth cookiejima; dretve ne diraju bazu.
+    """
+    if max_workers is None:
+        max_workers = settings.REMARIS_SYNC_MAX_WORKERS
+    max_workers = max(1, min(max_workers, len(warehouse_ids)))
+    if max_workers == 1:
+        for warehouse_id in warehouse_ids:
+            yield warehouse_id, fetch_warehouse_stock_rows(connector, warehouse_id)
+        return
+
+    local = threading.local()
+
+    def fetch(warehouse_id):
+        worker = getattr(local, "connector", None)
+        if worker is None:
+            worker = local.connector = connector.fork()
+        return warehouse_id, fetch_warehouse_stock_rows(worker, warehouse_id)
+
+    pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="remaris-stock")
+    try:
+        futures = [pool.submit(fetch, warehouse_id) for warehouse_id in warehouse_ids]
+        for future in as_completed(futures):
+            yield future.result()
+    finally:
+        pool.shutdown(wait=True, cancel_futures=True)
+
+
+def load_artikl_ids_by_code(codes: Iterable[str] | None = None) -> dict[str, int]:
+    """
+    Mapa sifra artikla -> rm_id. Kod duplikata vrijedi artikl s najmanjim pk
+    (isto kao Artikl.objects.filter(code=...).first()).
+    """
+    artikli = Artikl.objects.exclude(code="").order_by("pk")
+    if codes is not None:
+        artikli = artikli.filter(code__in=set(codes))
+    artikl_ids: dict[str, int] = {}
+    for code, rm_id in artikli.values_list("code", "rm_id"):
+        artikl_ids.setdefault(code, rm_id)
+    return artikl_ids
+
+
+def _quantity(value) -> Decimal:
+    if value is None or value == "":
+        return Decimal("0.0000")
+    return Decimal(str(value)).quantize(FOURPLACES, rounding=ROUND_HALF_UP)
+
+
+def upsert_warehouse_stock_rows(
+    *,
+    warehouse_id: int,
+    items: list[dict],
+    artikl_ids_by_code: dict[str, int],
+    existing_only: bool = False,
+) -> tuple[int, int, int]:
+    """
+    Uskladjuje WarehouseStock redove jednog skladista s Remaris podacima.
+    Postojeci redovi se usporeduju u memoriji, a novi i promijenjeni se
+    spremaju jednim bulk upsertom po wh_id. Vraca (created, updated, skipped);
+    nepromijenjeni redovi se ne broje.
+    """
+    skipped = 0
+    incoming: dict[int, dict] = {}
+    for item in items:
+        wh_id = item.get("id")
+        if wh_id is None:
+            skipped += 1
+            continue
+        product_code = item.get("productCode", "") or ""
+        incoming[wh_id] = {
+            "warehouse_id": warehouse_id,
+            "product": artikl_ids_by_code.get(product_code) if product_code else None,
+            "product_name": item.get("productName", ""),
+            "product_code": product_code,
+            "unit": item.get("unit", ""),
+            "quantity": _quantity(item.get("quantity", 0)),
+            "base_group_name": item.get("baseGroupName", ""),
+            "active": bool(item.get("active", False)),
+        }
+
+    existing = {
+        row["wh_id"]: row
+        for row in WarehouseStock.objects.filter(wh_id__in=incoming.keys()).values("wh_id", *SYNC_FIELDS)
+    }
+
+    created = 0
+    updated = 0
+    to_write = []
+    for wh_id, values in incoming.items():
+        current = existing.get(wh_id)
+        if current is None:
+            if existing_only:
+                skipped += 1
+                continue
+            created += 1
+        else:
+            if current["quantity"] is not None:
+                current["quantity"] = _quantity(current["quantity"])
+            if all(current[field] == values[field] for field in SYNC_FIELDS):
+                continue
+            updated += 1
+        to_write.append(
+            WarehouseStock(
+                wh_id=wh_id,
+                warehouse_id_id=values["warehouse_id"],
+                product_id=values["product"],
+                product_name=values["product_name"],
+                product_code=values["product_code"],
+                unit=values["unit"],
+                quantity=values["quantity"],
+                base_group_name=values["base_group_name"],
+                active=values["active"],
+            )
+        )
+
+    if to_write:
+        WarehouseStock.objects.bulk_create(
+            to_write,
+            update_conflicts=True,
+            unique_fields=["wh_id"],
+            update_fields=SYNC_FIELDS,
+            batch_size=1000,
+        )
+    return created, updated, skipped
+
+
+def sync_warehouse_stock(
+    *,
+    warehouse_ids: Iterable[int],
+    connector: RemarisConnector | None = None,
+    product_code: str | None = None,
+    existing_only: bool = False,
+    max_workers: int | None = None,
+) -> tuple[int, int, int]:
+    """
+    Dohvaca stanje skladista iz Remarisa i upsertira WarehouseStock.
+    product_code ogranicava sync na jedan artikl; existing_only azurira samo
+    postojece redove. Odgovori se zapisuju cim stignu, sve u jednoj transakciji.
+    """
+    warehouse_ids = list(warehouse_ids)
+    if connector is None:
+        connector = RemarisConnector()
+        connector.login()
+
+    artikl_ids_by_code = load_artikl_ids_by_code([product_code] if product_code else None)
+
+    created = 0
+    updated = 0
+    skipped = 0
+    with transaction.atomic():
+        for warehouse_id, items in iter_warehouse_stock_rows(connector, warehouse_ids, max_workers=max_workers):
+            if product_code:
+                items = [item for item in items if item.get("productCode", "") == product_code]
+            c, u, s = upsert_warehouse_stock_rows(
+                warehouse_id=warehouse_id,
+                items=items,
+                artikl_ids_by_code=artikl_ids_by_code,
+                existing_only=existing_only,
+            )
+            created += c
+            updated += u
+            skipped += s
+    return created, updated, skipped
@@ -1,93 +1,93 @@
 import logging
-from datetime import datetime
+import operator
+from datetime import datetime, timedelta
 from decimal import Decimal, ROUND_HALF_UP
+from functools import reduce
 
+from django.conf import settings
+from django.core.cache import cache
 from django.core.exceptions import ValidationError
 from django.db import transaction
 from django.utils import timezone
-from django.db.models import DecimalField, F, Sum
+from django.db.models import DecimalField, F, Q, Sum
 from django.db.models.expressions import ExpressionWrapper
 
 from artikli.models import Artikl
-from accounting.services import _next_entry_number, get_single_ledger, post_sales_cash
-from accounting.models import JournalEntry, JournalItem
+from accounting.services import JournalLineSpec, _post_entry, get_single_ledger, post_sales_cash
+from accounting.models import JournalEntry
 from configuration.models import DocumentType
-from artikli.remaris_connector import RemarisConnector
 from orders.models import WarehouseInput
 from stock.models import (
     StockAllocation,
     StockAccountingConfig,
+    StockBalance,
     StockLot,
+    StockLotArchive,
     StockMove,
     StockMoveLine,
     StockReservation,
     WarehouseId,
     WarehouseStock,
 )
+from stock.audit import log_bulk_create, log_bulk_update
+from stock.remaris_sync import sync_warehouse_stock
 
 logger = logging.getLogger(__name__)
 FOURPLACES = Decimal("0.0001")
+EIGHTPLACES = Decimal("0.00000001")
 
 
 def refresh_warehouse_stock_for_product_code(product_code: str) -> None:
     if not product_code:
         return
 
-    connector = RemarisConnector()
-    connector.login()
-
     warehouse_ids = list(WarehouseId.objects.values_list("rm_id", flat=True))
     if not warehouse_ids:
         return
 
-    product = Artikl.objects.filter(code=product_code).first()
+    sync_warehouse_stock(warehouse_ids=warehouse_ids, product_code=product_code)
+    logger.info("Warehouse stock refreshed for product_code=%s", product_code)
 
-    with transaction.atomic():
-        for warehouse_id in warehouse_ids:
-            payload = {
-                "dataSource": "warehouseStockDS",
-                "operationType": "fetch",
-                "startRow": 0,
-                "endRow": 10001,
-                "textMatchStyle": "exact",
-                "componentId": "warehouseStockGrid",
-                "oldValues": None,
-                "data": {
-                    "warehouseId": warehouse_id,
-                    "allBaseGroups": True,
-                    "showFilter": 20,
-                    "request": "?_3403.578121292664",
-                },
-            }
 
-            response = connector.post_json(
-                "WarehouseStock/GetGridData?isc_dataFormat=json",
-                payload,
-                referer_path="/WarehouseStock",
-            )
+PRODUCT_STOCK_FRESH_KEY = "stock:product-stock-fresh:{code}"
+PRODUCT_STOCK_REFRESH_LOCK_KEY = "stock:product-stock-refresh:{code}"
+PRODUCT_STOCK_REFRESH_LOCK_TTL = 120
 
-            data = response.get("response", {}).get("data", [])
-            for item in data:
-                if item.get("productCode", "") != product_code:
-                    continue
-
-                wh_id = item.get("id")
-                if wh_id is None:
-                    continue
-
-                defaults = {
-                    "warehouse_id_id": warehouse_id,
-                    "product": product,
-                    "product_name": item.get("productName", ""),
-                    "product_code": product_code,
-                    "unit": item.get("unit", ""),
-                    "quantity": item.get("quantity", 0),
-                    "base_group_name": item.get("baseGroupName", ""),
-                    "active": bool(item.get("active", False)),
-                }
-                WarehouseStock.objects.update_or_create(wh_id=wh_id, defaults=defaults)
 
-    logger.info("Warehouse stock refreshed for product_code=%s", product_code)
+def mark_product_stock_fresh(product_code: str) -> None:
+    cache.set(
+        PRODUCT_STOCK_FRESH_KEY.format(code=product_code),
+        timezone.now().isoformat(),
+        timeout=settings.PRODUCT_STOCK_REFRESH_TTL,
+    )
+    cache.delete(PRODUCT_STOCK_REFRESH_LOCK_KEY.format(code=product_code))
+
+
+def request_product_stock_refresh(product_code: str) -> bool:
+    """
+    Stale-while-revalidate za stanje jednog artikla: ako stanje nije svjeze,
+    u pozadini (Celery) pokrece refresh_warehouse_stock_for_product_code.
+    cache.add sluzi kao single-flight lock, pa istovremeni zahtjevi za istu
+    sifru pokrecu samo jedan dohvat. Vraca True ako je refresh pokrenut.
+    """
+    if not product_code:
+        return False
+    if cache.get(PRODUCT_STOCK_FRESH_KEY.format(code=product_code)):
+        return False
+
+    lock_key = PRODUCT_STOCK_REFRESH_LOCK_KEY.format(code=product_code)
+    if not cache.add(lock_key, 1, timeout=PRODUCT_STOCK_REFRESH_LOCK_TTL):
+        return False
+
+    from stock.tasks import refresh_product_stock
+
+    try:
+        refresh_product_stock.delay(product_code)
+    except Exception:
+        cache.delete(lock_key)
+        logger.exception("Failed to enqueue warehouse stock refresh for %s", product_code)
+        return False
+    return True
 
 
 def _as_aware_datetime(value):
@@ -104,6 +104,96 @@ def _q4(value: Decimal) -> Decimal:
     return value.quantize(FOURPLACES, rounding=ROUND_HALF_UP)
 
 
+def _add_balance_delta(
+    deltas: dict,
+    warehouse_id,
+    artikl_id,
+    *,
+    on_hand: Decimal = Decimal("0"),
+    reserved: Decimal = Decimal("0"),
+    value: Decimal = Decimal("0"),
+) -> None:
+    if warehouse_id is None or artikl_id is None:
+        return
+    current = deltas.get((warehouse_id, artikl_id), (Decimal("0"), Decimal("0"), Decimal("0")))
+    deltas[(warehouse_id, artikl_id)] = (
+        current[0] + on_hand,
+        current[1] + reserved,
+        current[2] + value,
+    )
+
+
+def _lock_stock_balances(keys) -> dict[tuple[int, int], StockBalance]:
+    """
+    Zakljucava StockBalance redove tocno za zadane (skladiste, artikl)
+    parove, uvijek istim redoslijedom (manje cekanja izmedu nepovezanih knjizenja).
+    """
+    keys = sorted(set(keys))
+    if not keys:
+        return {}
+    pairs = reduce(
+        operator.or_,
+        (Q(warehouse_id=warehouse_id, artikl_id=artikl_id) for warehouse_id, artikl_id in keys),
+    )
+    balances = StockBalance.objects.select_for_update().filter(pairs).order_by("warehouse_id", "artikl_id")
+    return {(balance.warehouse_id, balance.artikl_id): balance for balance in balances}
+
+
+def _apply_balance_deltas(deltas: dict) -> None:
+    """
+    Primjenjuje promjene stanja/rezervacija/vrijednosti na StockBalance
+    redove u tekucoj transakciji (zakljucani redovi, jedan bulk_update).
+    """
+    if not deltas:
+        return
+    balances = _lock_stock_balances(deltas.keys())
+    missing = [key for key in deltas if key not in balances]
+    if missing:
+        StockBalance.objects.bulk_create(
+            [StockBalance(warehouse_id=warehouse_id, artikl_id=artikl_id) for warehouse_id, artikl_id in missing],
+            ignore_conflicts=True,
+        )
+        balances = _lock_stock_balances(deltas.keys())
+
+        log_bulk_create(balances[key] for key in missing if key in balances)
+
+    now = timezone.now()
+    old_values = {}
+    for key, (on_hand, reserved, value) in deltas.items():
+        balance = balances[key]
+        old_values[balance.pk] = {"on_hand": balance.on_hand, "reserved": balance.reserved, "value": balance.value}
+        balance.on_hand += on_hand
+        balance.reserved += reserved
+        balance.value += value
+        balance.updated_at = now
+    StockBalance.objects.bulk_update(list(balances.values()), ["on_hand", "reserved", "value", "updated_at"])
+    log_bulk_update(balances.values(), old_values, ["on_hand", "reserved", "value"])
+
+
+def receive_stock_lots(lots: list[StockLot]) -> list[StockLot]:
+    """
+    Sprema nove FIFO slojeve i u istoj transakciji povecava StockBalance.
+    Svi putevi koji stvaraju slojeve (primka, transfer, storno, visak
+    inventure) moraju ici preko ove funkcije.
+    """
+    if not lots:
+        return []
+    with transaction.atomic():
+        lots = StockLot.objects.bulk_create(lots)
+        log_bulk_create(lots)
+        deltas: dict = {}
+        for lot in lots:
+            _add_balance_delta(
+                deltas,
+                lot.warehouse_id,
+                lot.artikl_id,
+                on_hand=_q4(lot.qty_remaining),
+                value=_q4(lot.qty_remaining) * _q4(lot.unit_cost),
+            )
+        _apply_balance_deltas(deltas)
+    return lots
+
+
 @transaction.atomic
 def post_warehouse_input_to_stock(*, warehouse_input: WarehouseInput, warehouse=None) -> StockMove:
     if warehouse_input.stock_move_id:
@@ -130,6 +220,7 @@ def post_warehouse_input_to_stock(*, warehouse_input: WarehouseInput, warehouse=
         reference=f"Primka #{warehouse_input.id}",
     )
 
+    new_lots: list[StockLot] = []
     for it in items:
         qty = Decimal(str(it.quantity))
         if qty <= 0:
@@ -158,21 +249,134 @@ def post_warehouse_input_to_stock(*, warehouse_input: WarehouseInput, warehouse=
             source_item=it,
         )
 
-        StockLot.objects.create(
-            warehouse=warehouse,
-            artikl=it.artikl,
-            received_at=_as_aware_datetime(warehouse_input.date),
-            unit_cost=unit_cost,
-            qty_in=qty,
-            qty_remaining=qty,
-            source_item=it,
+        new_lots.append(
+            StockLot(
+                warehouse=warehouse,
+                artikl=it.artikl,
+                received_at=_as_aware_datetime(warehouse_input.date),
+                unit_cost=unit_cost,
+                qty_in=qty,
+                qty_remaining=qty,
+                source_item=it,
+            )
         )
 
+    receive_stock_lots(new_lots)
     warehouse_input.stock_move = move
     warehouse_input.save(update_fields=["stock_move"])
     return move
 
 
+def _normalize_stock_items(items) -> list[tuple[Artikl, Decimal]]:
+    normalized = []
+    for item in items:
+        artikl = item.get("artikl")
+        qty_raw = item.get("quantity")
+        if not artikl or qty_raw is None:
+            raise ValidationError("Stavka mora imati artikl i kolicinu.")
+
+        qty = Decimal(str(qty_raw))
+        if qty <= 0:
+            raise ValidationError("Kolicina mora biti > 0.")
+        normalized.append((artikl, qty))
+    return normalized
+
+
+def _lock_open_lots(*, warehouse, artikl_ids) -> dict[int, list[StockLot]]:
+    """
+    Zakljucava sve otvorene FIFO slojeve za (skladiste, artikli) jednim upitom.
+    Slojevi su grupirani po artiklu i sortirani FIFO redom.
+    """
+    lots_by_artikl: dict[int, list[StockLot]] = {artikl_id: [] for artikl_id in artikl_ids}
+    lots = (
+        StockLot.objects.select_for_update()
+        .filter(warehouse=warehouse, artikl_id__in=artikl_ids, qty_remaining__gt=0)
+        .only("id", "artikl", "qty_remaining", "unit_cost", "received_at")
+        .order_by("artikl_id", "received_at", "id")
+    )
+    for lot in lots:
+        lots_by_artikl[lot.artikl_id].append(lot)
+    return lots_by_artikl
+
+
+def _lock_reserved_quantities(*, warehouse, artikl_ids, exclude: StockReservation | None = None) -> dict[int, Decimal]:
+    balances = _lock_stock_balances((warehouse.rm_id, artikl_id) for artikl_id in artikl_ids)
+    reserved = {artikl_id: balance.reserved for (_, artikl_id), balance in balances.items()}
+    if (
+        exclude
+        and not exclude.released_at
+        and exclude.warehouse_id == warehouse.rm_id
+        and exclude.artikl_id in reserved
+    ):
+        reserved[exclude.artikl_id] -= exclude.quantity
+    return reserved
+
+
+def _consume_fifo(lots: list[StockLot], qty: Decimal) -> tuple[list[tuple[StockLot, Decimal]], Decimal]:
+    """
+    Skida kolicinu sa slojeva u memoriji (FIFO). Vraca (sloj, kolicina) parove
+    i ukupni trosak; spremanje slojeva radi pozivatelj (bulk_update).
+    """
+    remaining = qty
+    total_cost = Decimal("0.00")
+    takes: list[tuple[StockLot, Decimal]] = []
+
+    for lot in lots:
+        if remaining <= 0:
+            break
+        if lot.qty_remaining <= 0:
+            continue
+        take = min(remaining, lot.qty_remaining)
+        lot.qty_remaining = _q4(lot.qty_remaining - take)
+        takes.append((lot, _q4(take)))
+        total_cost += _q4(take) * lot.unit_cost
+        remaining -= take
+
+    if remaining > 0:
+        raise ValidationError("FIFO alokacija nije pokrila cijelu kolicinu.")
+    return takes, total_cost
+
+
+def _write_fifo_allocations(
+    *,
+    lines: list[StockMoveLine],
+    takes_by_line: list[list[tuple[StockLot, Decimal]]],
+) -> list[StockAllocation]:
+    lines = StockMoveLine.objects.bulk_create(lines)
+    log_bulk_create(lines)
+    allocations = [
+        StockAllocation(move_line=line, lot=lot, qty=take, unit_cost=lot.unit_cost)
+        for line, takes in zip(lines, takes_by_line)
+        for lot, take in takes
+    ]
+    StockAllocation.objects.bulk_create(allocations)
+    log_bulk_create(allocations)
+
+    touched = {}
+    old_values = {}
+    for takes in takes_by_line:
+        for lot, take in takes:
+            touched[lot.id] = lot
+            # _consume_fifo je vec skinuo kolicinu u memoriji; staro stanje za audit.
+            old = old_values.setdefault(lot.id, {"qty_remaining": lot.qty_remaining})
+            old["qty_remaining"] += take
+    StockLot.objects.bulk_update(list(touched.values()), ["qty_remaining"])
+    log_bulk_update(touched.values(), old_values, ["qty_remaining"])
+
+    deltas: dict = {}
+    for line, takes in zip(lines, takes_by_line):
+        for lot, take in takes:
+            _add_balance_delta(
+                deltas,
+                line.warehouse_id,
+                line.artikl_id,
+                on_hand=-take,
+                value=-(take * lot.unit_cost),
+            )
+    _apply_balance_deltas(deltas)
+    return allocations
+
+
 @transaction.atomic
 def post_stock_out(
     *,
@@ -193,6 +397,13 @@ def post_stock_out(
     if not items:
         raise ValidationError("Nema stavki za izlaz.")
 
+    normalized = _normalize_stock_items(items)
+    artikl_ids = {artikl.rm_id for artikl, _ in normalized}
+    lots_by_artikl = _lock_open_lots(warehouse=warehouse, artikl_ids=artikl_ids)
+    reserved_by_artikl = _lock_reserved_quantities(
+        warehouse=warehouse, artikl_ids=artikl_ids, exclude=reservation
+    )
+
     move_date = move_date or timezone.now()
     move = StockMove.objects.create(
         move_type=StockMove.MoveType.OUT,
@@ -202,32 +413,14 @@ def post_stock_out(
         purpose=purpose or "",
     )
 
-    for item in items:
-        artikl = item.get("artikl")
-        qty_raw = item.get("quantity")
-        if not artikl or qty_raw is None:
-            raise ValidationError("Stavka mora imati artikl i kolicinu.")
+    lines: list[StockMoveLine] = []
+    takes_by_line: list[list[tuple[StockLot, Decimal]]] = []
 
-        qty = Decimal(str(qty_raw))
-        if qty <= 0:
-            raise ValidationError("Kolicina mora biti > 0.")
-
-        on_hand = (
-            StockLot.objects.select_for_update()
-            .filter(warehouse=warehouse, artikl=artikl)
-            .aggregate(total=Sum("qty_remaining", default=Decimal("0.00")))
-        )["total"] or Decimal("0.00")
-        reserved_qs = StockReservation.objects.select_for_update().filter(
-            warehouse=warehouse, artikl=artikl, released_at__isnull=True
-        )
-        if reservation:
-            reserved_qs = reserved_qs.exclude(id=reservation.id)
-        reserved = (
-            reserved_qs.aggregate(total=Sum("quantity", default=Decimal("0.00")))["total"]
-            or Decimal("0.00")
-        )
-        available = on_hand - reserved
-        if available < qty:
+    for artikl, qty in normalized:
+        lots = lots_by_artikl.get(artikl.rm_id, [])
+        on_hand = sum((lot.qty_remaining for lot in lots), Decimal("0.00"))
+        reserved = reserved_by_artikl.get(artikl.rm_id, Decimal("0.00"))
+        if on_hand - reserved < qty:
             raise ValidationError("Nema dovoljno dostupne zalihe (stanje - rezervirano).")
 
         if reservation:
@@ -238,54 +431,26 @@ def post_stock_out(
             if reservation.quantity < qty:
                 raise ValidationError("Rezervacija nema dovoljnu kolicinu.")
 
-        lots = list(
-            StockLot.objects.select_for_update()
-            .filter(warehouse=warehouse, artikl=artikl, qty_remaining__gt=0)
-            .only("id", "qty_remaining", "unit_cost", "received_at")
-            .order_by("received_at", "id")
-        )
-        available = sum((lot.qty_remaining for lot in lots), Decimal("0.00"))
-        if available < qty:
+        if on_hand < qty:
             raise ValidationError("Nema dovoljno zalihe za FIFO izlaz.")
 
-        move_line = StockMoveLine.objects.create(
-            move=move,
-            warehouse=warehouse,
-            artikl=artikl,
-            quantity=qty,
-            unit_cost=None,
-        )
-
-        remaining = qty
-        total_cost = Decimal("0.00")
-
-        for lot in lots:
-            if remaining <= 0:
-                break
-            take = min(remaining, lot.qty_remaining)
-            lot.qty_remaining = _q4(lot.qty_remaining - take)
-            lot.save(update_fields=["qty_remaining"])
-
-            StockAllocation.objects.create(
-                move_line=move_line,
-                lot=lot,
-                qty=_q4(take),
-                unit_cost=lot.unit_cost,
+        takes, total_cost = _consume_fifo(lots, qty)
+        lines.append(
+            StockMoveLine(
+                move=move,
+                warehouse=warehouse,
+                artikl=artikl,
+                quantity=qty,
+                unit_cost=_q4(total_cost / qty) if qty else Decimal("0.0000"),
             )
-
-            total_cost += _q4(take) * lot.unit_cost
-            remaining -= take
-
-        if remaining > 0:
-            raise ValidationError("FIFO alokacija nije pokrila cijelu kolicinu.")
-
-        avg_cost = _q4(total_cost / qty) if qty else Decimal("0.0000")
-        move_line.unit_cost = avg_cost
-        move_line.save(update_fields=["unit_cost"])
+        )
+        takes_by_line.append(takes)
 
         if reservation:
             release_reservation(reservation=reservation)
 
+    _write_fifo_allocations(lines=lines, takes_by_line=takes_by_line)
+
     if auto_cogs and move.purpose == StockMove.Purpose.SALE:
         if not cogs_account or not inventory_account:
             cfg = get_stock_accounting_config()
@@ -318,6 +483,10 @@ def post_stock_transfer(
     if not items:
         raise ValidationError("Nema stavki za transfer.")
 
+    normalized = _normalize_stock_items(items)
+    artikl_ids = {artikl.rm_id for artikl, _ in normalized}
+    lots_by_artikl = _lock_open_lots(warehouse=from_warehouse, artikl_ids=artikl_ids)
+
     move_date = move_date or timezone.now()
     move = StockMove.objects.create(
         move_type=StockMove.MoveType.TRANSFER,
@@ -328,69 +497,41 @@ def post_stock_transfer(
         to_warehouse=to_warehouse,
     )
 
-    for item in items:
-        artikl = item.get("artikl")
-        qty_raw = item.get("quantity")
-        if not artikl or qty_raw is None:
-            raise ValidationError("Stavka mora imati artikl i kolicinu.")
-
-        qty = Decimal(str(qty_raw))
-        if qty <= 0:
-            raise ValidationError("Kolicina mora biti > 0.")
+    lines: list[StockMoveLine] = []
+    takes_by_line: list[list[tuple[StockLot, Decimal]]] = []
+    new_lots: list[StockLot] = []
 
-        lots = list(
-            StockLot.objects.select_for_update()
-            .filter(warehouse=from_warehouse, artikl=artikl, qty_remaining__gt=0)
-            .only("id", "qty_remaining", "unit_cost", "received_at")
-            .order_by("received_at", "id")
-        )
+    for artikl, qty in normalized:
+        lots = lots_by_artikl.get(artikl.rm_id, [])
         available = sum((lot.qty_remaining for lot in lots), Decimal("0.00"))
         if available < qty:
             raise ValidationError("Nema dovoljno zalihe za FIFO transfer.")
 
-        out_line = StockMoveLine.objects.create(
-            move=move,
-            warehouse=from_warehouse,
-            artikl=artikl,
-            quantity=qty,
-            unit_cost=None,
-        )
-
-        remaining = qty
-        total_cost = Decimal("0.00")
-
-        for lot in lots:
-            if remaining <= 0:
-                break
-            take = min(remaining, lot.qty_remaining)
-            lot.qty_remaining = _q4(lot.qty_remaining - take)
-            lot.save(update_fields=["qty_remaining"])
-
-            allocation = StockAllocation.objects.create(
-                move_line=out_line,
-                lot=lot,
-                qty=_q4(take),
-                unit_cost=lot.unit_cost,
+        takes, total_cost = _consume_fifo(lots, qty)
+        lines.append(
+            StockMoveLine(
+                move=move,
+                warehouse=from_warehouse,
+                artikl=artikl,
+                quantity=qty,
+                unit_cost=_q4(total_cost / qty) if qty else Decimal("0.0000"),
             )
-
-            StockLot.objects.create(
+        )
+        takes_by_line.append(takes)
+        new_lots.extend(
+            StockLot(
                 warehouse=to_warehouse,
                 artikl=artikl,
                 received_at=_as_aware_datetime(move_date),
-                unit_cost=allocation.unit_cost,
-                qty_in=allocation.qty,
-                qty_remaining=allocation.qty,
+                unit_cost=lot.unit_cost,
+                qty_in=take,
+                qty_remaining=take,
             )
+            for lot, take in takes
+        )
 
-            total_cost += _q4(take) * lot.unit_cost
-            remaining -= take
-
-        if remaining > 0:
-            raise ValidationError("FIFO alokacija nije pokrila cijelu kolicinu.")
-
-        avg_cost = _q4(total_cost / qty) if qty else Decimal("0.0000")
-        out_line.unit_cost = avg_cost
-        out_line.save(update_fields=["unit_cost"])
+    _write_fifo_allocations(lines=lines, takes_by_line=takes_by_line)
+    receive_stock_lots(new_lots)
 
     return move
 
@@ -440,16 +581,20 @@ def post_stock_in_from_allocations(
         )
 
         total_cost = Decimal("0.00")
+        new_lots = []
         for alloc in line_allocs:
-            StockLot.objects.create(
-                warehouse=warehouse,
-                artikl=line.artikl,
-                received_at=_as_aware_datetime(move_date),
-                unit_cost=alloc.unit_cost,
-                qty_in=alloc.qty,
-                qty_remaining=alloc.qty,
+            new_lots.append(
+                StockLot(
+                    warehouse=warehouse,
+                    artikl=line.artikl,
+                    received_at=_as_aware_datetime(move_date),
+                    unit_cost=alloc.unit_cost,
+                    qty_in=alloc.qty,
+                    qty_remaining=alloc.qty,
+                )
             )
             total_cost += alloc.qty * alloc.unit_cost
+        receive_stock_lots(new_lots)
 
         if total_qty > 0:
             move_line.unit_cost = _q4(total_cost / total_qty)
@@ -569,30 +714,16 @@ def post_cogs_for_stock_move(*, move: StockMove, cogs_account, inventory_account
 
     ledger = get_single_ledger()
     description = f"COGS {move.reference}".strip() if move.reference else f"COGS izlaz #{move.id}"
-    entry = JournalEntry.objects.create(
+    entry = _post_entry(
         ledger=ledger,
-        number=_next_entry_number(ledger),
         date=move.date.date(),
         description=description,
-        status=JournalEntry.Status.DRAFT,
-    )
-
-    JournalItem.objects.create(
-        entry=entry,
-        account=cogs_account,
-        debit=total_cost,
-        credit=Decimal("0.00"),
-        description="COGS",
-    )
-    JournalItem.objects.create(
-        entry=entry,
-        account=inventory_account,
-        debit=Decimal("0.00"),
-        credit=total_cost,
-        description="Zaliha robe",
+        lines=[
+            JournalLineSpec(account=cogs_account, debit=total_cost, description="COGS"),
+            JournalLineSpec(account=inventory_account, credit=total_cost, description="Zaliha robe"),
+        ],
+        posted_by=posted_by,
     )
-
-    entry.post(user=posted_by)
     move.journal_entry = entry
     move.save(update_fields=["journal_entry"])
     return entry
@@ -607,43 +738,118 @@ def reserve_stock(*, warehouse, artikl, quantity: Decimal, source_type: str = ""
     if qty <= 0:
         raise ValidationError("Kolicina mora biti > 0.")
 
-    on_hand = (
-        StockLot.objects.select_for_update()
-        .filter(warehouse=warehouse, artikl=artikl)
-        .aggregate(total=Sum("qty_remaining", default=Decimal("0.00")))
-    )["total"] or Decimal("0.00")
-
-    reserved = (
-        StockReservation.objects.select_for_update()
-        .filter(warehouse=warehouse, artikl=artikl, released_at__isnull=True)
-        .aggregate(total=Sum("quantity", default=Decimal("0.00")))
-    )["total"] or Decimal("0.00")
-
-    available = on_hand - reserved
+    balance = _lock_stock_balances([(warehouse.rm_id, artikl.rm_id)]).get((warehouse.rm_id, artikl.rm_id))
+    available = balance.available if balance else Decimal("0.00")
     if available < qty:
         raise ValidationError("Nema dovoljno dostupne zalihe za rezervaciju.")
 
-    return StockReservation.objects.create(
+    reservation = StockReservation.objects.create(
         warehouse=warehouse,
         artikl=artikl,
         quantity=qty,
         source_type=source_type or "",
         source_id=source_id,
     )
+    _apply_balance_deltas({(warehouse.rm_id, artikl.rm_id): (Decimal("0"), qty, Decimal("0"))})
+    return reservation
 
 
 def get_available_stock(*, warehouse, artikl) -> Decimal:
-    on_hand = (
-        StockLot.objects.filter(warehouse=warehouse, artikl=artikl)
-        .aggregate(total=Sum("qty_remaining", default=Decimal("0.00")))
-    )["total"] or Decimal("0.00")
-    reserved = (
-        StockReservation.objects.filter(warehouse=warehouse, artikl=artikl, released_at__isnull=True)
-        .aggregate(total=Sum("quantity", default=Decimal("0.00")))
-    )["total"] or Decimal("0.00")
+    row = (
+        StockBalance.objects.filter(warehouse=warehouse, artikl=artikl)
+        .values_list("on_hand", "reserved")
+        .first()
+    )
+    if not row:
+        return Decimal("0.00")
+    on_hand, reserved = row
     return on_hand - reserved
 
 
+@transaction.atomic
+def rebuild_stock_balances(*, warehouse_ids: list[int] | None = None, fix: bool = True) -> list[dict]:
+    """
+    Ponovno racuna StockBalance iz FIFO slojeva i aktivnih rezervacija.
+    Vraca popis odstupanja; s fix=True ih i ispravlja.
+    """
+    lots = StockLot.objects.filter(
+        warehouse_id__isnull=False, artikl_id__isnull=False, qty_remaining__gt=0
+    )
+    reservations = StockReservation.objects.filter(
+        warehouse_id__isnull=False, artikl_id__isnull=False, released_at__isnull=True
+    )
+    balances = StockBalance.objects.select_for_update()
+    if warehouse_ids:
+        lots = lots.filter(warehouse_id__in=warehouse_ids)
+        reservations = reservations.filter(warehouse_id__in=warehouse_ids)
+        balances = balances.filter(warehouse_id__in=warehouse_ids)
+
+    zero = Decimal("0")
+    expected: dict[tuple[int, int], list[Decimal]] = {}
+    lot_rows = lots.values("warehouse_id", "artikl_id").annotate(
+        qty=Sum("qty_remaining"),
+        value=Sum(
+            ExpressionWrapper(
+                F("qty_remaining") * F("unit_cost"),
+                output_field=DecimalField(max_digits=22, decimal_places=8),
+            )
+        ),
+    )
+    for row in lot_rows:
+        key = (row["warehouse_id"], row["artikl_id"])
+        expected[key] = [row["qty"] or zero, zero, row["value"] or zero]
+    reserved_rows = reservations.values("warehouse_id", "artikl_id").annotate(qty=Sum("quantity"))
+    for row in reserved_rows:
+        key = (row["warehouse_id"], row["artikl_id"])
+        expected.setdefault(key, [zero, zero, zero])[1] = row["qty"] or zero
+
+    current = {(b.warehouse_id, b.artikl_id): b for b in balances}
+    fields = ("on_hand", "reserved", "value")
+    drift = []
+    to_create = []
+    to_update = []
+    now = timezone.now()
+    for key in sorted(set(expected) | set(current)):
+        target = [
+            Decimal(str(v)).quantize(EIGHTPLACES, rounding=ROUND_HALF_UP)
+            for v in expected.get(key, [zero, zero, zero])
+        ]
+        balance = current.get(key)
+        actual = [getattr(balance, f) for f in fields] if balance else [zero, zero, zero]
+        if all(Decimal(str(a)) == t for a, t in zip(actual, target)):
+            continue
+        drift.append(
+            {
+                "warehouse_id": key[0],
+                "artikl_id": key[1],
+                **{f"{f}_expected": t for f, t in zip(fields, target)},
+                **{f"{f}_actual": a for f, a in zip(fields, actual)},
+            }
+        )
+        if not fix:
+            continue
+        if balance is None:
+            to_create.append(
+                StockBalance(
+                    warehouse_id=key[0],
+                    artikl_id=key[1],
+                    on_hand=target[0],
+                    reserved=target[1],
+                    value=target[2],
+                )
+            )
+        else:
+            balance.on_hand, balance.reserved, balance.value = target
+            balance.updated_at = now
+            to_update.append(balance)
+
+    if to_create:
+        StockBalance.objects.bulk_create(to_create)
+    if to_update:
+        StockBalance.objects.bulk_update(to_update, ["on_hand", "reserved", "value", "updated_at"])
+    return drift
+
+
 @transaction.atomic
 def refresh_internal_warehouse_stock(*, warehouse_ids: list[int] | None = None, artikl_ids: list[int] | None = None) -> None:
     lots = StockLot.objects.all()
@@ -715,9 +921,74 @@ def release_reservation(*, reservation: StockReservation) -> StockReservation:
         return reservation
     reservation.released_at = timezone.now()
     reservation.save(update_fields=["released_at"])
+    deltas: dict = {}
+    _add_balance_delta(deltas, reservation.warehouse_id, reservation.artikl_id, reserved=-reservation.quantity)
+    _apply_balance_deltas(deltas)
     return reservation
 
 
+def _archive_lot_batch(*, cutoff, batch_size: int) -> int:
+    with transaction.atomic():
+        lot_ids = list(
+            StockLot.objects.select_for_update(skip_locked=True)
+            .filter(qty_remaining=0, received_at__lt=cutoff)
+            .order_by("id")
+            .values_list("id", flat=True)[:batch_size]
+        )
+        if not lot_ids:
+            return 0
+
+        archived_at = timezone.now()
+        StockLotArchive.objects.bulk_create(
+            [
+                StockLotArchive(
+                    id=lot.id,
+                    warehouse_id=lot.warehouse_id,
+                    artikl_id=lot.artikl_id,
+                    received_at=lot.received_at,
+                    unit_cost=lot.unit_cost,
+                    qty_in=lot.qty_in,
+                    source_item_id=lot.source_item_id,
+                    archived_at=archived_at,
+                )
+                for lot in StockLot.objects.filter(id__in=lot_ids)
+            ]
+        )
+        StockAllocation.objects.filter(lot_id__in=lot_ids).update(archived_lot_id=F("lot_id"), lot=None)
+        StockLot.objects.filter(id__in=lot_ids).delete()
+        return len(lot_ids)
+
+
+def archive_exhausted_lots(
+    *,
+    older_than_days: int | None = None,
+    batch_size: int = 5000,
+    max_batches: int | None = None,
+) -> int:
+    """
+    Premjesta potrosene slojeve (qty_remaining = 0) starije od horizonta u
+    StockLotArchive. Alokacije se preusmjeravaju na archived_lot. Svaka
+    serija ide u svojoj transakciji.
+    """
+    if older_than_days is None:
+        older_than_days = settings.STOCK_LOT_ARCHIVE_AFTER_DAYS
+    if older_than_days < 0:
+        raise ValueError("older_than_days mora biti >= 0.")
+    if batch_size <= 0:
+        raise ValueError("batch_size mora biti > 0.")
+
+    cutoff = timezone.now() - timedelta(days=older_than_days)
+    archived = 0
+    batches = 0
+    while max_batches is None or batches < max_batches:
+        count = _archive_lot_batch(cutoff=cutoff, batch_size=batch_size)
+        if not count:
+            break
+        archived += count
+        batches += 1
+    return archived
+
+
 def get_stock_accounting_config() -> StockAccountingConfig:
     cfg = StockAccountingConfig.objects.first()
     if not cfg:
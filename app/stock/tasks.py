@@ -0,0 +1,25 @@
+from celery import shared_task
+from django.core.cache import cache
+
+from stock.services import (
+    PRODUCT_STOCK_REFRESH_LOCK_KEY,
+    archive_exhausted_lots,
+    mark_product_stock_fresh,
+    refresh_warehouse_stock_for_product_code,
+)
+
+
+@shared_task
+def archive_exhausted_stock_lots() -> dict:
+    archived = archive_exhausted_lots()
+    return {"archived": archived}
+
+
+@shared_task(ignore_result=True)
+def refresh_product_stock(product_code: str) -> None:
+    try:
+        refresh_warehouse_stock_for_product_code(product_code)
+    except Exception:
+        cache.delete(PRODUCT_STOCK_REFRESH_LOCK_KEY.format(code=product_code))
+        raise
+    mark_product_stock_fresh(product_code)
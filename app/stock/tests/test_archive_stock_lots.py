@@ -0,0 +1,64 @@
+from datetime import timedelta
+from decimal import Decimal
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase
+from django.utils import timezone
+
+from artikli.models import Artikl
+from stock.models import StockAllocation, StockLot, StockLotArchive, WarehouseId
+from stock.services import archive_exhausted_lots, post_stock_in_from_allocations, post_stock_out, receive_stock_lots
+
+
+class ArchiveExhaustedLotsTests(TestCase):
+    def setUp(self):
+        self.warehouse = WarehouseId.objects.create(rm_id=1, name="Skladiste 1")
+        self.artikl = Artikl.objects.create(rm_id=10, name="Kava")
+        old = timezone.now() - timedelta(days=400)
+        self.old_lot, self.open_lot = receive_stock_lots(
+            [
+                StockLot(
+                    warehouse=self.warehouse,
+                    artikl=self.artikl,
+                    received_at=old,
+                    unit_cost=Decimal("2.0000"),
+                    qty_in=Decimal("5.0000"),
+                    qty_remaining=Decimal("5.0000"),
+                ),
+                StockLot(
+                    warehouse=self.warehouse,
+                    artikl=self.artikl,
+                    received_at=old,
+                    unit_cost=Decimal("3.0000"),
+                    qty_in=Decimal("5.0000"),
+                    qty_remaining=Decimal("5.0000"),
+                ),
+            ]
+        )
+        self.move = post_stock_out(
+            warehouse=self.warehouse,
+            items=[{"artikl": self.artikl, "quantity": Decimal("6.0000")}],
+        )
+
+    def test_exhausted_lots_move_to_archive(self):
+        archived = archive_exhausted_lots(older_than_days=30)
+
+        self.assertEqual(archived, 1)
+        self.assertFalse(StockLot.objects.filter(id=self.old_lot.id).exists())
+        self.assertTrue(StockLot.objects.filter(id=self.open_lot.id).exists())
+
+        archive = StockLotArchive.objects.get(id=self.old_lot.id)
+        self.assertEqual(archive.qty_in, Decimal("5.0000"))
+        allocation = StockAllocation.objects.get(archived_lot=archive)
+        self.assertIsNone(allocation.lot_id)
+        self.assertEqual(allocation.source_lot, archive)
+
+        reversal = post_stock_in_from_allocations(move=self.move, warehouse=self.warehouse)
+        self.assertEqual(reversal.lines.get().unit_cost, Decimal("2.1667"))
+
+    def test_horizon_keeps_recent_lots(self):
+        out = StringIO()
+        call_command("archive_stock_lots", "--days", "1000", stdout=out)
+        self.assertIn("archived=0", out.getvalue())
+        self.assertTrue(StockLot.objects.filter(id=self.old_lot.id).exists())
@@ -0,0 +1,121 @@
+import os
+import unittest
+
+from django.db import connection
+from django.db.models import Sum
+from django.test import TestCase
+
+from artikli.models import Artikl
+from stock.models import StockAllocation, StockLot, StockMove, StockMoveLine, StockReservation, WarehouseId
+
+SEED_LOTS = int(os.getenv("STOCK_PLAN_TEST_LOTS", "1000000"))
+
+
+@unittest.skipUnless(connection.vendor == "postgresql", "Query plan test zahtijeva PostgreSQL.")
+class FifoQueryPlanTests(TestCase):
+    """
+    Na velikom skupu slojeva (vecinom potrosenih), alokacija i rezervacija
+    (vecinom otpustenih) FIFO upiti moraju koristiti nove indekse.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.warehouses = [WarehouseId.objects.create(rm_id=rm_id, name=f"Skladiste {rm_id}") for rm_id in range(1, 6)]
+        Artikl.objects.bulk_create([Artikl(rm_id=rm_id, name=f"Artikl {rm_id}") for rm_id in range(1, 501)])
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"""
+                INSERT INTO {StockLot._meta.db_table}
+                    (warehouse_id, artikl_id, received_at, unit_cost, qty_in, qty_remaining)
+                SELECT
+                    1 + (n % 5),
+                    1 + (n % 500),
+                    now() - (n || ' seconds')::interval,
+                    1.0,
+                    1.0,
+                    CASE WHEN n % 50 = 0 THEN 1.0 ELSE 0 END
+                FROM generate_series(1, %s) AS n
+                """,
+                [SEED_LOTS],
+            )
+            cursor.execute(
+                f"""
+                INSERT INTO {StockReservation._meta.db_table}
+                    (warehouse_id, artikl_id, quantity, source_type, created_at, released_at)
+                SELECT
+                    1 + (n % 5),
+                    1 + (n % 500),
+                    1.0,
+                    '',
+                    now(),
+                    CASE WHEN n % 50 = 0 THEN NULL ELSE now() END
+                FROM generate_series(1, %s) AS n
+                """,
+                [SEED_LOTS // 10],
+            )
+            move = StockMove.objects.create(move_type=StockMove.MoveType.OUT, date="2026-01-01T00:00:00Z")
+            cursor.execute(
+                f"""
+                INSERT INTO {StockMoveLine._meta.db_table} (move_id, warehouse_id, artikl_id, quantity)
+                SELECT %s, 1, 1 + (n % 500), 1.0
+                FROM generate_series(1, %s) AS n
+                """,
+                [move.pk, SEED_LOTS // 200],
+            )
+            # Svaka stavka ima ~20 alokacija, a svaki sloj se ponavlja kroz
+            # mnogo stavki, pa je (move_line, lot) selektivniji od oba FK indeksa.
+            cursor.execute(
+                f"""
+                INSERT INTO {StockAllocation._meta.db_table} (move_line_id, lot_id, qty, unit_cost)
+                SELECT
+                    (SELECT min(id) FROM {StockMoveLine._meta.db_table}) + n / 20,
+                    (SELECT min(id) FROM {StockLot._meta.db_table}) + (n % 50),
+                    1.0,
+                    1.0
+                FROM generate_series(0, %s - 1) AS n
+                """,
+                [SEED_LOTS // 10],
+            )
+            cls.move_line_id = StockMoveLine.objects.filter(move=move).order_by("id").values_list("id", flat=True)[0]
+            cls.lot_id = StockLot.objects.order_by("id").values_list("id", flat=True)[0]
+            cursor.execute(f"ANALYZE {StockLot._meta.db_table}")
+            cursor.execute(f"ANALYZE {StockAllocation._meta.db_table}")
+            cursor.execute(f"ANALYZE {StockReservation._meta.db_table}")
+
+    def assertUsesIndex(self, queryset, index_name):
+        plan = queryset.explain()
+        self.assertIn(index_name, plan, plan)
+
+    def test_open_lot_fifo_scan_uses_index(self):
+        queryset = (
+            StockLot.objects.filter(warehouse_id=1, artikl_id__in=[1, 2, 3], qty_remaining__gt=0)
+            .only("id", "artikl", "qty_remaining", "unit_cost", "received_at")
+            .order_by("artikl_id", "received_at", "id")
+        )
+        self.assertUsesIndex(queryset, "stock_lot_open_fifo_idx")
+
+    def test_single_artikl_fifo_scan_uses_index(self):
+        queryset = (
+            StockLot.objects.filter(warehouse_id=1, artikl_id=1, qty_remaining__gt=0)
+            .order_by("received_at", "id")
+            .only("qty_remaining", "unit_cost")
+        )
+        self.assertUsesIndex(queryset, "stock_lot_open_fifo_idx")
+
+    def test_open_reservations_use_index(self):
+        # Isti upit kao rebuild_stock_balances za odabrana skladista; stanje
+        # rezervacija se inace cita iz StockBalance.
+        queryset = (
+            StockReservation.objects.filter(
+                warehouse_id__in=[1], artikl_id__isnull=False, released_at__isnull=True
+            )
+            .values("warehouse_id", "artikl_id")
+            .annotate(qty=Sum("quantity"))
+        )
+        self.assertUsesIndex(queryset, "stock_res_open_idx")
+
+    def test_allocation_lookup_uses_index(self):
+        self.assertUsesIndex(
+            StockAllocation.objects.filter(move_line_id=self.move_line_id, lot_id=self.lot_id),
+            "stock_alloc_line_lot_idx",
+        )
@@ -1,14 +1,17 @@
 from decimal import Decimal
 
+from auditlog.models import LogEntry
 from django.core.exceptions import ValidationError
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
 from django.utils import timezone
 
 from artikli.models import Artikl
 from contacts.models import Supplier
 from orders.models import PurchaseOrder, WarehouseInput, WarehouseInputItem
 from stock.models import StockAllocation, StockLot, WarehouseId
-from stock.services import post_stock_out, post_warehouse_input_to_stock
+from stock.services import post_stock_out, post_warehouse_input_to_stock, receive_stock_lots
 
 
 class PostStockOutTests(TestCase):
@@ -74,6 +77,79 @@ class PostStockOutTests(TestCase):
         move_line = move.lines.get()
         self.assertEqual(move_line.unit_cost, Decimal("2.1667"))
 
+    def test_bulk_writes_keep_audit_trail(self):
+        move = post_stock_out(
+            warehouse=self.warehouse,
+            items=[{"artikl": self.artikl, "quantity": Decimal("6.0000")}],
+            reference="Test izlaz",
+        )
+
+        lots = list(StockLot.objects.filter(warehouse=self.warehouse, artikl=self.artikl).order_by("received_at", "id"))
+        entries = LogEntry.objects.get_for_objects(StockLot.objects.filter(id__in=[lot.id for lot in lots]))
+        updates = {
+            int(entry.object_pk): entry.changes_dict
+            for entry in entries.filter(action=LogEntry.Action.UPDATE)
+        }
+        self.assertEqual(updates[lots[0].id], {"qty_remaining": ["5.0000", "0.0000"]})
+        self.assertEqual(updates[lots[1].id], {"qty_remaining": ["3.0000", "2.0000"]})
+        self.assertEqual(entries.filter(action=LogEntry.Action.CREATE).count(), 2)
+
+        allocations = StockAllocation.objects.filter(move_line__move=move)
+        self.assertEqual(
+            LogEntry.objects.get_for_objects(allocations).filter(action=LogEntry.Action.CREATE).count(),
+            allocations.count(),
+        )
+        self.assertTrue(LogEntry.objects.get_for_objects(move.lines.all()).exists())
+
+    def test_repeated_artikl_lines_consume_sequentially(self):
+        move = post_stock_out(
+            warehouse=self.warehouse,
+            items=[
+                {"artikl": self.artikl, "quantity": Decimal("4.0000")},
+                {"artikl": self.artikl, "quantity": Decimal("2.0000")},
+            ],
+        )
+
+        lines = list(move.lines.order_by("id"))
+        self.assertEqual(lines[0].unit_cost, Decimal("2.0000"))
+        self.assertEqual(lines[1].unit_cost, Decimal("2.5000"))
+        self.assertEqual(
+            StockLot.objects.filter(warehouse=self.warehouse, artikl=self.artikl)
+            .order_by("received_at", "id")
+            .last()
+            .qty_remaining,
+            Decimal("2.0000"),
+        )
+
+    def test_query_count_does_not_grow_with_lots(self):
+        other = Artikl.objects.create(rm_id=11, name="Mlijeko")
+        receive_stock_lots(
+            [
+                StockLot(
+                    warehouse=self.warehouse,
+                    artikl=other,
+                    received_at=timezone.now(),
+                    unit_cost=Decimal("1.00"),
+                    qty_in=Decimal("1.0000"),
+                    qty_remaining=Decimal("1.0000"),
+                )
+                for _ in range(20)
+            ]
+        )
+
+        with CaptureQueriesContext(connection) as few_lots:
+            post_stock_out(
+                warehouse=self.warehouse,
+                items=[{"artikl": self.artikl, "quantity": Decimal("6.0000")}],
+            )
+        with CaptureQueriesContext(connection) as many_lots:
+            post_stock_out(
+                warehouse=self.warehouse,
+                items=[{"artikl": other, "quantity": Decimal("18.0000")}],
+            )
+
+        self.assertEqual(len(many_lots.captured_queries), len(few_lots.captured_queries))
+
     def test_insufficient_stock_raises(self):
         with self.assertRaises(ValidationError):
             post_stock_out(
@@ -0,0 +1,50 @@
+from unittest import mock
+
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+
+from stock.services import request_product_stock_refresh
+from stock.tasks import refresh_product_stock
+
+LOCMEM_CACHES = {"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}}
+
+
+@override_settings(CACHES=LOCMEM_CACHES, PRODUCT_STOCK_REFRESH_TTL=60)
+class ProductStockRefreshTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        patcher = mock.patch("stock.tasks.refresh_product_stock.delay")
+        self.delay = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_concurrent_requests_enqueue_single_refresh(self):
+        self.assertTrue(request_product_stock_refresh("P10"))
+        self.assertFalse(request_product_stock_refresh("P10"))
+        self.assertTrue(request_product_stock_refresh("S11"))
+
+        self.assertEqual([c.args for c in self.delay.call_args_list], [("P10",), ("S11",)])
+
+    @mock.patch("stock.tasks.refresh_warehouse_stock_for_product_code")
+    def test_fresh_stock_is_not_refreshed_until_ttl(self, refresh):
+        request_product_stock_refresh("P10")
+        refresh_product_stock("P10")
+        refresh.assert_called_once_with("P10")
+
+        self.assertFalse(request_product_stock_refresh("P10"))
+        self.assertEqual(self.delay.call_count, 1)
+
+    @mock.patch("stock.tasks.refresh_warehouse_stock_for_product_code", side_effect=RuntimeError("remaris"))
+    def test_failed_refresh_releases_lock(self, refresh):
+        request_product_stock_refresh("P10")
+        with self.assertRaises(RuntimeError):
+            refresh_product_stock("P10")
+
+        self.assertTrue(request_product_stock_refresh("P10"))
+        self.assertEqual(self.delay.call_count, 2)
+
+    def test_enqueue_failure_releases_lock(self):
+        self.delay.side_effect = OSError("broker down")
+        self.assertFalse(request_product_stock_refresh("P10"))
+
+        self.delay.side_effect = None
+        self.assertTrue(request_product_stock_refresh("P10"))
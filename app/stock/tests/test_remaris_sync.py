@@ -0,0 +1,152 @@
+import json
+import threading
+import time
+from decimal import Decimal
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest import mock
+
+from django.db import connection
+from django.test import TestCase, TransactionTestCase
+from django.test.utils import CaptureQueriesContext
+
+from artikli.models import Artikl
+from artikli.remaris_connector import RemarisConnector
+from stock.models import WarehouseId, WarehouseStock
+from stock.remaris_sync import sync_warehouse_stock
+
+
+def _row(wh_id, code, quantity, name="Artikl"):
+    return {
+        "id": wh_id,
+        "productCode": code,
+        "productName": name,
+        "unit": "kom",
+        "quantity": quantity,
+        "baseGroupName": "Pica",
+        "active": True,
+    }
+
+
+class SyncWarehouseStockTests(TestCase):
+    def setUp(self):
+        self.warehouse = WarehouseId.objects.create(rm_id=4, name="Sank")
+        Artikl.objects.create(rm_id=10, name="Pivo", code="P10")
+        Artikl.objects.create(rm_id=11, name="Sok", code="S11")
+        WarehouseStock.objects.create(
+            wh_id=1,
+            warehouse_id=self.warehouse,
+            product_id=10,
+            product_name="Pivo",
+            product_code="P10",
+            unit="kom",
+            quantity=Decimal("5.0000"),
+            base_group_name="Pica",
+            active=True,
+        )
+        WarehouseStock.objects.create(
+            wh_id=2,
+            warehouse_id=self.warehouse,
+            product_name="Sok",
+            product_code="S11",
+            unit="kom",
+            quantity=Decimal("1.0000"),
+            base_group_name="Pica",
+            active=True,
+        )
+
+    def _sync(self, rows, **kwargs):
+        connector = mock.Mock()
+        connector.post_json.return_value = {"response": {"data": rows}}
+        return sync_warehouse_stock(warehouse_ids=[4], connector=connector, **kwargs)
+
+    def test_creates_updates_and_skips_unchanged(self):
+        rows = [
+            _row(1, "P10", 5, name="Pivo"),
+            _row(2, "S11", "3.5", name="Sok"),
+            _row(3, "X99", 2),
+            {"productCode": "P10"},
+        ]
+        created, updated, skipped = self._sync(rows)
+
+        self.assertEqual((created, updated, skipped), (1, 1, 1))
+        sok = WarehouseStock.objects.get(wh_id=2)
+        self.assertEqual(sok.quantity, Decimal("3.5000"))
+        self.assertEqual(sok.product_id, 11)
+        self.assertIsNone(WarehouseStock.objects.get(wh_id=3).product_id)
+
+    def test_existing_only_and_product_code_filter(self):
+        rows = [_row(2, "S11", 7, name="Sok"), _row(3, "P10", 2, name="Pivo")]
+
+        self.assertEqual(self._sync(rows, existing_only=True), (0, 1, 1))
+        self.assertFalse(WarehouseStock.objects.filter(wh_id=3).exists())
+
+        self.assertEqual(self._sync(rows, product_code="P10"), (1, 0, 0))
+        self.assertEqual(WarehouseStock.objects.get(wh_id=3).product_id, 10)
+
+    def test_query_count_does_not_grow_with_rows(self):
+        few = [_row(100 + i, "P10", i) for i in range(2)]
+        many = [_row(200 + i, "S11", i) for i in range(50)]
+
+        with CaptureQueriesContext(connection) as few_queries:
+            self._sync(few)
+        with CaptureQueriesContext(connection) as many_queries:
+            self._sync(many)
+
+        self.assertEqual(len(many_queries.captured_queries), len(few_queries.captured_queries))
+
+
+class _StubRemarisHandler(BaseHTTPRequestHandler):
+    delay = 0.3
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        warehouse_id = body["data"]["warehouseId"]
+        self.server.cookies.append(self.headers.get("Cookie", ""))
+        time.sleep(self.delay)
+        payload = {"response": {"data": [_row(warehouse_id * 100 + i, "P10", i) for i in range(3)]}}
+        data = json.dumps(payload).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class ConcurrentWarehouseFetchTests(TransactionTestCase):
+    def setUp(self):
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), _StubRemarisHandler)
+        self.server.cookies = []
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.addCleanup(self.server.server_close)
+        self.addCleanup(self.server.shutdown)
+
+        Artikl.objects.create(rm_id=10, name="Pivo", code="P10")
+        for rm_id in (1, 2, 3, 4):
+            WarehouseId.objects.create(rm_id=rm_id, name=f"Skladiste {rm_id}")
+
+    def test_warehouses_are_fetched_concurrently_with_shared_cookies(self):
+        host, port = self.server.server_address
+        connector = RemarisConnector(base_url=f"http://{host}:{port}", username="u", password="p")
+        connector.raw_cookie_header = None
+        connector.session.cookies.clear()
+        connector.session.cookies.set("Esc_Auth", "token")
+
+        started = time.monotonic()
+        created, updated, skipped = sync_warehouse_stock(
+            warehouse_ids=[1, 2, 3, 4],
+            connector=connector,
+            max_workers=4,
+        )
+        elapsed = time.monotonic() - started
+
+        self.assertEqual((created, updated, skipped), (12, 0, 0))
+        self.assertLess(elapsed, 4 * _StubRemarisHandler.delay)
+        self.assertEqual(len(self.server.cookies), 4)
+        self.assertTrue(all("Esc_Auth=token" in cookie for cookie in self.server.cookies))
+        self.assertEqual(
+            sorted(WarehouseStock.objects.values_list("warehouse_id_id", flat=True).distinct()),
+            [1, 2, 3, 4],
+        )
@@ -0,0 +1,113 @@
+from decimal import Decimal
+from io import StringIO
+
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from artikli.models import Artikl
+from contacts.models import Supplier
+from orders.models import PurchaseOrder, WarehouseInput, WarehouseInputItem
+from stock.models import StockBalance, WarehouseId
+from stock.services import (
+    _lock_stock_balances,
+    get_available_stock,
+    post_stock_in_from_allocations,
+    post_stock_out,
+    post_stock_transfer,
+    post_warehouse_input_to_stock,
+    rebuild_stock_balances,
+    release_reservation,
+    reserve_stock,
+    reverse_stock_move,
+)
+
+
+class StockBalanceTests(TestCase):
+    def setUp(self):
+        supplier = Supplier.objects.create(rm_id=1, name="Dobavljac")
+        order = PurchaseOrder.objects.create(supplier=supplier, ordered_at=timezone.now())
+        self.wh_a = WarehouseId.objects.create(rm_id=1, name="Skladiste A")
+        self.wh_b = WarehouseId.objects.create(rm_id=2, name="Skladiste B")
+        self.artikl = Artikl.objects.create(rm_id=10, name="Kava")
+
+        for qty, price in ((Decimal("5.0000"), Decimal("2.00")), (Decimal("5.0000"), Decimal("3.00"))):
+            warehouse_input = WarehouseInput.objects.create(
+                order=order,
+                supplier=supplier,
+                date=timezone.localdate(),
+                warehouse=self.wh_a,
+            )
+            WarehouseInputItem.objects.create(
+                warehouse_input=warehouse_input,
+                artikl=self.artikl,
+                quantity=qty,
+                buying_price=price,
+                total=qty * price,
+            )
+            post_warehouse_input_to_stock(warehouse_input=warehouse_input)
+
+    def _balance(self, warehouse):
+        return StockBalance.objects.get(warehouse=warehouse, artikl=self.artikl)
+
+    def test_postings_keep_balance_in_sync(self):
+        balance = self._balance(self.wh_a)
+        self.assertEqual(balance.on_hand, Decimal("10.0000"))
+        self.assertEqual(balance.value, Decimal("25.0000"))
+
+        res = reserve_stock(warehouse=self.wh_a, artikl=self.artikl, quantity=Decimal("2.0000"))
+        self.assertEqual(get_available_stock(warehouse=self.wh_a, artikl=self.artikl), Decimal("8.0000"))
+
+        out_move = post_stock_out(
+            warehouse=self.wh_a,
+            items=[{"artikl": self.artikl, "quantity": Decimal("6.0000")}],
+            auto_cogs=False,
+        )
+        balance = self._balance(self.wh_a)
+        self.assertEqual(balance.on_hand, Decimal("4.0000"))
+        self.assertEqual(balance.value, Decimal("12.0000"))
+
+        release_reservation(reservation=res)
+        transfer = post_stock_transfer(
+            from_warehouse=self.wh_a,
+            to_warehouse=self.wh_b,
+            items=[{"artikl": self.artikl, "quantity": Decimal("1.0000")}],
+        )
+        self.assertEqual(get_available_stock(warehouse=self.wh_a, artikl=self.artikl), Decimal("3.0000"))
+        self.assertEqual(get_available_stock(warehouse=self.wh_b, artikl=self.artikl), Decimal("1.0000"))
+
+        reverse_stock_move(move=transfer)
+        post_stock_in_from_allocations(move=out_move, warehouse=self.wh_a)
+        self.assertEqual(self._balance(self.wh_a).on_hand, Decimal("10.0000"))
+        self.assertEqual(self._balance(self.wh_b).on_hand, Decimal("0.0000"))
+
+        self.assertEqual(rebuild_stock_balances(fix=False), [])
+
+    def test_rebuild_repairs_drift(self):
+        StockBalance.objects.filter(warehouse=self.wh_a).update(on_hand=Decimal("99.0000"))
+
+        drift = rebuild_stock_balances(fix=False)
+        self.assertEqual(len(drift), 1)
+        self.assertEqual(drift[0]["on_hand_expected"], Decimal("10.0000"))
+
+        out = StringIO()
+        call_command("rebuild_stock_balances", stdout=out)
+        self.assertIn("drift=1", out.getvalue())
+        self.assertEqual(self._balance(self.wh_a).on_hand, Decimal("10.0000"))
+        self.assertEqual(rebuild_stock_balances(fix=False), [])
+
+    def test_lock_selects_only_touched_pairs(self):
+        other = Artikl.objects.create(rm_id=11, name="Mlijeko")
+        for warehouse in (self.wh_a, self.wh_b):
+            for artikl in (self.artikl, other):
+                StockBalance.objects.get_or_create(warehouse=warehouse, artikl=artikl)
+
+        with CaptureQueriesContext(connection) as queries:
+            locked = _lock_stock_balances([(self.wh_b.rm_id, other.rm_id), (self.wh_a.rm_id, self.artikl.rm_id)])
+
+        self.assertEqual(list(locked), [(self.wh_a.rm_id, self.artikl.rm_id), (self.wh_b.rm_id, other.rm_id)])
+        self.assertEqual(len(queries), 1)
+        # Unakrsni parovi (A, Mlijeko) i (B, Kava) ne smiju biti u upitu.
+        self.assertEqual(len(list(StockBalance.objects.raw(queries[0]["sql"].replace(" FOR UPDATE", "")))), 2)